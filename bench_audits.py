@@ -0,0 +1,113 @@
+# File: bench_audits.py
+# End-to-end audit throughput benchmark against the local stub providers
+
+#!/usr/bin/env python3
+"""
+Run audits through SEOAuditor end to end - crawl, AI analysis, PDF, database,
+email - against stub_providers.py instead of paid APIs, and report throughput.
+
+    python stub_providers.py --latency lognormal:2.0,0.5 &
+    python bench_audits.py --audits 40 --concurrency 8 --audit-type free
+
+Each audit gets its own site path so no cache or coalescing short-circuits
+it; pass --same-url to measure coalescing instead. The database, reports and
+caches go to a temporary directory.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+def configure(stub_url: str, work_dir: str):
+    """Point every provider at the stub; must run before config.settings is imported"""
+    os.environ.update({
+        'OPENAI_BASE_URL': f'{stub_url}/v1',
+        'OPENROUTER_BASE_URL': f'{stub_url}/v1',
+        'RESEND_BASE_URL': stub_url,
+        'OPENAI_API_KEY': 'stub',
+        'OPENROUTER_API_KEY': 'stub',
+        'RESEND_API_KEY': 'stub',
+        'DATABASE_PATH': os.path.join(work_dir, 'bench.db'),
+        'JOB_QUEUE_PATH': os.path.join(work_dir, 'jobs.db'),
+        'REPORTS_DIR': os.path.join(work_dir, 'reports'),
+        'CACHE_DIR': os.path.join(work_dir, 'cache'),
+        'ENABLE_LLM_CACHE': 'False',
+        'ENABLE_FINGERPRINT_REUSE': 'False'
+    })
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+def stub_stats(stub_url: str) -> dict:
+    with urllib.request.urlopen(f'{stub_url}/stats', timeout=5) as response:
+        return json.load(response)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark end-to-end audits against stub providers')
+    parser.add_argument('--stub', default='http://127.0.0.1:8089', help='stub_providers.py base URL')
+    parser.add_argument('--audits', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--audit-type', choices=['free', 'premium'], default='free')
+    parser.add_argument('--same-url', action='store_true', help='audit one URL (exercises coalescing)')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='audit-bench-')
+    configure(args.stub, work_dir)
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+    from models.database import init_database
+    from services.seo_auditor import SEOAuditor
+    from services.audit_pipeline import wait_for_background
+    from utils.metrics import metrics
+
+    init_database()
+    auditor = SEOAuditor()
+    run_id = int(time.time())
+
+    def run(index: int):
+        path = 'bench' if args.same_url else f'bench-{run_id}-{index}'
+        url = f'{args.stub}/site/{path}'
+        email = f'bench{index}@example.com'
+        started = time.monotonic()
+        if args.audit_type == 'premium':
+            result = auditor.run_premium_audit(url, email, company='Bench Co')
+        else:
+            result = auditor.run_full_audit(url, email)
+        return time.monotonic() - started, result
+
+    print(f'Running {args.audits} {args.audit_type} audits, {args.concurrency} at a time, against {args.stub}')
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(run, range(args.audits)))
+    elapsed = time.monotonic() - started
+    # Emails go out after each audit returns
+    emails_done = wait_for_background(timeout=120)
+
+    latencies = [seconds for seconds, _ in outcomes]
+    succeeded = sum(1 for _, result in outcomes if result.get('success'))
+    snapshot = metrics.snapshot()
+
+    print(f'\nCompleted {succeeded}/{args.audits} audits in {elapsed:.1f}s '
+          f'({args.audits / elapsed * 60:.1f} audits/min)'
+          f'{"" if emails_done else ", some emails still sending"}')
+    print(f'Audit latency: p50 {percentile(latencies, 50):.2f}s, p95 {percentile(latencies, 95):.2f}s, '
+          f'max {max(latencies):.2f}s')
+    for name in sorted(snapshot['histograms']):
+        if name.startswith(('ai_', 'scrape', 'crawl', 'audit_stage', 'audit_admission')):
+            print(f'  {name}: {snapshot["histograms"][name]}')
+    for name in ('llm_prompt_tokens', 'llm_completion_tokens', 'audits_coalesced'):
+        if name in snapshot['counters']:
+            print(f'  {name}: {snapshot["counters"][name]}')
+    try:
+        print(f'Stub: {stub_stats(args.stub)}')
+    except OSError as e:
+        print(f'Stub stats unavailable: {e}')
+    print(f'Work directory: {work_dir}')
+
+if __name__ == '__main__':
+    main()
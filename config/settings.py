@@ -2,6 +2,7 @@
 # Enhanced configuration settings for premium $997 audit model
 
 import os
+import json
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -25,6 +26,7 @@ RESEND_API_KEY = os.getenv('RESEND_API_KEY', '')
 FROM_EMAIL = os.getenv('FROM_EMAIL', 'noreply@aiauditortool.com')  # Your verified domain email
 FROM_NAME = os.getenv('FROM_NAME', 'Premium AI SEO Audit')
 RESEND_FROM_EMAIL = FROM_EMAIL  # Alias for backward compatibility
+RESEND_BASE_URL = os.getenv('RESEND_BASE_URL', 'https://api.resend.com')
 
 # Legacy email settings (kept for backward compatibility)
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.resend.com')
@@ -36,6 +38,7 @@ EMAIL_PASS = os.getenv('EMAIL_PASS', '')  # Not used with Resend API
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY', '')
 OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
 
 # Stripe Payment Configuration
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY', '')
@@ -111,6 +114,9 @@ except ValueError:
 
 # Security Settings
 CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',')
+# Admin endpoints (/api/admin/...) require this key in the X-Admin-Key header;
+# they are disabled while it is unset
+ADMIN_API_KEY = os.getenv('ADMIN_API_KEY', '')
 try:
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', '16777216'))
 except ValueError:
@@ -127,6 +133,427 @@ try:
 except ValueError:
     AUDIT_TIMEOUT_SECONDS = 300
 
+# Admission control: at most MAX_CONCURRENT_AUDITS audits run at once across all
+# processes; up to AUDIT_MAX_WAITING more wait (FIFO) for AUDIT_ADMISSION_WAIT_SECONDS,
+# and anything beyond that is turned away with a 503
+ENABLE_ADMISSION_CONTROL = os.getenv('ENABLE_ADMISSION_CONTROL', 'True').lower() == 'true'
+
+try:
+    AUDIT_MAX_WAITING = int(os.getenv('AUDIT_MAX_WAITING', str(MAX_CONCURRENT_AUDITS * 2)))
+except ValueError:
+    AUDIT_MAX_WAITING = MAX_CONCURRENT_AUDITS * 2
+
+try:
+    AUDIT_ADMISSION_WAIT_SECONDS = float(os.getenv('AUDIT_ADMISSION_WAIT_SECONDS', '60'))
+except ValueError:
+    AUDIT_ADMISSION_WAIT_SECONDS = 60.0
+
+# Free audits can be scored by the rule engine alone, without an LLM call
+FREE_AUDIT_AI_ANALYSIS = os.getenv('FREE_AUDIT_AI_ANALYSIS', 'True').lower() == 'true'
+
+# Content fingerprint reuse: skip AI analysis when an identical page was analysed recently
+ENABLE_FINGERPRINT_REUSE = os.getenv('ENABLE_FINGERPRINT_REUSE', 'True').lower() == 'true'
+
+try:
+    FINGERPRINT_REUSE_HOURS = int(os.getenv('FINGERPRINT_REUSE_HOURS', '72'))
+except ValueError:
+    FINGERPRINT_REUSE_HOURS = 72
+
+# Async LLM client (pooled connections, per-provider concurrency limits)
+try:
+    OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '8'))
+except ValueError:
+    OPENAI_MAX_CONCURRENCY = 8
+
+try:
+    OPENROUTER_MAX_CONCURRENCY = int(os.getenv('OPENROUTER_MAX_CONCURRENCY', '8'))
+except ValueError:
+    OPENROUTER_MAX_CONCURRENCY = 8
+
+try:
+    LLM_POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', '32'))
+except ValueError:
+    LLM_POOL_SIZE = 32
+
+try:
+    LLM_REQUEST_TIMEOUT = int(os.getenv('LLM_REQUEST_TIMEOUT', '90'))
+except ValueError:
+    LLM_REQUEST_TIMEOUT = 90
+
+# Prompt token budget: page text is compressed to PROMPT_CONTENT_TOKENS and heading
+# lists are capped at PROMPT_MAX_HEADINGS entries
+try:
+    PROMPT_CONTENT_TOKENS = int(os.getenv('PROMPT_CONTENT_TOKENS', '750'))
+except ValueError:
+    PROMPT_CONTENT_TOKENS = 750
+
+try:
+    PROMPT_MAX_HEADINGS = int(os.getenv('PROMPT_MAX_HEADINGS', '10'))
+except ValueError:
+    PROMPT_MAX_HEADINGS = 10
+
+# Model routing per audit tier. Free audits use a fast, inexpensive model with a
+# compact prompt and generate only the sections the free report shows; the rest
+# come from the rule-based analysis. Premium audits keep the large model.
+#   providers          [provider, model] pairs, tried fastest first
+#   max_tokens         cap on each section's completion tokens (None keeps the section's own)
+#   content_tokens     page text budget in the prompt
+#   latency_target     seconds the tier's analysis may take; sections still pending use the fallback
+#   sections           section names to generate (None for all)
+#   section_overrides  per-section {'max_tokens': ...}
+# AI_MODEL_ROUTING_JSON overrides fields per tier, e.g. {"free": {"latency_target": 20}}
+AI_MODEL_ROUTING = {
+    'free': {
+        'providers': [['openai', 'gpt-4o-mini'], ['openrouter', 'openai/gpt-4o-mini']],
+        'max_tokens': 400,
+        'content_tokens': 300,
+        'latency_target': 30,
+        'sections': ['executive_summary', 'critical_issues', 'ai_search_strategy'],
+        'section_overrides': {'critical_issues': {'max_tokens': 600}}
+    },
+    'premium': {
+        'providers': [['openai', 'gpt-4'], ['openrouter', 'openai/gpt-4']],
+        'max_tokens': None,
+        'content_tokens': PROMPT_CONTENT_TOKENS,
+        'latency_target': 180,
+        'sections': None,
+        'section_overrides': {}
+    }
+}
+
+try:
+    for _tier, _overrides in json.loads(os.getenv('AI_MODEL_ROUTING_JSON', '{}')).items():
+        AI_MODEL_ROUTING.setdefault(_tier, {}).update(_overrides)
+except (ValueError, AttributeError):
+    pass
+
+# Stream completions so each analysis section is available as soon as its JSON is complete
+ENABLE_LLM_STREAMING = os.getenv('ENABLE_LLM_STREAMING', 'True').lower() == 'true'
+
+# Sectional AI analysis (sections are generated concurrently)
+try:
+    AI_SECTION_ATTEMPTS = int(os.getenv('AI_SECTION_ATTEMPTS', '2'))
+except ValueError:
+    AI_SECTION_ATTEMPTS = 2
+
+try:
+    AI_SECTION_TIMEOUT = int(os.getenv('AI_SECTION_TIMEOUT', '60'))
+except ValueError:
+    AI_SECTION_TIMEOUT = 60
+
+# Retry backoff between section attempts: a random delay up to base * 2^attempt, capped
+try:
+    AI_RETRY_BACKOFF_BASE = float(os.getenv('AI_RETRY_BACKOFF_BASE', '1.0'))
+except ValueError:
+    AI_RETRY_BACKOFF_BASE = 1.0
+
+try:
+    AI_RETRY_BACKOFF_MAX = float(os.getenv('AI_RETRY_BACKOFF_MAX', '10.0'))
+except ValueError:
+    AI_RETRY_BACKOFF_MAX = 10.0
+
+# Per-provider circuit breakers: after this many consecutive failures a provider
+# is skipped for the cooldown, then a single trial request decides whether it recovered
+try:
+    CIRCUIT_BREAKER_FAILURES = int(os.getenv('CIRCUIT_BREAKER_FAILURES', '5'))
+except ValueError:
+    CIRCUIT_BREAKER_FAILURES = 5
+
+try:
+    CIRCUIT_BREAKER_COOLDOWN = int(os.getenv('CIRCUIT_BREAKER_COOLDOWN', '30'))
+except ValueError:
+    CIRCUIT_BREAKER_COOLDOWN = 30
+
+# Latency-aware provider routing and hedged requests. Each section goes to the
+# provider with the lowest moving-average latency; if it has not answered by that
+# provider's p95 latency, a duplicate is sent to the next provider. Hedges are
+# limited to HEDGE_BUDGET_PERCENT of primary calls.
+ENABLE_HEDGING = os.getenv('ENABLE_HEDGING', 'True').lower() == 'true'
+
+try:
+    HEDGE_BUDGET_PERCENT = int(os.getenv('HEDGE_BUDGET_PERCENT', '10'))
+except ValueError:
+    HEDGE_BUDGET_PERCENT = 10
+
+# Hedge delay used until a provider has HEDGE_MIN_SAMPLES latency samples
+try:
+    HEDGE_DEFAULT_DELAY = int(os.getenv('HEDGE_DEFAULT_DELAY', '30'))
+except ValueError:
+    HEDGE_DEFAULT_DELAY = 30
+
+try:
+    HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))
+except ValueError:
+    HEDGE_MIN_SAMPLES = 20
+
+try:
+    LATENCY_WINDOW = int(os.getenv('LATENCY_WINDOW', '200'))
+except ValueError:
+    LATENCY_WINDOW = 200
+
+# Seconds of the audit deadline kept back from the analysis for the PDF, database and email steps
+try:
+    AUDIT_DELIVERY_RESERVE_SECONDS = int(os.getenv('AUDIT_DELIVERY_RESERVE_SECONDS', '20'))
+except ValueError:
+    AUDIT_DELIVERY_RESERVE_SECONDS = 20
+
+# Per-stage timeouts (seconds) for the audit pipeline (services/audit_pipeline.py).
+# The analysis stage is bounded by the admission wait plus AUDIT_TIMEOUT_SECONDS;
+# email runs after the response. AUDIT_STAGE_TIMEOUTS_JSON overrides single
+# stages, e.g. {"pdf": 90}
+AUDIT_STAGE_TIMEOUTS = {
+    'analysis': AUDIT_TIMEOUT_SECONDS + int(AUDIT_ADMISSION_WAIT_SECONDS) + 60,
+    'pdf': 60,
+    'save': 30,
+    'email': 60
+}
+
+try:
+    AUDIT_STAGE_TIMEOUTS.update(json.loads(os.getenv('AUDIT_STAGE_TIMEOUTS_JSON', '{}')))
+except (ValueError, TypeError):
+    pass
+
+# An audit run still 'running' this long after it (re)started was interrupted by a
+# restart or crash; it is marked failed so the admin list offers it for a retry
+try:
+    AUDIT_RUN_STALE_SECONDS = int(os.getenv('AUDIT_RUN_STALE_SECONDS',
+                                            str(int(sum(AUDIT_STAGE_TIMEOUTS.values())) + 60)))
+except (ValueError, TypeError):
+    AUDIT_RUN_STALE_SECONDS = 900
+
+# Background audit jobs: /api/audit enqueues the audit in a SQLite job queue and
+# returns a job id; run_worker.py processes execute the jobs. With the queue
+# disabled, audits run inside the HTTP request as before.
+ENABLE_JOB_QUEUE = os.getenv('ENABLE_JOB_QUEUE', 'True').lower() == 'true'
+JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', 'data/jobs.db')
+
+try:
+    AUDIT_WORKER_PROCESSES = int(os.getenv('AUDIT_WORKER_PROCESSES', '2'))
+except ValueError:
+    AUDIT_WORKER_PROCESSES = 2
+
+# A running job's lease is renewed every JOB_HEARTBEAT_SECONDS; a job whose lease
+# lapses (its worker died) is picked up again, up to JOB_MAX_ATTEMPTS runs
+try:
+    JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '60'))
+except ValueError:
+    JOB_LEASE_SECONDS = 60
+
+try:
+    JOB_HEARTBEAT_SECONDS = int(os.getenv('JOB_HEARTBEAT_SECONDS', '5'))
+except ValueError:
+    JOB_HEARTBEAT_SECONDS = 5
+
+try:
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+except ValueError:
+    JOB_MAX_ATTEMPTS = 3
+
+try:
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1.0'))
+except ValueError:
+    JOB_POLL_INTERVAL = 1.0
+
+# Scheduling: premium jobs run before free ones, earliest delivery deadline first.
+# Premium deadlines are PREMIUM_DELIVERY_HOURS after the order; free jobs still
+# queued FREE_JOB_DEADLINE_SECONDS after submission are shed, as are new free jobs
+# once FREE_QUEUE_MAX_DEPTH are waiting. At most FREE_JOB_MAX_RUNNING free jobs
+# run at once, so a worker is always left for premium orders.
+try:
+    FREE_JOB_DEADLINE_SECONDS = int(os.getenv('FREE_JOB_DEADLINE_SECONDS', '600'))
+except ValueError:
+    FREE_JOB_DEADLINE_SECONDS = 600
+
+try:
+    FREE_QUEUE_MAX_DEPTH = int(os.getenv('FREE_QUEUE_MAX_DEPTH', '100'))
+except ValueError:
+    FREE_QUEUE_MAX_DEPTH = 100
+
+# Retry-After (seconds) sent with the 503 when the free queue is full
+try:
+    QUEUE_FULL_RETRY_AFTER = int(os.getenv('QUEUE_FULL_RETRY_AFTER', '60'))
+except ValueError:
+    QUEUE_FULL_RETRY_AFTER = 60
+
+try:
+    FREE_JOB_MAX_RUNNING = int(os.getenv('FREE_JOB_MAX_RUNNING', str(max(1, AUDIT_WORKER_PROCESSES - 1))))
+except ValueError:
+    FREE_JOB_MAX_RUNNING = max(1, AUDIT_WORKER_PROCESSES - 1)
+
+# Finished jobs (and their results) are deleted after this many hours
+try:
+    JOB_RETENTION_HOURS = int(os.getenv('JOB_RETENTION_HOURS', '168'))
+except ValueError:
+    JOB_RETENTION_HOURS = 168
+
+# Request coalescing: concurrent audits of the same URL and audit type share one
+# scrape, analysis and PDF (across worker processes, through SQLite under CACHE_DIR);
+# each caller still gets its own database row and email
+ENABLE_AUDIT_COALESCING = os.getenv('ENABLE_AUDIT_COALESCING', 'True').lower() == 'true'
+
+# How long a flight is considered in progress; a crashed owner is taken over after this
+try:
+    COALESCE_LEASE_SECONDS = int(os.getenv('COALESCE_LEASE_SECONDS',
+                                           str(AUDIT_TIMEOUT_SECONDS + int(AUDIT_ADMISSION_WAIT_SECONDS) + 60)))
+except ValueError:
+    COALESCE_LEASE_SECONDS = AUDIT_TIMEOUT_SECONDS + int(AUDIT_ADMISSION_WAIT_SECONDS) + 60
+
+# How long a finished flight's result stays available to callers that were waiting on it
+try:
+    COALESCE_RESULT_TTL = int(os.getenv('COALESCE_RESULT_TTL', '300'))
+except ValueError:
+    COALESCE_RESULT_TTL = 300
+
+try:
+    COALESCE_POLL_INTERVAL = float(os.getenv('COALESCE_POLL_INTERVAL', '0.5'))
+except ValueError:
+    COALESCE_POLL_INTERVAL = 0.5
+
+# LLM response cache (content-addressed, SQLite under CACHE_DIR)
+ENABLE_LLM_CACHE = os.getenv('ENABLE_LLM_CACHE', 'True').lower() == 'true'
+
+try:
+    LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', '604800'))
+except ValueError:
+    LLM_CACHE_TTL = 604800
+
+try:
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000'))
+except ValueError:
+    LLM_CACHE_MAX_ENTRIES = 5000
+
+# Outbound HTTP client (shared keep-alive connection pools)
+try:
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '20'))
+except ValueError:
+    HTTP_POOL_CONNECTIONS = 20
+
+try:
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+except ValueError:
+    HTTP_POOL_MAXSIZE = 20
+
+try:
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '10'))
+except ValueError:
+    HTTP_CONNECT_TIMEOUT = 10.0
+
+try:
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+except ValueError:
+    HTTP_READ_TIMEOUT = 30.0
+
+try:
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+except ValueError:
+    HTTP_MAX_RETRIES = 2
+
+try:
+    HTTP_RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', '0.5'))
+except ValueError:
+    HTTP_RETRY_BACKOFF = 0.5
+
+# Longest sleep (seconds) between retries, including one asked for by a
+# Retry-After header, so a third-party site cannot stall a worker
+try:
+    HTTP_RETRY_MAX_SLEEP = float(os.getenv('HTTP_RETRY_MAX_SLEEP', '5'))
+except ValueError:
+    HTTP_RETRY_MAX_SLEEP = 5.0
+
+# Site Crawler (page budget of 1 = homepage only)
+try:
+    CRAWL_MAX_PAGES_FREE = int(os.getenv('CRAWL_MAX_PAGES_FREE', '1'))
+except ValueError:
+    CRAWL_MAX_PAGES_FREE = 1
+
+try:
+    CRAWL_MAX_PAGES_PREMIUM = int(os.getenv('CRAWL_MAX_PAGES_PREMIUM', '50'))
+except ValueError:
+    CRAWL_MAX_PAGES_PREMIUM = 50
+
+try:
+    CRAWL_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', '8'))
+except ValueError:
+    CRAWL_CONCURRENCY = 8
+
+try:
+    CRAWL_PAGE_TIMEOUT = int(os.getenv('CRAWL_PAGE_TIMEOUT', '15'))
+except ValueError:
+    CRAWL_PAGE_TIMEOUT = 15
+
+# Scraper response limits (bodies are streamed and cut off at SCRAPE_MAX_BYTES)
+try:
+    SCRAPE_MAX_BYTES = int(os.getenv('SCRAPE_MAX_BYTES', str(3 * 1024 * 1024)))
+except ValueError:
+    SCRAPE_MAX_BYTES = 3 * 1024 * 1024
+
+try:
+    SCRAPE_CHUNK_SIZE = int(os.getenv('SCRAPE_CHUNK_SIZE', '65536'))
+except ValueError:
+    SCRAPE_CHUNK_SIZE = 65536
+
+# Off-process HTML parsing (keeps large pages from stalling gevent workers)
+ENABLE_PARSE_POOL = os.getenv('ENABLE_PARSE_POOL', 'False').lower() == 'true'
+
+try:
+    PARSE_POOL_WORKERS = int(os.getenv('PARSE_POOL_WORKERS', '2'))
+except ValueError:
+    PARSE_POOL_WORKERS = 2
+
+try:
+    PARSE_POOL_MIN_BYTES = int(os.getenv('PARSE_POOL_MIN_BYTES', '262144'))
+except ValueError:
+    PARSE_POOL_MIN_BYTES = 262144
+
+try:
+    PARSE_POOL_TIMEOUT = int(os.getenv('PARSE_POOL_TIMEOUT', '30'))
+except ValueError:
+    PARSE_POOL_TIMEOUT = 30
+
+try:
+    PARSE_POOL_MAX_PENDING = int(os.getenv('PARSE_POOL_MAX_PENDING', str(PARSE_POOL_WORKERS * 2)))
+except ValueError:
+    PARSE_POOL_MAX_PENDING = PARSE_POOL_WORKERS * 2
+
+# robots.txt and sitemap discovery
+RESPECT_ROBOTS_TXT = os.getenv('RESPECT_ROBOTS_TXT', 'True').lower() == 'true'
+
+try:
+    ROBOTS_CACHE_TTL = int(os.getenv('ROBOTS_CACHE_TTL', '3600'))
+except ValueError:
+    ROBOTS_CACHE_TTL = 3600
+
+try:
+    SITEMAP_MAX_URLS = int(os.getenv('SITEMAP_MAX_URLS', '50000'))
+except ValueError:
+    SITEMAP_MAX_URLS = 50000
+
+try:
+    SITEMAP_MAX_FILES = int(os.getenv('SITEMAP_MAX_FILES', '20'))
+except ValueError:
+    SITEMAP_MAX_FILES = 20
+
+try:
+    SITEMAP_MAX_BYTES = int(os.getenv('SITEMAP_MAX_BYTES', str(50 * 1024 * 1024)))
+except ValueError:
+    SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+
+# Scraper HTTP cache (conditional GET with ETag / Last-Modified)
+ENABLE_HTTP_CACHE = os.getenv('ENABLE_HTTP_CACHE', 'True').lower() == 'true'
+
+try:
+    HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', '604800'))
+except ValueError:
+    HTTP_CACHE_MAX_AGE = 604800
+
+try:
+    HTTP_CACHE_MAX_BYTES = int(os.getenv('HTTP_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+except ValueError:
+    HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# HTML parser backend for the scraper: 'auto' (lxml when installed), 'lxml' or 'html.parser'
+HTML_PARSER_BACKEND = os.getenv('HTML_PARSER_BACKEND', 'auto')
+
 # ✅ **FIXED: Added the missing ENABLED_MODULES configuration**
 ENABLED_MODULES = [
     'technical_seo',
@@ -190,7 +617,8 @@ def ensure_database_schema():
         ('email_sent_at', 'TIMESTAMP'),
         ('completed_at', 'TIMESTAMP'),
         ('customer_ip', 'TEXT DEFAULT ""'),
-        ('user_agent', 'TEXT DEFAULT ""')
+        ('user_agent', 'TEXT DEFAULT ""'),
+        ('content_fingerprint', 'TEXT DEFAULT ""')
     ]
 
     try:
@@ -166,6 +166,7 @@ setup_permissions() {
     # Make scripts executable
     chmod +x deploy.sh 2>/dev/null || true
     chmod +x run_production.py 2>/dev/null || true
+    chmod +x run_worker.py deploy/docker-start.sh 2>/dev/null || true
     
     # Ensure log directories are writable
     chmod 755 logs cache reports 2>/dev/null || true
@@ -230,7 +231,8 @@ deploy() {
     echo ""
     log "📋 Application ready to start:"
     echo "   Development: ./deploy.sh dev"
-    echo "   Production:  ./deploy.sh start"
+    echo "   Production:  ./deploy.sh start   (web server and audit workers)"
+    echo "   Workers only: ./deploy.sh worker"
     echo "   Docker:      docker-compose up --build"
     echo ""
     log "📊 Available endpoints:"
@@ -251,10 +253,19 @@ case "${1:-deploy}" in
         deploy
         ;;
     "start")
-        log "🚀 Starting production server..."
+        log "🚀 Starting audit workers and production server..."
         check_and_activate_venv
+        # /api/audit queues audits; the worker supervisor runs them
+        python run_worker.py &
+        worker_pid=$!
+        trap 'kill -TERM $worker_pid 2>/dev/null; wait $worker_pid' EXIT
         python run_production.py "${@:2}"
         ;;
+    "worker")
+        log "🚀 Starting audit workers..."
+        check_and_activate_venv
+        python run_worker.py "${@:2}"
+        ;;
     "dev")
         log "🚀 Starting development server..."
         check_and_activate_venv
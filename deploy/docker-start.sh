@@ -0,0 +1,25 @@
+#!/bin/sh
+# File: deploy/docker-start.sh
+# Container entrypoint: the web server plus the audit worker supervisor
+#
+# /api/audit only enqueues audits when ENABLE_JOB_QUEUE is on, so a container
+# running the web server alone would never complete one. docker-compose.yml
+# runs the workers as their own service and starts the web server directly.
+
+queue=$(echo "${ENABLE_JOB_QUEUE:-True}" | tr '[:upper:]' '[:lower:]')
+if [ "$queue" != "true" ]; then
+    exec python run_production.py "$@"
+fi
+
+python run_worker.py &
+worker=$!
+python run_production.py "$@" &
+server=$!
+
+trap 'kill -TERM "$server" "$worker" 2>/dev/null' TERM INT
+# Stop when either process exits, so the container restarts as a whole
+while kill -0 "$server" 2>/dev/null && kill -0 "$worker" 2>/dev/null; do
+    sleep 5
+done
+kill -TERM "$server" "$worker" 2>/dev/null
+wait
@@ -0,0 +1,29 @@
+# File: gunicorn.conf.py
+# Gunicorn server hooks for SEO Auditor (command-line options live in run_production.py)
+
+def post_worker_init(worker):
+    """Warm-start the HTML parse pool once the worker has booted.
+
+    Runs after the gevent worker has monkey-patched the process, so the pool's
+    management thread and result waits cooperate with the event loop.
+    """
+    from config.settings import ENABLE_PARSE_POOL
+    if not ENABLE_PARSE_POOL:
+        return
+
+    from services import parse_pool
+    try:
+        parse_pool.warm_start()
+    except Exception as e:
+        # The pool also starts lazily on first use, so a failed warm start is not fatal
+        worker.log.warning(f"HTML parse pool warm start failed: {e}")
+
+def worker_exit(server, worker):
+    """Stop the parse pool's child processes and close the LLM sessions with the worker"""
+    import sys
+    parse_pool = sys.modules.get('services.parse_pool')
+    if parse_pool is not None:
+        parse_pool.shutdown()
+    llm_client = sys.modules.get('services.llm_client')
+    if llm_client is not None:
+        llm_client.close_clients()
@@ -3,7 +3,7 @@
 
 import sqlite3
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from config.settings import DATABASE_PATH
 
@@ -49,7 +49,8 @@ def init_database():
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 completed_at TIMESTAMP,
                 customer_ip TEXT DEFAULT '',
-                user_agent TEXT DEFAULT ''
+                user_agent TEXT DEFAULT '',
+                content_fingerprint TEXT DEFAULT ''
             )
         ''')
         
@@ -121,14 +122,46 @@ def init_database():
             )
         ''')
         
+        # Audit runs and the output of each completed stage, so a failed or
+        # interrupted audit can resume without repeating the scrape and analysis
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS audit_runs (
+                run_id TEXT PRIMARY KEY,
+                audit_type TEXT NOT NULL,
+                url TEXT NOT NULL,
+                email TEXT NOT NULL,
+                company TEXT DEFAULT '',
+                industry TEXT DEFAULT '',
+                bypass_cache INTEGER DEFAULT 0,
+                status TEXT DEFAULT 'running',
+                stage_errors TEXT DEFAULT '{}',
+                attempts INTEGER DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS audit_checkpoints (
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                output TEXT,
+                completed_at TIMESTAMP,
+                PRIMARY KEY (run_id, stage),
+                FOREIGN KEY (run_id) REFERENCES audit_runs (run_id)
+            )
+        ''')
+        
         # Create indexes for better performance
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_audits_email ON audits(email)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_audits_created_at ON audits(created_at)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_audits_audit_type ON audits(audit_type)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_audits_payment_status ON audits(payment_status)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_audits_content_fingerprint ON audits(content_fingerprint, audit_type)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_premium_customers_email ON premium_customers(email)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_leads_email ON leads(email)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_leads_created_at ON leads(created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_audit_runs_status ON audit_runs(status, updated_at)')
 
 def save_audit_data(email: str, url: str, audit_data: dict, **kwargs):
     """Save enhanced audit data to database with proper transaction handling"""
@@ -140,6 +173,7 @@ def save_audit_data(email: str, url: str, audit_data: dict, **kwargs):
     payment_amount = kwargs.get('payment_amount', audit_data.get('payment_amount', 0))
     customer_ip = kwargs.get('customer_ip', '')
     user_agent = kwargs.get('user_agent', '')
+    content_fingerprint = kwargs.get('content_fingerprint', '')
     
     # Extract scores from audit data
     executive_summary = audit_data.get('executive_summary', {})
@@ -166,8 +200,8 @@ def save_audit_data(email: str, url: str, audit_data: dict, **kwargs):
                     annual_opportunity_cost, implementation_complexity, expected_roi_timeline,
                     technical_score, content_score, ai_readiness_score, voice_search_score,
                     schema_markup_score, competitive_position_score, audit_data,
-                    customer_ip, user_agent, completed_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    customer_ip, user_agent, completed_at, content_fingerprint
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 email, url, company, industry, audit_type, payment_amount,
                 overall_score, business_impact, monthly_loss, annual_cost, complexity, roi_timeline,
@@ -178,7 +212,7 @@ def save_audit_data(email: str, url: str, audit_data: dict, **kwargs):
                 category_scores.get('schema_markup', 0),
                 category_scores.get('competitive_position', 0),
                 json.dumps(audit_data),
-                customer_ip, user_agent, datetime.now()
+                customer_ip, user_agent, datetime.now(), content_fingerprint
             ))
             
             audit_id = cursor.lastrowid
@@ -441,4 +475,151 @@ def get_recent_audit_data(audit_id: int) -> Optional[Dict]:
                 }
             except json.JSONDecodeError:
                 return None
-        return None
\ No newline at end of file
+        return None
+
+def find_reusable_analysis(content_fingerprint: str, audit_type: str, max_age_hours: int) -> Optional[Dict]:
+    """Get the newest stored analysis for identical page content within the freshness window"""
+    if not content_fingerprint:
+        return None
+    
+    cutoff = datetime.now() - timedelta(hours=max_age_hours)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, audit_data FROM audits
+            WHERE content_fingerprint = ? AND audit_type = ? AND completed_at > ?
+            ORDER BY completed_at DESC
+            LIMIT 1
+        ''', (content_fingerprint, audit_type, cutoff))
+        
+        result = cursor.fetchone()
+        if not result or not result[1]:
+            return None
+        
+        try:
+            audit_data = json.loads(result[1])
+        except json.JSONDecodeError:
+            return None
+        
+        # Reused analyses are saved again, so check the age of the original generation
+        generated_at = audit_data.get('analysis_generated_at')
+        if generated_at:
+            try:
+                if datetime.fromisoformat(generated_at) < cutoff:
+                    return None
+            except ValueError:
+                return None
+        
+        return {'audit_id': result[0], 'audit_data': audit_data}
+
+def start_audit_run(run_id: str, audit_type: str, url: str, email: str, company: str = '', industry: str = '',
+                    bypass_cache: bool = False) -> Dict:
+    """Record a new audit run, or mark an existing one as running again, and return it"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO audit_runs (
+                run_id, audit_type, url, email, company, industry, bypass_cache, attempts, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
+        ''', (run_id, audit_type, url, email, company, industry, int(bypass_cache), datetime.now()))
+        cursor.execute('''
+            UPDATE audit_runs SET status = 'running', attempts = attempts + 1, updated_at = ?
+            WHERE run_id = ?
+        ''', (datetime.now(), run_id))
+    return get_audit_run(run_id)
+
+def save_stage_checkpoint(run_id: str, stage: str, output):
+    """Store the output of a completed audit stage"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO audit_checkpoints (run_id, stage, output, completed_at)
+            VALUES (?, ?, ?, ?)
+        ''', (run_id, stage, json.dumps(output, default=str), datetime.now()))
+
+def get_stage_checkpoints(run_id: str) -> Dict:
+    """Outputs of the completed stages of an audit run, by stage name"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT stage, output FROM audit_checkpoints WHERE run_id = ?', (run_id,))
+        return {row['stage']: json.loads(row['output']) for row in cursor.fetchall()}
+
+def delete_stage_checkpoints(run_id: str, stages: List[str]):
+    """Forget completed stages so the next resume runs them again"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany('DELETE FROM audit_checkpoints WHERE run_id = ? AND stage = ?',
+                           [(run_id, stage) for stage in stages])
+
+def finish_audit_run(run_id: str, status: str, stage_errors: Dict):
+    """Record how an audit run ended ('completed' or 'failed') and the errors of failed stages"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE audit_runs SET status = ?, stage_errors = ?, updated_at = ?
+            WHERE run_id = ?
+        ''', (status, json.dumps(stage_errors), datetime.now(), run_id))
+
+def get_audit_run(run_id: str) -> Optional[Dict]:
+    """An audit run with its stage errors and when each stage completed"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM audit_runs WHERE run_id = ?', (run_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        cursor.execute('SELECT stage, completed_at FROM audit_checkpoints WHERE run_id = ? ORDER BY completed_at',
+                       (run_id,))
+        completed = {stage: completed_at for stage, completed_at in cursor.fetchall()}
+    
+    run = dict(row)
+    run['bypass_cache'] = bool(run['bypass_cache'])
+    run['stage_errors'] = json.loads(run['stage_errors'] or '{}')
+    run['completed_stages'] = completed
+    return run
+
+def list_audit_runs(status: str = None, limit: int = 50) -> List[Dict]:
+    """Most recently updated audit runs, optionally only those with the given status"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if status:
+            cursor.execute('''
+                SELECT run_id, audit_type, url, email, status, stage_errors, attempts, created_at, updated_at
+                FROM audit_runs WHERE status = ? ORDER BY updated_at DESC LIMIT ?
+            ''', (status, limit))
+        else:
+            cursor.execute('''
+                SELECT run_id, audit_type, url, email, status, stage_errors, attempts, created_at, updated_at
+                FROM audit_runs ORDER BY updated_at DESC LIMIT ?
+            ''', (limit,))
+        rows = cursor.fetchall()
+    
+    return [{**dict(row), 'stage_errors': json.loads(row['stage_errors'] or '{}')} for row in rows]
+
+def fail_stale_audit_runs(max_age_seconds: int) -> int:
+    """Mark runs still 'running' max_age_seconds after they (re)started as failed.
+
+    Such a run was interrupted by a restart or crash. Runs from the job queue
+    are retried by the queue; inline runs are only resumed by an admin retry.
+    """
+    cutoff = datetime.now() - timedelta(seconds=max_age_seconds)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE audit_runs SET status = 'failed', stage_errors = ?, updated_at = ?
+            WHERE status = 'running' AND updated_at < ?
+        ''', (json.dumps({'run': 'Interrupted before it finished'}), datetime.now(), cutoff))
+        return cursor.rowcount
+
+def purge_audit_runs(max_age_hours: int) -> int:
+    """Delete audit runs (and their checkpoints) of any status not updated for max_age_hours"""
+    cutoff = datetime.now() - timedelta(hours=max_age_hours)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            DELETE FROM audit_checkpoints WHERE run_id IN (
+                SELECT run_id FROM audit_runs WHERE updated_at < ?
+            )
+        ''', (cutoff,))
+        cursor.execute('DELETE FROM audit_runs WHERE updated_at < ?', (cutoff,))
+        return cursor.rowcount
@@ -328,8 +328,9 @@ Development:
 ${GREEN}source venv/bin/activate${NC}
 ${GREEN}python app.py${NC}
 
-Production:
+Production (audits are queued, so start the workers too):
 ${GREEN}source venv/bin/activate${NC}
+${GREEN}python run_worker.py &${NC}
 ${GREEN}python run_production.py${NC}
 
 ${BLUE}🌐 APPLICATION ENDPOINTS:${NC}
@@ -3,15 +3,28 @@
 
 import os
 import time
+import hmac
 import threading
+from functools import wraps
 import stripe
 from flask import Blueprint, request, jsonify, send_file
 from services.seo_auditor import SEOAuditor
 from services.cache_service import cache
+from services.web_scraper import page_cache
+from services.llm_cache import llm_cache
+from services.coalescer import audit_coalescer
+from services.job_queue import job_queue, QueueFullError
 from utils.helpers import clean_url, is_valid_email, is_valid_url
 from utils.rate_limiter import rate_limit, email_rate_limit
+from utils.concurrency_limiter import CapacityExceeded, audit_limiter
+from utils.circuit_breaker import get_breaker_stats
+from services import provider_router
+from utils.metrics import metrics
 from utils.logging_config import log_audit_request, log_audit_completion, log_error
-from config.settings import STRIPE_SECRET_KEY
+from models.database import get_audit_run, list_audit_runs, fail_stale_audit_runs
+from config.settings import (
+    STRIPE_SECRET_KEY, ENABLE_JOB_QUEUE, QUEUE_FULL_RETRY_AFTER, ADMIN_API_KEY, AUDIT_RUN_STALE_SECONDS
+)
 
 # Initialize Stripe
 stripe.api_key = STRIPE_SECRET_KEY
@@ -19,6 +32,31 @@ stripe.api_key = STRIPE_SECRET_KEY
 api_bp = Blueprint('api', __name__)
 auditor = SEOAuditor()
 
+def busy_response(audit_type: str, reason: str):
+    """Fast 503 with Retry-After, for when audits are arriving faster than they can run"""
+    metrics.increment(f'{reason}.{audit_type}')
+    response = jsonify({
+        'success': False,
+        'error': 'We are processing a high volume of audits. Please try again in a minute.'
+    })
+    response.headers['Retry-After'] = str(QUEUE_FULL_RETRY_AFTER)
+    return response, 503
+
+def is_admin_request() -> bool:
+    """Whether the request carries the ADMIN_API_KEY in the X-Admin-Key header"""
+    return bool(ADMIN_API_KEY) and hmac.compare_digest(request.headers.get('X-Admin-Key', ''), ADMIN_API_KEY)
+
+def admin_required(f):
+    """Require the ADMIN_API_KEY in the X-Admin-Key header"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not ADMIN_API_KEY:
+            return jsonify({'success': False, 'error': 'Admin endpoints are not configured'}), 403
+        if not is_admin_request():
+            return jsonify({'success': False, 'error': 'Invalid admin key'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
 @api_bp.route('/audit', methods=['POST'])
 @rate_limit(limit=100, window=3600, per='ip')  # Increased for premium service
 def run_audit():
@@ -38,6 +76,9 @@ def run_audit():
         payment_amount = data.get('payment_amount', 0)
         company = data.get('company', '').strip()
         industry = data.get('industry', '').strip()
+        # refresh=true skips every cache layer and forces a fresh analysis; it costs a
+        # full scrape and LLM call, so only admin callers may ask for it
+        bypass_cache = data.get('refresh') is True and is_admin_request()
         
         # Validation
         if not url:
@@ -74,7 +115,7 @@ def run_audit():
         # Check cache for premium audits (shorter cache time)
         cache_key = f"{audit_type}_{url}"
         try:
-            if audit_type == 'free':
+            if audit_type == 'free' and not bypass_cache:
                 cached_result = cache.get(url)
                 if cached_result:
                     # Send email with cached results for free audits
@@ -102,12 +143,47 @@ def run_audit():
         except Exception as e:
             print(f"Cache check error (non-fatal): {e}")
         
+        # Queue the audit for the background workers and answer at once
+        if ENABLE_JOB_QUEUE:
+            try:
+                job_id = job_queue.enqueue(audit_type, {
+                    'url': url,
+                    'email': email,
+                    'company': company,
+                    'industry': industry,
+                    'payment_amount': payment_amount,
+                    'bypass_cache': bypass_cache
+                })
+            except QueueFullError as e:
+                # Shed load early rather than queue audits that would miss their deadline
+                return busy_response(audit_type, 'audit_jobs_rejected')
+            except Exception as e:
+                try:
+                    log_error('AUDIT_ENQUEUE_FAILED', str(e), {'url': url, 'email': email, 'type': audit_type})
+                except:
+                    pass
+                return jsonify({
+                    'success': False,
+                    'error': 'Failed to start audit. Please try again or contact support.'
+                }), 500
+            
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': f'/api/audit/status/{job_id}',
+                'audit_type': audit_type
+            }), 202
+        
         # Run audit (premium or free)
         try:
             if audit_type == 'premium':
-                result = auditor.run_premium_audit(url, email, company, industry)
+                result = auditor.run_premium_audit(url, email, company, industry, bypass_cache=bypass_cache)
             else:
-                result = auditor.run_full_audit(url, email)
+                result = auditor.run_full_audit(url, email, bypass_cache=bypass_cache)
+        except CapacityExceeded as e:
+            # MAX_CONCURRENT_AUDITS are running and the wait queue is full
+            return busy_response(audit_type, 'audits_rejected')
         except Exception as e:
             try:
                 log_error('AUDIT_EXCEPTION', str(e), {'url': url, 'email': email, 'type': audit_type})
@@ -170,6 +246,96 @@ def run_audit():
             'error': 'An unexpected error occurred. Please try again or contact support.'
         }), 500
 
+@api_bp.route('/audit/status/<job_id>')
+def audit_status(job_id):
+    """Progress of a queued audit, and its result once finished"""
+    try:
+        job = job_queue.get(job_id)
+    except Exception as e:
+        return jsonify({'success': False, 'error': 'Failed to get audit status'}), 500
+    
+    if job is None:
+        return jsonify({'success': False, 'error': 'Audit job not found'}), 404
+    
+    response = {
+        'success': True,
+        'job_id': job_id,
+        'status': job['status'],
+        'audit_type': job['audit_type'],
+        'progress': job['progress'],
+        'attempts': job['attempts'],
+        'queued_seconds': round((job['started_at'] or time.time()) - job['created_at'], 1)
+    }
+    if job['status'] == 'succeeded':
+        response['result'] = job['result']
+    elif job['status'] == 'failed':
+        response['error'] = job['error'] or 'Audit failed. Please check the URL and try again.'
+    elif job['status'] == 'shed':
+        response['error'] = job['error']
+    return jsonify(response)
+
+@api_bp.route('/admin/audits')
+@admin_required
+def admin_audit_runs():
+    """Recent audit runs, e.g. ?status=failed for the ones that need a retry (admin endpoint)"""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid limit'}), 400
+    try:
+        # Runs interrupted by a restart would otherwise show as running forever
+        fail_stale_audit_runs(AUDIT_RUN_STALE_SECONDS)
+        runs = list_audit_runs(request.args.get('status'), limit)
+    except Exception as e:
+        return jsonify({'success': False, 'error': 'Failed to list audit runs'}), 500
+    return jsonify({'success': True, 'runs': runs})
+
+@api_bp.route('/admin/audits/<run_id>')
+@admin_required
+def audit_run_status(run_id):
+    """An audit run's status, completed stages and stage errors (admin endpoint)"""
+    try:
+        run = get_audit_run(run_id)
+    except Exception as e:
+        return jsonify({'success': False, 'error': 'Failed to get audit run'}), 500
+    if run is None:
+        return jsonify({'success': False, 'error': 'Audit run not found'}), 404
+    return jsonify({'success': True, 'run': run})
+
+@api_bp.route('/admin/audits/<run_id>/retry', methods=['POST'])
+@admin_required
+def retry_audit_run(run_id):
+    """Resume an audit run from its last completed stage (admin endpoint).
+
+    Only stages that did not complete run again, so a failed email does not
+    repeat the scrape and analysis. {"stages": ["pdf"]} forces the named
+    stages (and the stages after them) to run again.
+    """
+    data = request.get_json(silent=True) or {}
+    stages = data.get('stages')
+    if stages is not None and not (isinstance(stages, list) and all(isinstance(stage, str) for stage in stages)):
+        return jsonify({'success': False, 'error': 'stages must be a list of stage names'}), 400
+    
+    try:
+        result = auditor.resume_audit(run_id, rerun=stages)
+    except CapacityExceeded as e:
+        return busy_response('retry', 'audits_rejected')
+    except Exception as e:
+        try:
+            log_error('AUDIT_RETRY_FAILED', str(e), {'run_id': run_id})
+        except:
+            pass
+        return jsonify({'success': False, 'error': 'Failed to retry audit'}), 500
+    
+    if not result.get('success'):
+        if 'run' in result:
+            # The retry ran and a stage failed again
+            status = 500
+        else:
+            status = 404 if result.get('error') == 'Audit run not found' else 400
+        return jsonify(result), status
+    return jsonify(result)
+
 @api_bp.route('/payment/create-session', methods=['POST'])
 def create_payment_session():
     """Create Stripe checkout session for $997 premium audit"""
@@ -357,11 +523,23 @@ def cache_stats():
         stats = cache.get_cache_stats()
         return jsonify({
             'success': True,
-            'stats': stats
+            'stats': stats,
+            'page_cache': page_cache.get_cache_stats(),
+            'llm_cache': llm_cache.get_cache_stats(),
+            'audit_coalescing': audit_coalescer.get_stats()
         })
     except Exception as e:
         return jsonify({'success': False, 'error': 'Failed to get cache stats'}), 500
 
+@api_bp.route('/metrics')
+def get_metrics():
+    """Latency histograms and counters for this worker process"""
+    return jsonify({
+        'pid': os.getpid(),
+        **metrics.snapshot(),
+        'timestamp': time.time()
+    })
+
 @api_bp.route('/cache/clear', methods=['POST'])
 def clear_cache():
     """Clear cache (admin endpoint)"""
@@ -397,6 +575,16 @@ def health_check():
     except:
         email_status = 'error'
     
+    try:
+        job_stats = {'enabled': ENABLE_JOB_QUEUE, **job_queue.get_stats()}
+    except Exception:
+        job_stats = {'enabled': ENABLE_JOB_QUEUE, 'error': 'unavailable'}
+    
+    try:
+        admission_stats = audit_limiter.get_stats()
+    except Exception:
+        admission_stats = {'enabled': audit_limiter.enabled, 'error': 'unavailable'}
+    
     return jsonify({
         'status': 'healthy',
         'version': '3.0.0',
@@ -408,6 +596,10 @@ def health_check():
             'email_delivery': email_status,
             'payment_processing': 'healthy' if STRIPE_SECRET_KEY else 'not_configured'
         },
+        'ai_provider_circuits': get_breaker_stats(),
+        'ai_provider_routing': provider_router.get_stats(),
+        'audit_jobs': job_stats,
+        'audit_admission': admission_stats,
         'timestamp': time.time()
     })
 
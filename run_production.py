@@ -117,6 +117,7 @@ def build_gunicorn_command(args):
         '--max-requests', str(args.max_requests),
         '--max-requests-jitter', str(args.max_requests_jitter),
         '--preload',
+        '--config', 'gunicorn.conf.py',
         '--access-logfile', 'logs/access.log',
         '--error-logfile', 'logs/error.log',
         '--log-file', 'logs/gunicorn.log',
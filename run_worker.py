@@ -0,0 +1,102 @@
+# File: run_worker.py
+# Background audit worker pool for SEO Auditor
+
+#!/usr/bin/env python3
+"""
+Background audit worker pool.
+
+/api/audit enqueues audits in the SQLite job queue (services/job_queue.py);
+this process runs AUDIT_WORKER_PROCESSES worker processes that execute them.
+Run it next to the web server, with the same .env:
+
+    python run_worker.py --processes 4
+
+Workers that exit unexpectedly are restarted. SIGTERM/SIGINT stop claiming new
+jobs and let the jobs in progress finish; a job cut off by a hard kill is
+picked up again once its lease lapses.
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import multiprocessing
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# How often the supervisor checks workers and purges old jobs (seconds)
+SUPERVISE_INTERVAL = 5
+PURGE_INTERVAL = 3600
+
+def worker_main(stop):
+    """Entry point of one worker process"""
+    # The supervisor handles Ctrl+C; workers only stop through the shared event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    from services.audit_worker import AuditWorker
+    from services.llm_client import close_clients
+    try:
+        AuditWorker().run(stop)
+    finally:
+        close_clients()
+
+def main():
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from config.settings import AUDIT_WORKER_PROCESSES, JOB_RETENTION_HOURS, AUDIT_RUN_STALE_SECONDS
+
+    parser = argparse.ArgumentParser(description='Run the background audit worker pool')
+    parser.add_argument('--processes', type=int, default=AUDIT_WORKER_PROCESSES,
+                        help=f'worker processes (default: {AUDIT_WORKER_PROCESSES})')
+    args = parser.parse_args()
+
+    from services.job_queue import job_queue
+    from models.database import purge_audit_runs, fail_stale_audit_runs
+
+    stop = multiprocessing.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+    def start_worker():
+        process = multiprocessing.Process(target=worker_main, args=(stop,), daemon=False)
+        process.start()
+        logger.info(f'Started audit worker process {process.pid}')
+        return process
+
+    workers = [start_worker() for _ in range(max(1, args.processes))]
+    last_purge = 0.0
+
+    while not stop.is_set():
+        for index, process in enumerate(workers):
+            if not process.is_alive():
+                logger.warning(f'Audit worker {process.pid} exited with code {process.exitcode}, restarting')
+                workers[index] = start_worker()
+        if time.time() - last_purge > PURGE_INTERVAL:
+            try:
+                purged = job_queue.purge()
+                if purged:
+                    logger.info(f'Purged {purged} finished jobs')
+                stale = fail_stale_audit_runs(AUDIT_RUN_STALE_SECONDS)
+                if stale:
+                    logger.warning(f'Marked {stale} interrupted audit runs as failed')
+                purged = purge_audit_runs(JOB_RETENTION_HOURS)
+                if purged:
+                    logger.info(f'Purged {purged} old audit runs')
+            except Exception as e:
+                logger.warning(f'Job purge failed: {e}')
+            last_purge = time.time()
+        stop.wait(SUPERVISE_INTERVAL)
+
+    logger.info('Stopping audit workers after their current jobs...')
+    for process in workers:
+        process.join()
+    logger.info('All audit workers stopped')
+
+if __name__ == '__main__':
+    main()
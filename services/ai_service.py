@@ -1,257 +1,334 @@
 # File: services/ai_service.py
 # Enhanced AI service for $997 premium audit
 
-import openai
-import requests
-import json
-from typing import Dict, List
-from config.settings import OPENAI_API_KEY, OPENROUTER_API_KEY, OPENROUTER_BASE_URL
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from config.settings import (
+    ENABLE_LLM_CACHE, AI_SECTION_ATTEMPTS, AI_SECTION_TIMEOUT, AI_RETRY_BACKOFF_BASE, AI_RETRY_BACKOFF_MAX,
+    ENABLE_LLM_STREAMING, PROMPT_CONTENT_TOKENS, PROMPT_MAX_HEADINGS
+)
+from services import llm_client, provider_router
+from services.model_routing import get_route, planned_sections, section_max_tokens, UsageTotals, record_analysis
+from services.llm_client import LLMError
+from services.analysis_sections import SECTIONS, build_section_prompt, valid_keys
+from services.token_budget import compress_text, compact_list
+from utils import async_runner
+from utils.circuit_breaker import backoff_delay
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.json_stream import ObjectStreamParser
+from utils.json_repair import parse_llm_json
+from utils.metrics import metrics
+from utils.helpers import truncate_text
+from services.llm_cache import llm_cache, make_key
+from services.score_engine import score_website
 
-# Set OpenAI API key
-openai.api_key = OPENAI_API_KEY
+SYSTEM_PROMPT = "You are an elite SEO consultant who charges $2500 for comprehensive audits. Your analysis must be thorough, actionable, and business-focused. Every recommendation should have clear ROI potential."
 
-def analyze_with_ai(website_data: Dict) -> Dict:
-    """Enhanced AI analysis worth $997 - comprehensive business-grade audit"""
+def analyze_with_ai(website_data: Dict, bypass_cache: bool = False, deadline: Optional[Deadline] = None,
+                    on_section: Optional[Callable[[str, Dict], None]] = None,
+                    audit_type: str = 'premium') -> Dict:
+    """Enhanced AI analysis worth $997 - comprehensive business-grade audit.
+
+    Each section in analysis_sections.SECTIONS is generated by its own prompt,
+    all sections concurrently, and merged into one audit_data dict. A section
+    that still fails after its retries is filled from the fallback analysis
+    and listed in 'fallback_sections'; if every section fails the whole
+    fallback analysis is returned.
+
+    audit_type selects the routing policy (services.model_routing): the
+    models, token limits, prompt size and latency target used. Sections the
+    tier does not generate come from the rule-based fallback analysis.
+
+    Identical prompts are answered from the LLM response cache unless
+    bypass_cache is set (the fresh response then replaces the cached one).
+
+    With a deadline, every provider call and retry fits in the time left;
+    sections still pending when it runs out are filled from the fallback.
+
+    on_section(name, result) is called as soon as each section is complete -
+    with streaming, usually before its completion has finished - so later
+    stages can start on finished sections. It runs on the background event
+    loop thread and must return quickly.
+    """
+    route = get_route(audit_type)
+    context = build_website_context(website_data, route['content_tokens'])
+    
+    if deadline is not None and deadline.expired():
+        print("No time left for AI analysis, using fallback analysis")
+        return generate_premium_fallback_analysis(website_data)
+    if route['latency_target']:
+        deadline = deadline.within(route['latency_target']) if deadline is not None else Deadline(route['latency_target'])
     
-    # Enhanced prompt for premium $997 audit
-    premium_prompt = f"""
-    You are conducting a $997 enterprise-level AI SEO audit that must deliver exceptional business value. 
-    This audit should provide actionable insights worth 10x the investment cost.
+    try:
+        if deadline is not None:
+            outer_timeout = deadline.remaining() + 5
+        else:
+            outer_timeout = AI_SECTION_TIMEOUT * AI_SECTION_ATTEMPTS * len(route['providers']) + 10
+        results = async_runner.run(generate_sections(context, bypass_cache, deadline, on_section, route),
+                                   timeout=outer_timeout)
+    except Exception as e:
+        print(f"Sectional AI analysis failed: {e}")
+        return generate_premium_fallback_analysis(website_data)
+    
+    failed_sections = [name for name, result in results.items() if result is None]
+    if len(failed_sections) == len(results):
+        print("All AI analysis sections failed, using fallback analysis")
+        return generate_premium_fallback_analysis(website_data)
+    
+    rule_sections = [section['name'] for section in SECTIONS if section['name'] not in results]
+    fallback = generate_premium_fallback_analysis(website_data) if failed_sections or rule_sections else {}
+    ai_analysis = {}
+    for section in SECTIONS:
+        result = results.get(section['name']) or fallback
+        for key in section['keys']:
+            ai_analysis[key] = result[key]
+    
+    if failed_sections:
+        print(f"AI analysis sections filled from fallback: {', '.join(failed_sections)}")
+        ai_analysis['fallback_sections'] = failed_sections
+    if rule_sections:
+        ai_analysis['rule_based_sections'] = rule_sections
+    
+    # Enhance with additional calculated metrics
+    return enhance_analysis_with_metrics(ai_analysis, website_data)
+
+def build_website_context(website_data: Dict, content_tokens: int = PROMPT_CONTENT_TOKENS) -> str:
+    """Scraped facts shared by every section prompt.
 
+    Page text is cut down to content_tokens of its most informative
+    sentences (navigation and boilerplate removed), and free-form fields and
+    heading lists are capped, so the prompt size no longer depends on the site.
+    """
+    truncation_note = ''
+    if website_data.get('content_truncated'):
+        truncation_note = (f"NOTE: The page exceeded the download size limit and was truncated; "
+                           f"findings are based on the first {website_data.get('bytes_downloaded', 0)} bytes.")
+    
+    title = website_data.get('title', 'N/A') or ''
+    h1_tags = website_data.get('h1_tags', [])
+    content_sample = compress_text(
+        website_data.get('main_text') or website_data.get('content_text', ''),
+        content_tokens,
+        keywords=[title] + list(h1_tags)
+    )
+    
+    return f"""
     WEBSITE ANALYSIS DATA:
-    URL: {website_data.get('url', 'N/A')}
-    Title: {website_data.get('title', 'N/A')}
-    Meta Description: {website_data.get('meta_description', 'N/A')}
-    H1 Tags: {website_data.get('h1_tags', [])}
+    URL: {truncate_text(website_data.get('url', 'N/A'), 200)}
+    Title: {truncate_text(title, 200)}
+    Meta Description: {truncate_text(website_data.get('meta_description', 'N/A') or '', 400)}
+    H1 Tags: {compact_list(h1_tags, PROMPT_MAX_HEADINGS)}
     Content Length: {website_data.get('content_length', 0)} characters
     Schema Markup: {website_data.get('has_schema', False)}
-    Schema Types: {website_data.get('schema_types', [])}
+    Schema Types: {compact_list(website_data.get('schema_types', []), PROMPT_MAX_HEADINGS)}
     Images without Alt: {website_data.get('images_without_alt', 0)}/{website_data.get('images', 0)}
     SSL Certificate: {website_data.get('ssl_certificate', False)}
     Internal Links: {website_data.get('internal_links', 0)}
     External Links: {website_data.get('external_links', 0)}
     
-    Content Sample: {website_data.get('content_text', '')[:3000]}
-
-    CONDUCT A COMPREHENSIVE $997-VALUE ANALYSIS INCLUDING:
+    Content Sample: {content_sample}
+    {truncation_note}
+    {format_site_summary(website_data.get('site_summary'))}
+    """
 
-    1. BUSINESS IMPACT ASSESSMENT
-    - Estimate current monthly organic traffic loss
-    - Calculate revenue impact at $50 per visitor
-    - Project 12-month opportunity cost
-    - Benchmark against industry standards
+async def generate_sections(context: str, bypass_cache: bool = False, deadline: Optional[Deadline] = None,
+                            on_section: Optional[Callable[[str, Dict], None]] = None,
+                            route: Optional[Dict] = None) -> Dict[str, Optional[Dict]]:
+    """Generate the route's sections concurrently; failed sections map to None.
 
-    2. COMPETITOR INTELLIGENCE 
-    - Identify likely top 5 competitors based on content/industry
-    - Analyze competitive advantages they may have
-    - Find content gaps and opportunities
-    - Estimate their traffic and market share
+    Records time to first section, the total generation time and, per tier,
+    latency and cost as metrics.
+    """
+    route = route or get_route(None)
+    sections = planned_sections(route)
+    usage = UsageTotals()
+    started = time.monotonic()
+    ready = []
 
-    3. AI SEARCH DOMINATION STRATEGY
-    - Google AI Overview optimization recommendations
-    - ChatGPT/Perplexity visibility strategy
-    - Voice search optimization roadmap
-    - Schema markup enhancement plan
+    def section_ready(name: str, result: Dict):
+        if not ready:
+            metrics.observe('ai_time_to_first_section_seconds', time.monotonic() - started)
+        ready.append(name)
+        if on_section is not None:
+            try:
+                on_section(name, result)
+            except Exception as e:
+                print(f"on_section callback failed for {name}: {e}")
 
-    4. TECHNICAL SEO PRIORITY MATRIX
-    - Critical issues (fix in weeks 1-2)
-    - High-impact improvements (weeks 3-6) 
-    - Long-term optimizations (weeks 7-12)
-    - Resource requirements for each
+    results = await asyncio.gather(*(
+        generate_section(section, context, bypass_cache, deadline,
+                         on_ready=lambda result, name=section['name']: section_ready(name, result),
+                         route=route, on_usage=usage.add)
+        for section in sections
+    ))
+    elapsed = time.monotonic() - started
+    metrics.observe('ai_analysis_seconds', elapsed)
+    record_analysis(route, elapsed, usage)
+    print(f"AI analysis ({route['tier']}): {elapsed:.1f}s, {usage.prompt_tokens + usage.completion_tokens} tokens, "
+          f"${usage.cost:.4f}")
+    return {section['name']: result for section, result in zip(sections, results)}
 
-    5. CONTENT STRATEGY BLUEPRINT
-    - AI-optimized content recommendations
-    - Topic clusters for authority building
-    - Question-based content for voice search
-    - Semantic keyword opportunities
+async def generate_section(section: Dict, context: str, bypass_cache: bool = False,
+                           deadline: Optional[Deadline] = None,
+                           on_ready: Optional[Callable[[Dict], None]] = None,
+                           route: Optional[Dict] = None,
+                           on_usage: Optional[Callable[[str, Dict], None]] = None) -> Optional[Dict]:
+    """Generate one section, retrying and then moving on to the next provider.
 
-    6. 90-DAY IMPLEMENTATION ROADMAP
-    - Week-by-week action items
-    - Priority ranking with business impact scores
-    - Resource allocation recommendations
-    - Success metrics and KPIs to track
+    Providers are tried fastest first by observed latency, and a slow call is
+    hedged onto the next provider (provider_router.hedged). Responses are
+    parsed tolerantly (utils.json_repair) and each key is checked against
+    AUDIT_DATA_SCHEMA; valid keys are kept across attempts and a retry asks
+    only for the keys still missing. Non-retryable provider errors (e.g. a missing API key or an open circuit)
+    skip straight to the next provider; retryable ones back off with jitter
+    first. Each call's timeout is capped by the deadline. Returns None when
+    every attempt failed or the deadline passed.
 
-    Provide analysis in this JSON format:
-    {{
-        "executive_summary": {{
-            "overall_score": 0-100,
-            "business_impact_rating": "Critical/High/Medium/Low",
-            "estimated_monthly_traffic_loss": 0,
-            "estimated_monthly_revenue_loss": 0,
-            "implementation_complexity": "Low/Medium/High",
-            "expected_roi_timeline": "30/60/90 days"
-        }},
-        "category_scores": {{
-            "technical_seo": 0-100,
-            "content_quality": 0-100,
-            "ai_readiness": 0-100,
-            "voice_search": 0-100,
-            "schema_markup": 0-100,
-            "competitive_position": 0-100
-        }},
-        "competitor_analysis": {{
-            "likely_competitors": [
-                {{
-                    "domain": "competitor1.com",
-                    "competitive_advantage": "explanation",
-                    "content_gaps": ["gap1", "gap2"],
-                    "estimated_traffic": "high/medium/low"
-                }}
-            ],
-            "market_opportunity": "detailed analysis",
-            "competitive_recommendations": ["action1", "action2"]
-        }},
-        "critical_issues": [
-            {{
-                "issue": "specific problem",
-                "business_impact": "high/medium/low", 
-                "implementation_effort": "1-4 weeks",
-                "expected_improvement": "specific outcome",
-                "priority_score": 1-10
-            }}
-        ],
-        "ai_search_strategy": {{
-            "google_ai_optimization": [
-                "specific recommendation with implementation steps"
-            ],
-            "chatgpt_visibility": [
-                "strategies to appear in AI responses"
-            ],
-            "voice_search_plan": [
-                "voice search optimization tactics"
-            ],
-            "schema_roadmap": [
-                "schema markup implementation plan"
-            ]
-        }},
-        "content_blueprint": {{
-            "priority_topics": [
-                {{
-                    "topic": "content topic",
-                    "search_volume": "estimated volume",
-                    "difficulty": "low/medium/high",
-                    "business_value": "revenue potential",
-                    "ai_opportunity": "AI search potential"
-                }}
-            ],
-            "content_gaps": ["missing content areas"],
-            "semantic_opportunities": ["related keyword clusters"]
-        }},
-        "implementation_roadmap": {{
-            "weeks_1_2": {{
-                "critical_fixes": ["immediate actions"],
-                "expected_impact": "projected improvements",
-                "resource_requirements": "time/people needed"
-            }},
-            "weeks_3_6": {{
-                "high_impact_improvements": ["medium-term actions"],
-                "expected_impact": "projected improvements", 
-                "resource_requirements": "time/people needed"
-            }},
-            "weeks_7_12": {{
-                "long_term_optimizations": ["strategic actions"],
-                "expected_impact": "projected improvements",
-                "resource_requirements": "time/people needed"
-            }}
-        }},
-        "roi_projections": {{
-            "30_day_impact": {{
-                "traffic_increase": "percentage",
-                "revenue_increase": "dollar amount",
-                "key_improvements": ["specific gains"]
-            }},
-            "90_day_impact": {{
-                "traffic_increase": "percentage", 
-                "revenue_increase": "dollar amount",
-                "market_position": "competitive improvement"
-            }},
-            "12_month_potential": {{
-                "traffic_increase": "percentage",
-                "revenue_increase": "dollar amount", 
-                "roi_multiple": "10x, 20x, etc"
-            }}
-        }},
-        "success_metrics": {{
-            "kpis_to_track": ["specific metrics"],
-            "measurement_tools": ["recommended tools"],
-            "reporting_frequency": "weekly/monthly",
-            "success_benchmarks": ["target numbers"]
-        }},
-        "next_steps": {{
-            "immediate_actions": ["first 3 things to do"],
-            "resource_procurement": ["tools/people needed"],
-            "timeline_milestones": ["key dates and goals"],
-            "risk_mitigation": ["potential challenges and solutions"]
-        }}
-    }}
+    Completions are streamed through an ObjectStreamParser, and on_ready is
+    called once, as soon as any call has produced all of the section's keys.
+    That result is the one returned, even if a hedged duplicate finishes first.
 
-    Make this analysis comprehensive enough to justify $997 investment with clear ROI potential.
+    The route supplies the providers and the section's max_tokens; on_usage
+    receives (model, usage) for every provider call that completed.
     """
+    route = route or get_route(None)
+    params = {"max_tokens": section_max_tokens(route, section), "temperature": 0.7}
+    ranked = provider_router.rank(route['providers'])
+    collected = {}
+    emitted = {}
     
-    # Try OpenAI first
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "You are an elite SEO consultant who charges $2500 for comprehensive audits. Your analysis must be thorough, actionable, and business-focused. Every recommendation should have clear ROI potential."
-                },
-                {"role": "user", "content": premium_prompt}
-            ],
-            max_tokens=4000,
-            temperature=0.7
-        )
-        
-        ai_analysis = json.loads(response.choices[0].message.content)
-        
-        # Enhance with additional calculated metrics
-        ai_analysis = enhance_analysis_with_metrics(ai_analysis, website_data)
-        
-        return ai_analysis
-        
-    except Exception as openai_error:
-        print(f"OpenAI failed: {openai_error}, trying OpenRouter...")
+    def complete(result: Dict) -> Dict:
+        if not emitted:
+            emitted.update(result)
+            if on_ready is not None:
+                on_ready(emitted)
+        return emitted
+    
+    def watch_stream():
+        if not ENABLE_LLM_STREAMING:
+            return None
+        parser = ObjectStreamParser()
+        partial = {}
         
-        # Fallback to OpenRouter
-        try:
-            return analyze_with_openrouter(premium_prompt)
-        except Exception as openrouter_error:
-            print(f"OpenRouter also failed: {openrouter_error}")
-            # Return enhanced fallback analysis for $997 value
-            return generate_premium_fallback_analysis(website_data)
-
-def analyze_with_openrouter(prompt: str) -> Dict:
-    """Use OpenRouter as fallback AI service with enhanced prompt"""
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
+        def on_delta(text: str):
+            partial.update(parser.feed(text))
+            if not emitted:
+                found = {**collected, **valid_keys(section, partial)}
+                if all(key in found for key in section['keys']):
+                    complete(found)
+        return on_delta
     
-    data = {
-        "model": "openai/gpt-4",
-        "messages": [
-            {
-                "role": "system", 
-                "content": "You are an elite SEO consultant who charges $2500 for comprehensive audits. Your analysis must be thorough, actionable, and business-focused."
-            },
-            {"role": "user", "content": prompt}
-        ],
-        "max_tokens": 4000,
-        "temperature": 0.7
-    }
+    for index, (provider, model) in enumerate(ranked):
+        hedge_target = ranked[index + 1] if index + 1 < len(ranked) else None
+        for attempt in range(1, AI_SECTION_ATTEMPTS + 1):
+            try:
+                timeout = deadline.cap(AI_SECTION_TIMEOUT) if deadline is not None else AI_SECTION_TIMEOUT
+            except DeadlineExceeded:
+                print(f"Section {section['name']}: deadline exceeded")
+                return None
+            
+            prompt = build_section_prompt(section, context, [key for key in section['keys'] if key not in collected])
+            messages = [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ]
+            
+            def call(provider, model, timeout=timeout, messages=messages):
+                record = (lambda usage: on_usage(model, usage)) if on_usage is not None else None
+                
+                async def answer():
+                    content = await llm_client.chat_completion(provider, model, messages, timeout=timeout,
+                                                               on_delta=watch_stream(), on_usage=record, **params)
+                    return model, content
+                return answer
+            
+            # Tagged with the model so a hedged answer is cached under the model that gave it
+            def send(provider=provider, model=model, hedge_target=hedge_target):
+                return provider_router.hedged(
+                    (provider, model), call(provider, model),
+                    hedge_target, call(*hedge_target) if hedge_target else None
+                )
+            
+            try:
+                result = await cached_chat_completion_async(model, SYSTEM_PROMPT, prompt, params, send, bypass_cache)
+            except LLMError as e:
+                print(f"Section {section['name']}: {provider} attempt {attempt} failed: {e}")
+                if emitted:
+                    return emitted
+                if not e.retryable:
+                    break
+                if attempt < AI_SECTION_ATTEMPTS:
+                    delay = backoff_delay(attempt, AI_RETRY_BACKOFF_BASE, AI_RETRY_BACKOFF_MAX)
+                    if deadline is not None:
+                        delay = min(delay, deadline.remaining())
+                    await asyncio.sleep(delay)
+                continue
+            except ValueError as e:
+                print(f"Section {section['name']}: {provider} attempt {attempt} returned invalid JSON: {e}")
+                if emitted:
+                    return emitted
+                continue
+            
+            collected.update(valid_keys(section, result))
+            if all(key in collected for key in section['keys']):
+                return complete(collected)
+            if emitted:
+                return emitted
+            missing = [key for key in section['keys'] if key not in collected]
+            print(f"Section {section['name']}: {provider} attempt {attempt} is missing or has invalid {', '.join(missing)}")
     
-    response = requests.post(
-        f"{OPENROUTER_BASE_URL}/chat/completions",
-        headers=headers,
-        json=data,
-        timeout=90
-    )
+    return None
+
+def format_site_summary(site_summary: Dict) -> str:
+    """Render the crawler's site-level rollup for the prompt (empty for single-page audits)"""
+    if not site_summary:
+        return ''
     
-    response.raise_for_status()
-    result = response.json()
+    return f"""
+    SITE CRAWL SUMMARY ({site_summary.get('pages_crawled', 0)} pages):
+    Pages Missing Title: {site_summary.get('pages_missing_title', 0)}
+    Pages Missing Meta Description: {site_summary.get('pages_missing_meta_description', 0)}
+    Pages Missing H1: {site_summary.get('pages_missing_h1', 0)}
+    Duplicate Titles: {site_summary.get('duplicate_titles', 0)}
+    Pages With Schema: {site_summary.get('pages_with_schema', 0)}
+    Thin Content Pages (<1000 chars): {site_summary.get('thin_content_pages', 0)}
+    Truncated Pages (over size limit): {site_summary.get('truncated_pages', 0)}
+    Images without Alt (site-wide): {site_summary.get('total_images_without_alt', 0)}/{site_summary.get('total_images', 0)}
+    robots.txt Present: {'Yes' if site_summary.get('robots_txt_found') else 'No'}
+    robots.txt Blocks Homepage: {'Yes' if site_summary.get('robots_blocks_homepage') else 'No'}
+    Pages Blocked by robots.txt: {site_summary.get('pages_blocked_by_robots', 0)}
+    Sitemap URLs Listed: {site_summary.get('sitemap_url_count', 0)}{'+' if site_summary.get('sitemap_url_count_capped') else ''}
+    """
+
+async def cached_chat_completion_async(model: str, system_prompt: str, user_prompt: str, params: Dict,
+                                       send: Callable[[], Awaitable[Tuple[str, str]]],
+                                       bypass_cache: bool = False) -> Dict:
+    """Parsed JSON from a chat completion, served from the LLM cache when possible.
+
+    send() performs the provider call and returns (model that answered,
+    message content); with hedging that may not be model. The content is
+    parsed with parse_llm_json (repairing fences, trailing commas and
+    truncation), and only responses that parse are stored, under the key of
+    the model that answered. The cache is SQLite, so its reads and writes run
+    in the loop's default executor rather than blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    cache_key = make_key(model, system_prompt, user_prompt, params)
+    if ENABLE_LLM_CACHE and not bypass_cache:
+        cached = await loop.run_in_executor(None, llm_cache.get, cache_key)
+        if cached is not None:
+            try:
+                return parse_llm_json(cached)
+            except ValueError:
+                pass
     
-    ai_analysis = json.loads(result['choices'][0]['message']['content'])
+    answered_by, content = await send()
+    ai_analysis = parse_llm_json(content)
+    if ENABLE_LLM_CACHE:
+        if answered_by != model:
+            cache_key = make_key(answered_by, system_prompt, user_prompt, params)
+        await loop.run_in_executor(None, llm_cache.set, cache_key, content, answered_by)
     return ai_analysis
 
 def enhance_analysis_with_metrics(analysis: Dict, website_data: Dict) -> Dict:
@@ -302,70 +379,19 @@ def enhance_analysis_with_metrics(analysis: Dict, website_data: Dict) -> Dict:
 def generate_premium_fallback_analysis(website_data: Dict) -> Dict:
     """Generate comprehensive fallback analysis if both AI services fail"""
     
-    issues = []
-    recommendations = []
-    score = 60  # Conservative baseline
-    
-    # Enhanced issue detection for $997 value
-    content_length = website_data.get('content_length', 0)
-    if content_length < 1000:
-        issues.append({
-            "issue": "Insufficient content depth for AI search visibility",
-            "business_impact": "high",
-            "implementation_effort": "2-3 weeks", 
-            "expected_improvement": "40% increase in AI search mentions",
-            "priority_score": 9
-        })
-        recommendations.append("Create comprehensive, AI-optimized content covering user questions in depth")
-        score -= 15
-    
-    if not website_data.get('title'):
-        issues.append({
-            "issue": "Missing or inadequate title tag optimization",
-            "business_impact": "high",
-            "implementation_effort": "1 week",
-            "expected_improvement": "25% improvement in click-through rates", 
-            "priority_score": 10
-        })
-        score -= 10
-    
-    if not website_data.get('meta_description'):
-        issues.append({
-            "issue": "Missing meta descriptions reducing AI extraction potential",
-            "business_impact": "medium",
-            "implementation_effort": "1 week",
-            "expected_improvement": "15% improvement in search visibility",
-            "priority_score": 8
-        })
-        score -= 8
-    
-    if not website_data.get('has_schema'):
-        issues.append({
-            "issue": "Complete absence of structured data markup",
-            "business_impact": "critical", 
-            "implementation_effort": "3-4 weeks",
-            "expected_improvement": "60% improvement in AI search understanding",
-            "priority_score": 10
-        })
-        recommendations.append("Implement comprehensive schema markup for all content types")
-        score -= 20
-    
-    images_without_alt = website_data.get('images_without_alt', 0)
-    if images_without_alt > 0:
-        issues.append({
-            "issue": f"{images_without_alt} images lacking accessibility and SEO optimization",
-            "business_impact": "medium",
-            "implementation_effort": "1-2 weeks",
-            "expected_improvement": "10% improvement in page comprehension by AI",
-            "priority_score": 6
-        })
-        score -= 5
+    # Scores and issues come from the deterministic rule engine
+    scores = score_website(website_data)
+    score = scores['overall_score']
+    issues = scores['critical_issues']
+    recommendations = scores['recommendations']
+    category_scores = scores['category_scores']
     
     # Calculate business impact
     estimated_traffic_loss = max(1000, 3000 - (score * 30))
     estimated_revenue_loss = estimated_traffic_loss * 50
     
     return {
+        "analysis_source": "fallback",
         "executive_summary": {
             "overall_score": max(20, score),
             "business_impact_rating": "High" if score < 50 else "Medium",
@@ -376,11 +402,8 @@ def generate_premium_fallback_analysis(website_data: Dict) -> Dict:
             "expected_roi_timeline": "45-60 days"
         },
         "category_scores": {
-            "technical_seo": max(30, score - 10),
-            "content_quality": max(25, score - 15),
-            "ai_readiness": max(20, score - 25),
+            **category_scores,
             "voice_search": max(25, score - 20),
-            "schema_markup": 20 if website_data.get('has_schema') else 0,
             "competitive_position": max(30, score - 5)
         },
         "competitor_analysis": {
@@ -400,6 +423,7 @@ def generate_premium_fallback_analysis(website_data: Dict) -> Dict:
             ]
         },
         "critical_issues": issues,
+        "recommendations": recommendations,
         "ai_search_strategy": {
             "google_ai_optimization": [
                 "Implement FAQ schema for Google AI Overview inclusion",
@@ -0,0 +1,258 @@
+# File: services/analysis_sections.py
+# Section definitions for the premium AI analysis
+#
+# The audit used to be one monolithic generation. Each entry in SECTIONS is now
+# generated by its own, shorter prompt, and the results are merged into the
+# same audit_data shape. 'keys' are the top-level audit_data keys a section
+# produces; they are also the keys filled from the fallback analysis when the
+# section fails. AUDIT_DATA_SCHEMA gives the type each of those keys must have.
+
+from typing import Dict, List, Optional
+
+SECTIONS = [
+    {
+        'name': 'executive_summary',
+        'keys': ['executive_summary', 'category_scores'],
+        'max_tokens': 500,
+        'instructions': """
+    BUSINESS IMPACT ASSESSMENT
+    - Estimate current monthly organic traffic loss
+    - Calculate revenue impact at $50 per visitor
+    - Project 12-month opportunity cost
+    - Benchmark against industry standards""",
+        'format': """{
+        "executive_summary": {
+            "overall_score": 0-100,
+            "business_impact_rating": "Critical/High/Medium/Low",
+            "estimated_monthly_traffic_loss": 0,
+            "estimated_monthly_revenue_loss": 0,
+            "implementation_complexity": "Low/Medium/High",
+            "expected_roi_timeline": "30/60/90 days"
+        },
+        "category_scores": {
+            "technical_seo": 0-100,
+            "content_quality": 0-100,
+            "ai_readiness": 0-100,
+            "voice_search": 0-100,
+            "schema_markup": 0-100,
+            "competitive_position": 0-100
+        }
+    }"""
+    },
+    {
+        'name': 'competitor_analysis',
+        'keys': ['competitor_analysis'],
+        'max_tokens': 700,
+        'instructions': """
+    COMPETITOR INTELLIGENCE
+    - Identify likely top 5 competitors based on content/industry
+    - Analyze competitive advantages they may have
+    - Find content gaps and opportunities
+    - Estimate their traffic and market share""",
+        'format': """{
+        "competitor_analysis": {
+            "likely_competitors": [
+                {
+                    "domain": "competitor1.com",
+                    "competitive_advantage": "explanation",
+                    "content_gaps": ["gap1", "gap2"],
+                    "estimated_traffic": "high/medium/low"
+                }
+            ],
+            "market_opportunity": "detailed analysis",
+            "competitive_recommendations": ["action1", "action2"]
+        }
+    }"""
+    },
+    {
+        'name': 'critical_issues',
+        'keys': ['critical_issues'],
+        'max_tokens': 800,
+        'instructions': """
+    TECHNICAL SEO PRIORITY MATRIX
+    - Critical issues (fix in weeks 1-2)
+    - High-impact improvements (weeks 3-6)
+    - Long-term optimizations (weeks 7-12)
+    - Resource requirements for each""",
+        'format': """{
+        "critical_issues": [
+            {
+                "issue": "specific problem",
+                "business_impact": "high/medium/low",
+                "implementation_effort": "1-4 weeks",
+                "expected_improvement": "specific outcome",
+                "priority_score": 1-10
+            }
+        ]
+    }"""
+    },
+    {
+        'name': 'ai_search_strategy',
+        'keys': ['ai_search_strategy'],
+        'max_tokens': 700,
+        'instructions': """
+    AI SEARCH DOMINATION STRATEGY
+    - Google AI Overview optimization recommendations
+    - ChatGPT/Perplexity visibility strategy
+    - Voice search optimization roadmap
+    - Schema markup enhancement plan""",
+        'format': """{
+        "ai_search_strategy": {
+            "google_ai_optimization": ["specific recommendation with implementation steps"],
+            "chatgpt_visibility": ["strategies to appear in AI responses"],
+            "voice_search_plan": ["voice search optimization tactics"],
+            "schema_roadmap": ["schema markup implementation plan"]
+        }
+    }"""
+    },
+    {
+        'name': 'content_blueprint',
+        'keys': ['content_blueprint'],
+        'max_tokens': 700,
+        'instructions': """
+    CONTENT STRATEGY BLUEPRINT
+    - AI-optimized content recommendations
+    - Topic clusters for authority building
+    - Question-based content for voice search
+    - Semantic keyword opportunities""",
+        'format': """{
+        "content_blueprint": {
+            "priority_topics": [
+                {
+                    "topic": "content topic",
+                    "search_volume": "estimated volume",
+                    "difficulty": "low/medium/high",
+                    "business_value": "revenue potential",
+                    "ai_opportunity": "AI search potential"
+                }
+            ],
+            "content_gaps": ["missing content areas"],
+            "semantic_opportunities": ["related keyword clusters"]
+        }
+    }"""
+    },
+    {
+        'name': 'implementation_roadmap',
+        'keys': ['implementation_roadmap'],
+        'max_tokens': 700,
+        'instructions': """
+    90-DAY IMPLEMENTATION ROADMAP
+    - Week-by-week action items
+    - Priority ranking with business impact scores
+    - Resource allocation recommendations""",
+        'format': """{
+        "implementation_roadmap": {
+            "weeks_1_2": {
+                "critical_fixes": ["immediate actions"],
+                "expected_impact": "projected improvements",
+                "resource_requirements": "time/people needed"
+            },
+            "weeks_3_6": {
+                "high_impact_improvements": ["medium-term actions"],
+                "expected_impact": "projected improvements",
+                "resource_requirements": "time/people needed"
+            },
+            "weeks_7_12": {
+                "long_term_optimizations": ["strategic actions"],
+                "expected_impact": "projected improvements",
+                "resource_requirements": "time/people needed"
+            }
+        }
+    }"""
+    },
+    {
+        'name': 'roi_projections',
+        'keys': ['roi_projections', 'success_metrics'],
+        'max_tokens': 700,
+        'instructions': """
+    ROI PROJECTIONS AND SUCCESS METRICS
+    - 30-day, 90-day and 12-month traffic and revenue impact
+    - Success metrics and KPIs to track""",
+        'format': """{
+        "roi_projections": {
+            "30_day_impact": {
+                "traffic_increase": "percentage",
+                "revenue_increase": "dollar amount",
+                "key_improvements": ["specific gains"]
+            },
+            "90_day_impact": {
+                "traffic_increase": "percentage",
+                "revenue_increase": "dollar amount",
+                "market_position": "competitive improvement"
+            },
+            "12_month_potential": {
+                "traffic_increase": "percentage",
+                "revenue_increase": "dollar amount",
+                "roi_multiple": "10x, 20x, etc"
+            }
+        },
+        "success_metrics": {
+            "kpis_to_track": ["specific metrics"],
+            "measurement_tools": ["recommended tools"],
+            "reporting_frequency": "weekly/monthly",
+            "success_benchmarks": ["target numbers"]
+        }
+    }"""
+    },
+    {
+        'name': 'next_steps',
+        'keys': ['next_steps'],
+        'max_tokens': 500,
+        'instructions': """
+    NEXT STEPS
+    - The first actions to take this week
+    - Tools and people to procure
+    - Milestones and risks""",
+        'format': """{
+        "next_steps": {
+            "immediate_actions": ["first 3 things to do"],
+            "resource_procurement": ["tools/people needed"],
+            "timeline_milestones": ["key dates and goals"],
+            "risk_mitigation": ["potential challenges and solutions"]
+        }
+    }"""
+    }
+]
+
+SECTIONS_BY_NAME = {section['name']: section for section in SECTIONS}
+
+# Expected type of every audit_data key produced by a section
+AUDIT_DATA_SCHEMA = {
+    'executive_summary': dict,
+    'category_scores': dict,
+    'competitor_analysis': dict,
+    'critical_issues': list,
+    'ai_search_strategy': dict,
+    'content_blueprint': dict,
+    'implementation_roadmap': dict,
+    'roi_projections': dict,
+    'success_metrics': dict,
+    'next_steps': dict
+}
+
+def valid_keys(section: Dict, result) -> Dict:
+    """The section's keys in result that match AUDIT_DATA_SCHEMA"""
+    if not isinstance(result, dict):
+        return {}
+    return {key: result[key] for key in section['keys']
+            if isinstance(result.get(key), AUDIT_DATA_SCHEMA.get(key, object))}
+
+def build_section_prompt(section: Dict, context: str, only_keys: Optional[List[str]] = None) -> str:
+    """User prompt for one section: the shared website context plus the section's task and format.
+
+    only_keys limits the response to the keys still missing from an earlier attempt.
+    """
+    only = ''
+    if only_keys and len(only_keys) < len(section['keys']):
+        only = f"\n    Include only these keys, the others are already complete: {', '.join(only_keys)}"
+    return f"""
+    You are conducting a $997 enterprise-level AI SEO audit that must deliver exceptional business value.
+    This part of the audit covers one section only.
+    {context}
+
+    ANALYZE:
+    {section['instructions']}
+
+    Respond with only this JSON object:
+    {section['format']}{only}
+    """
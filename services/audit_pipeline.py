@@ -0,0 +1,239 @@
+# File: services/audit_pipeline.py
+# Audit steps as a dependency graph of stages
+#
+# An audit used to run its steps strictly one after another. Here each step is
+# a Stage that names the stages it needs (`after`); a stage starts as soon as
+# those have finished, so independent stages (the PDF and the database save)
+# run concurrently. Background stages (the email) start once the foreground
+# stages are done and keep running after run() returns, so the response does
+# not wait for them.
+#
+# Each stage has its own timeout and error policy: FAIL stops the audit with
+# StageFailed, CONTINUE records the error and hands dependents the stage's
+# default instead. A timed-out stage is treated as failed; its thread cannot
+# be interrupted and finishes in the background, its result ignored. Stage
+# durations go to the audit_stage_seconds.<pipeline>.<stage> histograms.
+#
+# run() takes the outputs of stages that already completed (checkpoints from
+# an earlier, interrupted run) and skips those stages. Its checkpoint hook is
+# called with each stage's output as the stage succeeds, and on_finish once
+# every stage has finished or the run has failed.
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FAIL = 'fail'
+CONTINUE = 'continue'
+
+class StageFailed(Exception):
+    """A stage with the FAIL policy raised or timed out"""
+
+    def __init__(self, stage: str, error: str):
+        super().__init__(error)
+        self.stage = stage
+        self.error = error
+
+class StageTimeout(Exception):
+    """A stage ran longer than its timeout"""
+
+class Stage:
+    """One audit step: run(outputs) receives the outputs of finished stages by name and returns its own"""
+
+    def __init__(self, name: str, run: Callable[[Dict[str, Any]], Any], after: Iterable[str] = (),
+                 timeout: float = None, on_error: str = FAIL, default: Any = None, background: bool = False):
+        if on_error not in (FAIL, CONTINUE):
+            raise ValueError(f'Unknown error policy for stage {name}: {on_error}')
+        self.name = name
+        self.run = run
+        self.after = tuple(after)
+        self.timeout = timeout
+        self.on_error = on_error
+        self.default = default
+        self.background = background
+
+class PipelineRun:
+    """Outputs, errors and durations (seconds) of one pipeline run, by stage name"""
+
+    def __init__(self, outputs: Dict[str, Any] = None, checkpoint: Callable[[str, Any], None] = None,
+                 on_finish: Callable[['PipelineRun'], None] = None):
+        self.outputs = dict(outputs or {})
+        self.errors = {}
+        self.timings = {}
+        self.background = None
+        self.checkpoint = checkpoint
+        self.on_finish = on_finish
+
+    def wait_for_background(self, timeout: float = None) -> bool:
+        """Wait for this run's background stages; False if they are still running"""
+        if self.background is None:
+            return True
+        self.background.join(timeout)
+        return not self.background.is_alive()
+
+_background_lock = threading.Lock()
+_background_threads = set()
+
+def wait_for_background(timeout: float = None) -> bool:
+    """Wait for the background stages of every run in this process; False if some are still running"""
+    give_up_at = time.monotonic() + timeout if timeout is not None else None
+    with _background_lock:
+        threads = list(_background_threads)
+    for thread in threads:
+        thread.join(None if give_up_at is None else max(0.0, give_up_at - time.monotonic()))
+    return not any(thread.is_alive() for thread in threads)
+
+class AuditPipeline:
+    """A named graph of stages, validated once and run per audit"""
+
+    def __init__(self, name: str, stages: List[Stage]):
+        self.name = name
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f'Duplicate stage: {stage.name}')
+            self.stages[stage.name] = stage
+        for stage in stages:
+            for dependency in stage.after:
+                if dependency not in self.stages:
+                    raise ValueError(f'Stage {stage.name} depends on unknown stage {dependency}')
+                if self.stages[dependency].background and not stage.background:
+                    raise ValueError(f'Stage {stage.name} cannot wait for background stage {dependency}')
+        self._check_acyclic()
+
+    def downstream(self, names: Iterable[str]) -> List[str]:
+        """The named stages and every stage that depends on them, directly or not"""
+        selected = set(names)
+        unknown = selected - set(self.stages)
+        if unknown:
+            raise ValueError(f'Unknown stages: {", ".join(sorted(unknown))}')
+        changed = True
+        while changed:
+            changed = False
+            for stage in self.stages.values():
+                if stage.name not in selected and selected & set(stage.after):
+                    selected.add(stage.name)
+                    changed = True
+        return [name for name in self.stages if name in selected]
+
+    def _check_acyclic(self):
+        remaining = {name: set(stage.after) for name, stage in self.stages.items()}
+        while remaining:
+            ready = [name for name, after in remaining.items() if not after & set(remaining)]
+            if not ready:
+                raise ValueError(f'Stage dependencies form a cycle: {", ".join(sorted(remaining))}')
+            for name in ready:
+                del remaining[name]
+
+    def run(self, outputs: Dict[str, Any] = None, checkpoint: Callable[[str, Any], None] = None,
+            on_finish: Callable[[PipelineRun], None] = None) -> PipelineRun:
+        """Run the foreground stages and start the background ones.
+
+        Stages whose output is already in outputs are not run again. Raises
+        StageFailed when a FAIL stage fails; background stages then never start.
+        """
+        pipeline_run = PipelineRun(outputs, checkpoint, on_finish)
+        try:
+            self._execute([stage for stage in self.stages.values() if not stage.background], pipeline_run)
+        except BaseException:
+            self._finish(pipeline_run)
+            raise
+
+        background = [stage for stage in self.stages.values() if stage.background]
+        if not background:
+            self._finish(pipeline_run)
+        else:
+            thread = threading.Thread(target=self._run_background, args=(background, pipeline_run),
+                                      name=f'audit-{self.name}-background')
+            with _background_lock:
+                _background_threads.add(thread)
+            pipeline_run.background = thread
+            thread.start()
+        return pipeline_run
+
+    def _run_background(self, stages: List[Stage], pipeline_run: PipelineRun):
+        try:
+            self._execute(stages, pipeline_run)
+        except StageFailed as e:
+            logger.error(f'{self.name} audit background stage {e.stage} failed: {e}')
+        except Exception as e:
+            logger.error(f'{self.name} audit background stages crashed: {e}')
+        finally:
+            self._finish(pipeline_run)
+            with _background_lock:
+                _background_threads.discard(threading.current_thread())
+
+    def _finish(self, pipeline_run: PipelineRun):
+        if pipeline_run.on_finish is None:
+            return
+        try:
+            pipeline_run.on_finish(pipeline_run)
+        except Exception as e:
+            logger.warning(f'{self.name} audit finish hook failed: {e}')
+
+    def _execute(self, stages: List[Stage], pipeline_run: PipelineRun):
+        pending = {stage.name: stage for stage in stages if stage.name not in pipeline_run.outputs}
+        done = set(pipeline_run.outputs)
+        running = {}
+        if not pending:
+            return
+
+        executor = ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix=f'audit-{self.name}')
+        try:
+            while pending or running:
+                for stage in [stage for stage in pending.values() if set(stage.after) <= done]:
+                    del pending[stage.name]
+                    future = executor.submit(stage.run, dict(pipeline_run.outputs))
+                    running[future] = (stage, time.monotonic())
+
+                if not running:
+                    raise RuntimeError(f'Stages {", ".join(pending)} wait for stages outside this run')
+
+                timeouts = [started + stage.timeout - time.monotonic()
+                            for stage, started in running.values() if stage.timeout is not None]
+                finished, _ = wait(list(running), timeout=max(0.0, min(timeouts)) if timeouts else None,
+                                   return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    stage, started = running.pop(future)
+                    error = future.exception()
+                    self._settle(stage, pipeline_run, time.monotonic() - started,
+                                 None if error is not None else future.result(), error)
+                    done.add(stage.name)
+
+                now = time.monotonic()
+                for future, (stage, started) in list(running.items()):
+                    if stage.timeout is not None and now - started >= stage.timeout:
+                        del running[future]
+                        self._settle(stage, pipeline_run, now - started, None,
+                                     StageTimeout(f'timed out after {stage.timeout}s'))
+                        done.add(stage.name)
+        finally:
+            executor.shutdown(wait=False)
+
+    def _settle(self, stage: Stage, pipeline_run: PipelineRun, seconds: float, output: Any, error: Exception):
+        """Record a finished stage; raises StageFailed if it failed under the FAIL policy"""
+        pipeline_run.timings[stage.name] = round(seconds, 3)
+        metrics.observe(f'audit_stage_seconds.{self.name}.{stage.name}', seconds)
+        if error is None:
+            pipeline_run.outputs[stage.name] = output
+            if pipeline_run.checkpoint is not None:
+                try:
+                    pipeline_run.checkpoint(stage.name, output)
+                except Exception as e:
+                    # The audit goes on; a resumed run would just repeat this stage
+                    logger.warning(f'Failed to checkpoint {self.name} audit {stage.name} stage: {e}')
+            return
+
+        pipeline_run.errors[stage.name] = str(error)
+        metrics.increment(f'audit_stage_errors.{self.name}.{stage.name}')
+        if stage.on_error == FAIL:
+            raise StageFailed(stage.name, str(error)) from error
+        logger.warning(f'{self.name} audit {stage.name} stage failed, continuing without it: {error}')
+        pipeline_run.outputs[stage.name] = stage.default
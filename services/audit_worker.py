@@ -0,0 +1,130 @@
+# File: services/audit_worker.py
+# Executes queued audit jobs (see services.job_queue and run_worker.py)
+#
+# Each worker claims one job at a time and runs it through SEOAuditor. While
+# the audit runs, a heartbeat thread renews the job's lease every
+# JOB_HEARTBEAT_SECONDS and stores its progress; finished analysis sections
+# wake it early so the status endpoint sees them promptly. A job that raises is
+# put back in the queue while it has attempts left; an audit that reports
+# failure (e.g. an unreachable site) is final. A job that could not get an
+# admission slot (MAX_CONCURRENT_AUDITS busy) goes back without using an attempt.
+
+import os
+import time
+import socket
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+from config.settings import JOB_HEARTBEAT_SECONDS, JOB_POLL_INTERVAL
+from services.job_queue import JobQueue, job_queue
+from services.seo_auditor import SEOAuditor
+from services.cache_service import cache
+from services.model_routing import get_route, planned_sections
+from utils.logging_config import log_audit_completion
+from utils.concurrency_limiter import CapacityExceeded
+
+logger = logging.getLogger(__name__)
+
+def run_audit_job(auditor: SEOAuditor, audit_type: str, payload: Dict,
+                  on_section: Optional[Callable[[str, Dict], None]] = None, run_id: str = None) -> Dict:
+    """Run one audit as /api/audit used to inline and return its API response.
+
+    Jobs pass their job id as run_id, so a job picked up again after its worker
+    died resumes from the audit stages that already completed.
+    """
+    started = time.time()
+    url = payload['url']
+    email = payload['email']
+    if audit_type == 'premium':
+        result = auditor.run_premium_audit(url, email, payload.get('company', ''), payload.get('industry', ''),
+                                           bypass_cache=payload.get('bypass_cache', False), on_section=on_section,
+                                           run_id=run_id)
+    else:
+        result = auditor.run_full_audit(url, email, bypass_cache=payload.get('bypass_cache', False),
+                                        on_section=on_section, run_id=run_id)
+
+    if not result.get('success'):
+        return result
+
+    # Free results also answer repeat requests from the response cache
+    if audit_type == 'free':
+        try:
+            cache.set(url, result, ttl=7200)
+        except Exception as e:
+            logger.warning(f'Cache set error (non-fatal): {e}')
+
+    try:
+        log_audit_completion(url, email, result.get('score', 0), time.time() - started)
+    except Exception:
+        pass
+
+    result['audit_type'] = audit_type
+    result['payment_amount'] = payload.get('payment_amount', 0) if audit_type == 'premium' else 0
+    return result
+
+class AuditWorker:
+    """Claims and runs audit jobs until stopped"""
+
+    def __init__(self, queue: JobQueue = None, worker_id: str = None, auditor: SEOAuditor = None):
+        self.queue = queue or job_queue
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.auditor = auditor or SEOAuditor()
+
+    def run(self, stop: threading.Event):
+        """Process jobs until stop is set; the job in progress is always finished"""
+        logger.info(f'Audit worker {self.worker_id} started')
+        while not stop.is_set():
+            try:
+                job = self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f'Audit worker {self.worker_id} could not claim a job: {e}')
+                job = None
+            if job is None:
+                stop.wait(JOB_POLL_INTERVAL)
+                continue
+            self.process(job)
+        logger.info(f'Audit worker {self.worker_id} stopped')
+
+    def process(self, job: Dict):
+        job_id = job['job_id']
+        total = len(planned_sections(get_route(job['audit_type'])))
+        progress = {'stage': 'running', 'sections_ready': [], 'sections_total': total}
+        wake = threading.Event()
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.is_set():
+                wake.wait(JOB_HEARTBEAT_SECONDS)
+                wake.clear()
+                if done.is_set():
+                    return
+                try:
+                    snapshot = {**progress, 'sections_ready': list(progress['sections_ready'])}
+                    if not self.queue.heartbeat(job_id, self.worker_id, snapshot):
+                        logger.warning(f'Audit worker {self.worker_id} lost the lease on job {job_id}')
+                except Exception as e:
+                    logger.warning(f'Heartbeat failed for job {job_id}: {e}')
+
+        def on_section(name: str, result: Dict):
+            progress['sections_ready'].append(name)
+            wake.set()
+
+        logger.info(f'Audit worker {self.worker_id} running job {job_id} (attempt {job["attempts"]})')
+        thread = threading.Thread(target=heartbeat, daemon=True)
+        thread.start()
+        try:
+            result = run_audit_job(self.auditor, job['audit_type'], job['payload'], on_section, run_id=job_id)
+        except CapacityExceeded as e:
+            logger.warning(f'Job {job_id} put back in the queue: {e}')
+            self.queue.release(job_id, self.worker_id)
+            return
+        except Exception as e:
+            logger.error(f'Job {job_id} raised: {e}')
+            self.queue.fail(job_id, self.worker_id, str(e), retry=True)
+            return
+        finally:
+            done.set()
+            wake.set()
+            thread.join()
+        self.queue.complete(job_id, self.worker_id, result)
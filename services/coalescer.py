@@ -0,0 +1,206 @@
+# File: services/coalescer.py
+# Single-flight coalescing of identical audits across worker processes
+#
+# The response cache in /api/audit is only filled once an audit finishes, so a
+# double click or an agency batch starts several identical audits at once,
+# each scraping, calling the LLM and rendering a PDF. run() makes the first
+# caller for a key the owner of a "flight" (a leased row in SQLite, so every
+# gunicorn worker sees it); later callers poll until the owner stores its
+# result and then share it. Results are kept per flight, so a caller never
+# receives an older flight's result.
+#
+# If the owner raises, no result is stored and a waiting caller takes the
+# flight over. If the owner's process dies, the lease expires after
+# COALESCE_LEASE_SECONDS and the next caller takes over.
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+from config.settings import (
+    CACHE_DIR, ENABLE_AUDIT_COALESCING, COALESCE_LEASE_SECONDS, COALESCE_RESULT_TTL, COALESCE_POLL_INTERVAL
+)
+from services.web_scraper import normalize_cache_url
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class AuditCoalescer:
+    """SQLite-backed single-flight: one computation per key, shared by concurrent callers"""
+
+    def __init__(self, db_path: str, lease_seconds: int = 360, result_ttl: int = 300,
+                 poll_interval: float = 0.5, enabled: bool = True):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.enabled = enabled
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        # isolation_level=None so _acquire can take the write lock with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS audit_flights (
+                    flight_key TEXT PRIMARY KEY,
+                    flight_id TEXT NOT NULL,
+                    owner_pid INTEGER,
+                    started_at REAL NOT NULL,
+                    lease_expires REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS audit_flight_results (
+                    flight_id TEXT PRIMARY KEY,
+                    flight_key TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    completed_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+        finally:
+            conn.close()
+
+    def _acquire(self, key: str) -> Tuple[str, bool]:
+        """(flight_id, is_owner): join the live flight for key, or start a new one"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT flight_id, lease_expires FROM audit_flights WHERE flight_key = ?', (key,)
+            ).fetchone()
+            if row is not None and row['lease_expires'] > now:
+                conn.execute('COMMIT')
+                return row['flight_id'], False
+            if row is not None:
+                logger.warning(f'Taking over expired flight for {key}')
+            flight_id = uuid.uuid4().hex
+            conn.execute('''
+                INSERT OR REPLACE INTO audit_flights (flight_key, flight_id, owner_pid, started_at, lease_expires)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (key, flight_id, os.getpid(), now, now + self.lease_seconds))
+            conn.execute('COMMIT')
+            return flight_id, True
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _finish(self, key: str, flight_id: str, result: Optional[Dict]):
+        """Store the owner's result (if any) and end the flight, in one transaction"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            if result is not None:
+                conn.execute('''
+                    INSERT OR REPLACE INTO audit_flight_results (flight_id, flight_key, result, completed_at, expires_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (flight_id, key, json.dumps(result, default=str), now, now + self.result_ttl))
+            conn.execute('DELETE FROM audit_flights WHERE flight_key = ? AND flight_id = ?', (key, flight_id))
+            conn.execute('DELETE FROM audit_flight_results WHERE expires_at <= ?', (now,))
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            logger.warning(f'Failed to finish flight for {key}: {e}')
+        finally:
+            conn.close()
+
+    def _poll(self, key: str, flight_id: str) -> Tuple[Optional[Dict], bool]:
+        """(result, still_in_flight) for a flight someone else owns"""
+        conn = self._connect()
+        try:
+            in_flight = conn.execute(
+                'SELECT 1 FROM audit_flights WHERE flight_key = ? AND flight_id = ? AND lease_expires > ?',
+                (key, flight_id, time.time())
+            ).fetchone() is not None
+            # Read after the flight check: _finish stores the result before ending the flight
+            row = conn.execute('SELECT result FROM audit_flight_results WHERE flight_id = ?', (flight_id,)).fetchone()
+        finally:
+            conn.close()
+        return (json.loads(row['result']) if row is not None else None), in_flight
+
+    def run(self, key: str, compute: Callable[[], Dict], wait_timeout: float) -> Tuple[Dict, bool]:
+        """compute()'s result for key, computed once for all concurrent callers.
+
+        Returns (result, shared); shared is True when the result came from
+        another caller's computation. Followers give up waiting after
+        wait_timeout seconds and compute it themselves. If the lock table
+        cannot be used, compute() runs uncoalesced.
+        """
+        if not self.enabled:
+            return compute(), False
+
+        give_up_at = time.monotonic() + wait_timeout
+        while True:
+            try:
+                flight_id, owner = self._acquire(key)
+            except sqlite3.Error as e:
+                logger.warning(f'Coalescing unavailable for {key}: {e}')
+                return compute(), False
+
+            if owner:
+                result = None
+                try:
+                    result = compute()
+                    return result, False
+                finally:
+                    self._finish(key, flight_id, result)
+
+            metrics.increment('audit_coalesce_waits')
+            while time.monotonic() < give_up_at:
+                try:
+                    result, in_flight = self._poll(key, flight_id)
+                except sqlite3.Error as e:
+                    logger.warning(f'Coalescing poll failed for {key}: {e}')
+                    return compute(), False
+                if result is not None:
+                    metrics.increment('audits_coalesced')
+                    return result, True
+                if not in_flight:
+                    break
+                time.sleep(self.poll_interval)
+            else:
+                logger.warning(f'Gave up waiting for in-flight audit of {key}')
+                return compute(), False
+            # The owner failed without a result; start (or join) the next flight
+            logger.info(f'In-flight audit of {key} failed, retrying')
+
+    def get_stats(self) -> Dict:
+        conn = self._connect()
+        try:
+            now = time.time()
+            in_flight = conn.execute('SELECT COUNT(*) FROM audit_flights WHERE lease_expires > ?', (now,)).fetchone()[0]
+            results = conn.execute('SELECT COUNT(*) FROM audit_flight_results WHERE expires_at > ?', (now,)).fetchone()[0]
+        finally:
+            conn.close()
+        return {'enabled': self.enabled, 'in_flight': in_flight, 'recent_results': results}
+
+def flight_key(audit_type: str, url: str) -> str:
+    """Coalescing key: audit type plus the normalized URL"""
+    return f'{audit_type}:{normalize_cache_url(url)}'
+
+# Global audit coalescer
+audit_coalescer = AuditCoalescer(
+    os.path.join(CACHE_DIR, 'coalescer.db'),
+    lease_seconds=COALESCE_LEASE_SECONDS,
+    result_ttl=COALESCE_RESULT_TTL,
+    poll_interval=COALESCE_POLL_INTERVAL,
+    enabled=ENABLE_AUDIT_COALESCING
+)
@@ -9,9 +9,10 @@ from typing import Dict, Optional
 import html
 
 from config.settings import (
-    RESEND_API_KEY, RESEND_FROM_EMAIL, PREMIUM_PRICE, 
+    RESEND_API_KEY, RESEND_FROM_EMAIL, RESEND_BASE_URL, PREMIUM_PRICE, 
     COMPANY_NAME, SUPPORT_EMAIL, BUSINESS_URL
 )
+from services import http_client
 
 def send_email_report(email: str, audit_data: Dict, pdf_path: str, website_url: str) -> bool:
     """Send audit report email with premium or free template using Resend"""
@@ -155,7 +156,7 @@ def send_free_email_report(email: str, audit_data: Dict, pdf_path: str, website_
 def send_resend_email(to_email: str, subject: str, html_content: str, text_content: str, attachments: list = None) -> bool:
     """Send email using Resend API - FIXED VERSION"""
     
-    url = "https://api.resend.com/emails"
+    url = f"{RESEND_BASE_URL}/emails"
     
     headers = {
         "Authorization": f"Bearer {RESEND_API_KEY}",
@@ -176,7 +177,7 @@ def send_resend_email(to_email: str, subject: str, html_content: str, text_conte
         email_data["attachments"] = attachments
     
     try:
-        response = requests.post(url, headers=headers, json=email_data, timeout=30)
+        response = http_client.post(url, headers=headers, json=email_data, timeout=30)
         
         # FIXED: Actually show errors instead of hiding them
         if response.status_code == 200:
@@ -0,0 +1,513 @@
+# File: services/html_extractor.py
+# Single-pass HTML extraction engine used by the web scraper
+#
+# The page is parsed once as a stream of start/end/text events. Each SEO check
+# is a registered visitor that subscribes to the tags it cares about and writes
+# its fields into the shared website_data dict. The lxml parser backend is used
+# when installed, with the standard library html.parser as fallback. Both accept
+# incremental feed() calls so a response body can be parsed while it streams in.
+#
+# This module deliberately has no project imports so it can be loaded cheaply
+# in parser worker processes.
+
+import re
+import json
+import codecs
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse, urldefrag
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # pragma: no cover - lxml is optional
+    lxml_etree = None
+
+# Links to these file types are never crawled as pages
+SKIP_EXTENSIONS = (
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.ico', '.css', '.js',
+    '.zip', '.gz', '.mp3', '.mp4', '.avi', '.mov', '.doc', '.docx', '.xls', '.xlsx', '.xml'
+)
+
+CONTENT_TEXT_LIMIT = 5000
+MAX_PAGE_LINKS = 500
+MAX_STRUCTURED_DATA = 20
+
+# Text inside these tags is not page content
+NON_CONTENT_TAGS = frozenset(['script', 'style', 'noscript', 'template'])
+
+# Text inside these tags is site chrome, left out of main_text
+BOILERPLATE_TAGS = ('nav', 'footer', 'aside')
+
+# Elements that start a new line of text in main_text
+BLOCK_TAGS = (
+    'p', 'div', 'li', 'br', 'tr', 'td', 'th', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'section', 'article', 'header', 'main', 'blockquote', 'pre', 'dt', 'dd', 'title'
+)
+
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr'
+])
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([a-zA-Z0-9_\-]+)', re.IGNORECASE)
+
+# =============================================================================
+# URL HELPERS
+# =============================================================================
+
+def normalize_page_url(base_url: str, href: str) -> Optional[str]:
+    """Resolve a link against its page and strip fragments; None if not crawlable"""
+    if not href or href.startswith(('mailto:', 'tel:', 'javascript:', '#')):
+        return None
+
+    absolute, _ = urldefrag(urljoin(base_url, href.strip()))
+    parsed = urlparse(absolute)
+    if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+        return None
+    if parsed.path.lower().endswith(SKIP_EXTENSIONS):
+        return None
+
+    return absolute.rstrip('/') if parsed.path not in ('', '/') else f'{parsed.scheme}://{parsed.netloc}'
+
+def same_site(url: str, other: str) -> bool:
+    """Compare hosts ignoring a leading www."""
+    host = urlparse(url).netloc.lower()
+    other_host = urlparse(other).netloc.lower()
+    return host.replace('www.', '', 1) == other_host.replace('www.', '', 1)
+
+# =============================================================================
+# VISITORS
+# =============================================================================
+
+class ExtractionContext:
+    """Shared state for one page: the output dict plus parser bookkeeping"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.data: Dict = {}
+        self.page_links: List[str] = []
+        self.skip_depth = 0  # > 0 while inside script/style
+
+class Visitor:
+    """Base visitor. Subclasses declare the tags they want events for.
+
+    start_tags/end_tags limit which element events are dispatched to the
+    visitor; wants_text subscribes it to text events (with the context's
+    skip_depth telling it whether the text is page content).
+    """
+    start_tags: Tuple[str, ...] = ()
+    end_tags: Tuple[str, ...] = ()
+    wants_text = False
+
+    def __init__(self, ctx: ExtractionContext):
+        self.ctx = ctx
+
+    def start(self, tag: str, attrs: Dict[str, str]):
+        pass
+
+    def end(self, tag: str):
+        pass
+
+    def text(self, data: str):
+        pass
+
+    def finish(self):
+        pass
+
+VISITORS: List[type] = []
+
+def register_visitor(visitor_class):
+    """Class decorator adding a visitor to the extraction engine"""
+    VISITORS.append(visitor_class)
+    return visitor_class
+
+class _CaptureVisitor(Visitor):
+    """Helper for visitors that collect the text inside some elements"""
+    wants_text = True
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.capturing = None
+        self.buffer: List[str] = []
+
+    def text(self, data):
+        if self.capturing:
+            self.buffer.append(data)
+
+    def take(self) -> str:
+        value = ''.join(self.buffer)
+        self.capturing = None
+        self.buffer = []
+        return value
+
+@register_visitor
+class TitleVisitor(_CaptureVisitor):
+    start_tags = ('title',)
+    end_tags = ('title',)
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.found = False
+        ctx.data['title'] = ''
+
+    def start(self, tag, attrs):
+        if not self.found:
+            self.capturing = tag
+
+    def end(self, tag):
+        if self.capturing:
+            self.ctx.data['title'] = self.take()
+            self.found = True
+
+@register_visitor
+class HeadingVisitor(_CaptureVisitor):
+    start_tags = ('h1', 'h2', 'h3')
+    end_tags = ('h1', 'h2', 'h3')
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        for tag in self.start_tags:
+            ctx.data[f'{tag}_tags'] = []
+
+    def start(self, tag, attrs):
+        if not self.capturing:
+            self.capturing = tag
+
+    def end(self, tag):
+        if self.capturing == tag:
+            self.ctx.data[f'{tag}_tags'].append(self.take().strip())
+
+@register_visitor
+class MetaVisitor(Visitor):
+    start_tags = ('meta', 'link')
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        ctx.data.update({
+            'meta_description': '',
+            'meta_keywords': '',
+            'canonical_url': '',
+            'open_graph': {},
+            'twitter_cards': {}
+        })
+
+    def start(self, tag, attrs):
+        data = self.ctx.data
+        if tag == 'link':
+            if 'canonical' in attrs.get('rel', '').lower().split() and not data['canonical_url']:
+                data['canonical_url'] = attrs.get('href', '')
+            return
+
+        name = attrs.get('name', '').lower()
+        prop = attrs.get('property', '').lower()
+        content = attrs.get('content', '')
+        if name == 'description' and not data['meta_description']:
+            data['meta_description'] = content
+        elif name == 'keywords' and not data['meta_keywords']:
+            data['meta_keywords'] = content
+        elif prop.startswith('og:'):
+            data['open_graph'].setdefault(prop[3:], content)
+        elif name.startswith('twitter:') or prop.startswith('twitter:'):
+            data['twitter_cards'].setdefault((name or prop)[8:], content)
+
+@register_visitor
+class ImageVisitor(Visitor):
+    start_tags = ('img',)
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        ctx.data['images'] = 0
+        ctx.data['images_without_alt'] = 0
+
+    def start(self, tag, attrs):
+        self.ctx.data['images'] += 1
+        if not attrs.get('alt'):
+            self.ctx.data['images_without_alt'] += 1
+
+@register_visitor
+class LinkVisitor(Visitor):
+    start_tags = ('a',)
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.seen = set()
+        ctx.data['internal_links'] = 0
+        ctx.data['external_links'] = 0
+
+    def start(self, tag, attrs):
+        href = attrs.get('href')
+        if href is None:
+            return
+
+        url = self.ctx.url
+        if href.startswith('http') and url not in href:
+            self.ctx.data['external_links'] += 1
+        elif href.startswith('/') or url in href:
+            self.ctx.data['internal_links'] += 1
+
+        if len(self.ctx.page_links) < MAX_PAGE_LINKS:
+            page_url = normalize_page_url(url, href)
+            if page_url and page_url not in self.seen and same_site(url, page_url):
+                self.seen.add(page_url)
+                self.ctx.page_links.append(page_url)
+
+@register_visitor
+class SchemaVisitor(_CaptureVisitor):
+    start_tags = ('script',)
+    end_tags = ('script',)
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        ctx.data['has_schema'] = False
+        ctx.data['schema_types'] = []
+        ctx.data['structured_data'] = []
+
+    def start(self, tag, attrs):
+        if attrs.get('type', '').lower() == 'application/ld+json':
+            self.ctx.data['has_schema'] = True
+            self.capturing = tag
+
+    def end(self, tag):
+        if not self.capturing:
+            return
+        try:
+            payload = json.loads(self.take())
+        except ValueError:
+            return
+
+        items = payload if isinstance(payload, list) else [payload]
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            if len(self.ctx.data['structured_data']) < MAX_STRUCTURED_DATA:
+                self.ctx.data['structured_data'].append(item)
+            for node in [item] + [n for n in item.get('@graph', []) if isinstance(n, dict)]:
+                types = node.get('@type', [])
+                for schema_type in (types if isinstance(types, list) else [types]):
+                    if isinstance(schema_type, str) and schema_type not in self.ctx.data['schema_types']:
+                        self.ctx.data['schema_types'].append(schema_type)
+
+@register_visitor
+class TextVisitor(Visitor):
+    wants_text = True
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.length = 0
+        self.chunks: List[str] = []
+        self.kept = 0
+
+    def text(self, data):
+        if self.ctx.skip_depth:
+            return
+        self.length += len(data)
+        if self.kept < CONTENT_TEXT_LIMIT:
+            self.chunks.append(data)
+            self.kept += len(data)
+
+    def finish(self):
+        self.ctx.data['content_length'] = self.length
+        self.ctx.data['content_text'] = ''.join(self.chunks)[:CONTENT_TEXT_LIMIT]
+
+@register_visitor
+class MainTextVisitor(Visitor):
+    """Page text outside navigation, footer and sidebar elements, one block element per line"""
+    start_tags = BOILERPLATE_TAGS + BLOCK_TAGS
+    end_tags = BOILERPLATE_TAGS + BLOCK_TAGS
+    wants_text = True
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.boilerplate_depth = 0
+        self.chunks: List[str] = []
+        self.kept = 0
+
+    def start(self, tag, attrs):
+        if tag in BOILERPLATE_TAGS:
+            self.boilerplate_depth += 1
+        else:
+            self.chunks.append('\n')
+
+    def end(self, tag):
+        if tag in BOILERPLATE_TAGS:
+            if self.boilerplate_depth:
+                self.boilerplate_depth -= 1
+        else:
+            self.chunks.append('\n')
+
+    def text(self, data):
+        if self.ctx.skip_depth or self.boilerplate_depth or self.kept >= CONTENT_TEXT_LIMIT:
+            return
+        self.chunks.append(data)
+        self.kept += len(data)
+
+    def finish(self):
+        lines = (' '.join(line.split()) for line in ''.join(self.chunks).split('\n'))
+        self.ctx.data['main_text'] = '\n'.join(line for line in lines if line)[:CONTENT_TEXT_LIMIT]
+
+# =============================================================================
+# ENGINE
+# =============================================================================
+
+class ExtractionEngine:
+    """Dispatches parser events to the registered visitors for one page"""
+
+    def __init__(self, url: str):
+        self.ctx = ExtractionContext(url)
+        self.visitors = [visitor_class(self.ctx) for visitor_class in VISITORS]
+        self.start_dispatch: Dict[str, List[Visitor]] = {}
+        self.end_dispatch: Dict[str, List[Visitor]] = {}
+        self.text_visitors = [v for v in self.visitors if v.wants_text]
+        for visitor in self.visitors:
+            for tag in visitor.start_tags:
+                self.start_dispatch.setdefault(tag, []).append(visitor)
+            for tag in visitor.end_tags:
+                self.end_dispatch.setdefault(tag, []).append(visitor)
+
+    def start(self, tag: str, attrs: Dict[str, str]):
+        if tag in NON_CONTENT_TAGS:
+            self.ctx.skip_depth += 1
+        for visitor in self.start_dispatch.get(tag, ()):
+            visitor.start(tag, attrs)
+
+    def end(self, tag: str):
+        for visitor in self.end_dispatch.get(tag, ()):
+            visitor.end(tag)
+        if tag in NON_CONTENT_TAGS and self.ctx.skip_depth:
+            self.ctx.skip_depth -= 1
+
+    def text(self, data: str):
+        for visitor in self.text_visitors:
+            visitor.text(data)
+
+    def finish(self) -> Tuple[Dict, List[str]]:
+        for visitor in self.visitors:
+            visitor.finish()
+        url = self.ctx.url
+        website_data = {
+            'url': url,
+            'ssl_certificate': url.startswith('https://'),
+            **self.ctx.data
+        }
+        return website_data, self.ctx.page_links
+
+class _StdlibParser(HTMLParser):
+    """html.parser backend forwarding events to the engine"""
+
+    def __init__(self, engine: ExtractionEngine, encoding: str):
+        super().__init__(convert_charrefs=True)
+        self.engine = engine
+        self.encoding = encoding
+        # Keeps multibyte characters split across chunk boundaries intact
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+
+    def handle_starttag(self, tag, attrs):
+        self.engine.start(tag, {name: value or '' for name, value in attrs})
+        if tag in VOID_TAGS:
+            self.engine.end(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.engine.start(tag, {name: value or '' for name, value in attrs})
+        self.engine.end(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in VOID_TAGS:
+            self.engine.end(tag)
+
+    def handle_data(self, data):
+        self.engine.text(data)
+
+    def feed_bytes(self, chunk: bytes):
+        self.feed(self._decoder.decode(chunk))
+
+    def close(self):
+        self.feed(self._decoder.decode(b'', final=True))
+        super().close()
+
+class _LxmlTarget:
+    """lxml parser target forwarding events to the engine"""
+
+    def __init__(self, engine: ExtractionEngine):
+        self.engine = engine
+
+    def start(self, tag, attrib):
+        if isinstance(tag, str):
+            self.engine.start(tag.lower(), dict(attrib))
+
+    def end(self, tag):
+        if isinstance(tag, str):
+            self.engine.end(tag.lower())
+
+    def data(self, data):
+        self.engine.text(data)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return None
+
+def available_backend(preferred: str = 'auto') -> str:
+    """Resolve the parser backend name ('lxml' or 'html.parser')"""
+    if preferred in ('auto', 'lxml') and lxml_etree is not None:
+        return 'lxml'
+    return 'html.parser'
+
+def detect_encoding(content_type: str = '', head: bytes = b'') -> str:
+    """Pick a text encoding from the Content-Type header or a <meta charset>"""
+    match = re.search(r'charset=["\']?([a-zA-Z0-9_\-]+)', content_type or '', re.IGNORECASE)
+    if not match:
+        match = _META_CHARSET_RE.search(head[:2048])
+    if match:
+        encoding = match.group(1)
+        encoding = encoding.decode('ascii', 'ignore') if isinstance(encoding, bytes) else encoding
+        try:
+            ''.encode(encoding)
+            return encoding
+        except LookupError:
+            pass
+    return 'utf-8'
+
+class PageExtractor:
+    """Incremental extractor: feed() raw body chunks, then close() for the result.
+
+    Returns (website_data, same_site_links) from close().
+    """
+
+    def __init__(self, url: str, backend: str = 'auto', encoding: Optional[str] = None):
+        self.engine = ExtractionEngine(url)
+        self.backend = available_backend(backend)
+        self.encoding = encoding
+        self._parser = None
+
+    def _start_parser(self, first_chunk: bytes):
+        encoding = self.encoding or detect_encoding(head=first_chunk)
+        if self.backend == 'lxml':
+            self._parser = lxml_etree.HTMLParser(target=_LxmlTarget(self.engine), encoding=encoding)
+        else:
+            self._parser = _StdlibParser(self.engine, encoding)
+
+    def feed(self, chunk: bytes):
+        if not chunk:
+            return
+        if self._parser is None:
+            self._start_parser(chunk)
+        if self.backend == 'lxml':
+            self._parser.feed(chunk)
+        else:
+            self._parser.feed_bytes(chunk)
+
+    def close(self) -> Tuple[Dict, List[str]]:
+        if self._parser is not None:
+            try:
+                self._parser.close()
+            except Exception:
+                # lxml raises on documents it could not parse at all; keep what we have
+                pass
+        return self.engine.finish()
+
+def extract_page(url: str, content: bytes, backend: str = 'auto', encoding: Optional[str] = None) -> Tuple[Dict, List[str]]:
+    """Extract website_data and same-site links from a complete HTML body"""
+    extractor = PageExtractor(url, backend=backend, encoding=encoding)
+    extractor.feed(content)
+    return extractor.close()
@@ -0,0 +1,98 @@
+# File: services/http_client.py
+# Shared HTTP client layer - pooled keep-alive sessions for all outbound calls
+#
+# The scraper, the AI providers and Resend all go through one requests.Session
+# per process. Its adapters keep a connection pool per host, so repeat calls to
+# the same host reuse an open TCP+TLS connection instead of handshaking again.
+#
+# urllib3 connection pools are thread-safe and, under gevent, cooperative once
+# the worker has monkey-patched the socket module. The session is rebuilt after
+# a fork (gunicorn --preload) so worker processes never share sockets with the
+# master. Cookies are disabled so concurrent requests never share session state.
+
+import os
+import threading
+import requests
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config.settings import (
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+    HTTP_MAX_RETRIES, HTTP_RETRY_BACKOFF, HTTP_RETRY_MAX_SLEEP
+)
+
+# Status codes worth retrying on idempotent requests
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class CappedRetry(Retry):
+    """Retry that honours Retry-After only up to HTTP_RETRY_MAX_SLEEP seconds.
+
+    urllib3 sleeps for whatever Retry-After a server sends, so a scraped site
+    answering 503 with "Retry-After: 86400" would block the worker for a day.
+    """
+
+    max_retry_after = HTTP_RETRY_MAX_SLEEP
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.max_retry_after)
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def _build_session() -> requests.Session:
+    """Create a session with pooled adapters and the configured retry policy"""
+    retry = CappedRetry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        backoff_jitter=HTTP_RETRY_BACKOFF,
+        backoff_max=HTTP_RETRY_MAX_SLEEP,
+        status_forcelist=RETRY_STATUS_CODES,
+        # POSTs (AI generations, emails) are only retried when the connection
+        # failed before the request was sent, never after a response
+        allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+def get_session() -> requests.Session:
+    """Return this process's shared session, creating it on first use or after a fork"""
+    global _session, _session_pid
+
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+def request(method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+    """Send a request through the shared session with the default timeouts"""
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    return get_session().request(method, url, timeout=timeout, **kwargs)
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request('POST', url, **kwargs)
@@ -0,0 +1,347 @@
+# File: services/job_queue.py
+# Durable SQLite job queue for background audits
+#
+# /api/audit enqueues a job and returns its id; worker processes (run_worker.py)
+# claim jobs one at a time. A claim is a lease: the claiming worker's id and an
+# expiry, renewed by heartbeat() while the job runs. Claims happen inside a
+# write transaction, so two workers never claim the same job, and only the
+# lease holder can report progress or finish it. If a worker dies, its lease
+# lapses and the job is claimed again, up to JOB_MAX_ATTEMPTS runs in total.
+#
+# Jobs move queued -> running -> succeeded | failed, or queued -> shed. The
+# status endpoint reads get(); progress is a small JSON dict the worker updates
+# as sections finish.
+#
+# Scheduling follows JOB_CLASSES: claim() takes the highest priority class
+# first and, within a class, the earliest delivery deadline. A class may cap
+# how many of its jobs run at once (free audits leave a worker for premium
+# orders) and may be sheddable: its queued jobs are dropped once their
+# deadline passes, and enqueue() refuses new ones beyond a queue depth.
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+from typing import Dict, Optional
+
+from config.settings import (
+    JOB_QUEUE_PATH, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETENTION_HOURS, PREMIUM_DELIVERY_HOURS,
+    FREE_JOB_DEADLINE_SECONDS, FREE_QUEUE_MAX_DEPTH, FREE_JOB_MAX_RUNNING
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+SHED = 'shed'
+
+# Scheduling class per audit type; lower priority values run first. max_running
+# and max_queued of None mean unlimited; only sheddable classes are ever dropped.
+JOB_CLASSES = {
+    'premium': {
+        'priority': 0,
+        'deadline_seconds': PREMIUM_DELIVERY_HOURS * 3600,
+        'max_running': None,
+        'max_queued': None,
+        'sheddable': False
+    },
+    'free': {
+        'priority': 1,
+        'deadline_seconds': FREE_JOB_DEADLINE_SECONDS,
+        'max_running': FREE_JOB_MAX_RUNNING,
+        'max_queued': FREE_QUEUE_MAX_DEPTH,
+        'sheddable': True
+    }
+}
+
+# How far back get_stats() looks for queue wait times
+WAIT_STATS_WINDOW = 3600
+
+class QueueFullError(Exception):
+    """A sheddable class already has its maximum number of queued jobs"""
+
+class JobQueue:
+    """SQLite-backed queue of audit jobs with leased, at-most-one-worker execution"""
+
+    def __init__(self, db_path: str, lease_seconds: int = 60, max_attempts: int = 3, retention_hours: int = 168,
+                 classes: Dict = None):
+        self.db_path = db_path
+        self.classes = classes if classes is not None else JOB_CLASSES
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_hours = retention_hours
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        # isolation_level=None so claim() can take the write lock with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS audit_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    audit_type TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress TEXT DEFAULT '{}',
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    worker_id TEXT,
+                    lease_expires REAL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            ''')
+            # Scheduling columns, added to queues created before priorities existed
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(audit_jobs)')}
+            if 'priority' not in columns:
+                conn.execute('ALTER TABLE audit_jobs ADD COLUMN priority INTEGER DEFAULT 1')
+            if 'deadline_at' not in columns:
+                conn.execute('ALTER TABLE audit_jobs ADD COLUMN deadline_at REAL')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_audit_jobs_status ON audit_jobs(status, created_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_audit_jobs_schedule ON audit_jobs(status, priority, deadline_at)')
+        finally:
+            conn.close()
+
+    def job_class(self, audit_type: str) -> Dict:
+        """Scheduling class of an audit type; unknown types are scheduled like free audits"""
+        return self.classes.get(audit_type) or self.classes['free']
+
+    def enqueue(self, audit_type: str, payload: Dict) -> str:
+        """Add a job and return its id; raises QueueFullError when its class's queue is full"""
+        job_id = uuid.uuid4().hex
+        job_class = self.job_class(audit_type)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            if job_class['max_queued'] is not None:
+                queued = conn.execute('SELECT COUNT(*) FROM audit_jobs WHERE status = ? AND audit_type = ?',
+                                      (QUEUED, audit_type)).fetchone()[0]
+                if queued >= job_class['max_queued']:
+                    conn.execute('ROLLBACK')
+                    raise QueueFullError(f'{queued} {audit_type} audits are already waiting')
+            conn.execute('''
+                INSERT INTO audit_jobs (job_id, audit_type, payload, status, created_at, priority, deadline_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (job_id, audit_type, json.dumps(payload), QUEUED, now,
+                  job_class['priority'], now + job_class['deadline_seconds']))
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Lease the next runnable job to worker_id: a queued job, or a running one whose lease lapsed.
+
+        Jobs are taken by class priority, then earliest deadline. Classes at
+        their max_running are skipped, and expired jobs of sheddable classes
+        are shed first.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            self._fail_exhausted(conn, now)
+            self._shed_expired(conn, now)
+            excluded = self._classes_at_capacity(conn, now)
+            row = conn.execute(f'''
+                SELECT * FROM audit_jobs
+                WHERE (status = ? OR (status = ? AND lease_expires <= ?))
+                  AND audit_type NOT IN ({','.join('?' * len(excluded))})
+                ORDER BY priority, COALESCE(deadline_at, created_at), created_at LIMIT 1
+            ''', (QUEUED, RUNNING, now, *excluded)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            if row['status'] == RUNNING:
+                logger.warning(f'Job {row["job_id"]} lost its worker {row["worker_id"]}, running it again')
+            conn.execute('''
+                UPDATE audit_jobs
+                SET status = ?, worker_id = ?, lease_expires = ?, attempts = attempts + 1,
+                    started_at = COALESCE(started_at, ?)
+                WHERE job_id = ?
+            ''', (RUNNING, worker_id, now + self.lease_seconds, now, row['job_id']))
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        job = self._to_dict(row)
+        job.update(status=RUNNING, worker_id=worker_id, attempts=row['attempts'] + 1)
+        return job
+
+    def _fail_exhausted(self, conn, now: float):
+        """Give up on lapsed jobs that already used all their attempts"""
+        conn.execute('''
+            UPDATE audit_jobs SET status = ?, error = ?, finished_at = ?, worker_id = NULL
+            WHERE status = ? AND lease_expires <= ? AND attempts >= ?
+        ''', (FAILED, 'Audit worker stopped before finishing the job', now, RUNNING, now, self.max_attempts))
+
+    def _shed_expired(self, conn, now: float):
+        """Drop queued jobs of sheddable classes whose deadline has passed"""
+        sheddable = [audit_type for audit_type, job_class in self.classes.items() if job_class['sheddable']]
+        if not sheddable:
+            return
+        shed = conn.execute(f'''
+            UPDATE audit_jobs SET status = ?, error = ?, finished_at = ?
+            WHERE status = ? AND deadline_at <= ? AND audit_type IN ({','.join('?' * len(sheddable))})
+        ''', (SHED, 'The service is busy; the audit could not start in time. Please try again later.',
+              now, QUEUED, now, *sheddable)).rowcount
+        if shed:
+            logger.warning(f'Shed {shed} queued jobs past their deadline')
+
+    def _classes_at_capacity(self, conn, now: float) -> list:
+        """Audit types whose running jobs have reached their class's max_running"""
+        running = {row['audit_type']: row['jobs'] for row in conn.execute(
+            'SELECT audit_type, COUNT(*) AS jobs FROM audit_jobs WHERE status = ? AND lease_expires > ? GROUP BY audit_type',
+            (RUNNING, now))}
+        return [audit_type for audit_type, job_class in self.classes.items()
+                if job_class['max_running'] is not None and running.get(audit_type, 0) >= job_class['max_running']]
+
+    def heartbeat(self, job_id: str, worker_id: str, progress: Optional[Dict] = None) -> bool:
+        """Renew the lease (and store progress); False if worker_id no longer holds the job"""
+        conn = self._connect()
+        try:
+            if progress is None:
+                cursor = conn.execute('''
+                    UPDATE audit_jobs SET lease_expires = ? WHERE job_id = ? AND worker_id = ? AND status = ?
+                ''', (time.time() + self.lease_seconds, job_id, worker_id, RUNNING))
+            else:
+                cursor = conn.execute('''
+                    UPDATE audit_jobs SET lease_expires = ?, progress = ?
+                    WHERE job_id = ? AND worker_id = ? AND status = ?
+                ''', (time.time() + self.lease_seconds, json.dumps(progress), job_id, worker_id, RUNNING))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, job_id: str, worker_id: str, result: Dict) -> bool:
+        """Finish the job with result: succeeded if result['success'], else failed"""
+        status = SUCCEEDED if result.get('success') else FAILED
+        return self._finish(job_id, worker_id, status, result=result, error=result.get('error'))
+
+    def release(self, job_id: str, worker_id: str) -> bool:
+        """Put a claimed job back in the queue without counting the attempt (the worker could not start it)"""
+        conn = self._connect()
+        try:
+            return conn.execute('''
+                UPDATE audit_jobs
+                SET status = ?, worker_id = NULL, lease_expires = NULL, attempts = MAX(attempts - 1, 0)
+                WHERE job_id = ? AND worker_id = ? AND status = ?
+            ''', (QUEUED, job_id, worker_id, RUNNING)).rowcount == 1
+        finally:
+            conn.close()
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = False) -> bool:
+        """Fail the job, or with retry put it back in the queue while attempts remain"""
+        if retry:
+            conn = self._connect()
+            try:
+                cursor = conn.execute('''
+                    UPDATE audit_jobs SET status = ?, worker_id = NULL, lease_expires = NULL, error = ?
+                    WHERE job_id = ? AND worker_id = ? AND status = ? AND attempts < ?
+                ''', (QUEUED, error, job_id, worker_id, RUNNING, self.max_attempts))
+                if cursor.rowcount == 1:
+                    return True
+            finally:
+                conn.close()
+        return self._finish(job_id, worker_id, FAILED, error=error)
+
+    def _finish(self, job_id: str, worker_id: str, status: str, result: Optional[Dict] = None,
+                error: Optional[str] = None) -> bool:
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                UPDATE audit_jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_expires = NULL
+                WHERE job_id = ? AND worker_id = ? AND status = ?
+            ''', (status, json.dumps(result, default=str) if result is not None else None, error,
+                  time.time(), job_id, worker_id, RUNNING))
+            if cursor.rowcount != 1:
+                logger.warning(f'Worker {worker_id} no longer holds job {job_id}; result discarded')
+                return False
+            return True
+        finally:
+            conn.close()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT * FROM audit_jobs WHERE job_id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._to_dict(row) if row is not None else None
+
+    def purge(self) -> int:
+        """Delete finished jobs older than the retention period"""
+        cutoff = time.time() - self.retention_hours * 3600
+        conn = self._connect()
+        try:
+            return conn.execute('DELETE FROM audit_jobs WHERE status IN (?, ?, ?) AND finished_at < ?',
+                                (SUCCEEDED, FAILED, SHED, cutoff)).rowcount
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict:
+        """Job counts, queue depth and queue wait per class (waits over the last WAIT_STATS_WINDOW seconds)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            counts = {(row['audit_type'], row['status']): row['jobs'] for row in conn.execute(
+                'SELECT audit_type, status, COUNT(*) AS jobs FROM audit_jobs GROUP BY audit_type, status')}
+            queued = {row['audit_type']: row for row in conn.execute('''
+                SELECT audit_type, MIN(created_at) AS oldest, SUM(deadline_at <= ?) AS overdue
+                FROM audit_jobs WHERE status = ? GROUP BY audit_type
+            ''', (now, QUEUED))}
+            waits = {row['audit_type']: row for row in conn.execute('''
+                SELECT audit_type, AVG(started_at - created_at) AS mean_wait, MAX(started_at - created_at) AS max_wait
+                FROM audit_jobs WHERE started_at > ? GROUP BY audit_type
+            ''', (now - WAIT_STATS_WINDOW,))}
+        finally:
+            conn.close()
+
+        classes = {}
+        for audit_type in sorted({audit_type for audit_type, _ in counts} | set(self.classes)):
+            pending = queued.get(audit_type)
+            wait = waits.get(audit_type)
+            classes[audit_type] = {
+                **{status: counts.get((audit_type, status), 0) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED, SHED)},
+                'overdue_queued': (pending['overdue'] or 0) if pending else 0,
+                'oldest_queued_seconds': round(now - pending['oldest'], 1) if pending else 0,
+                'mean_wait_seconds': round(wait['mean_wait'], 1) if wait else None,
+                'max_wait_seconds': round(wait['max_wait'], 1) if wait else None
+            }
+        return {
+            **{status: sum(stats[status] for stats in classes.values())
+               for status in (QUEUED, RUNNING, SUCCEEDED, FAILED, SHED)},
+            'classes': classes
+        }
+
+    def _to_dict(self, row) -> Dict:
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['progress'] = json.loads(job['progress'] or '{}')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+# Global audit job queue
+job_queue = JobQueue(JOB_QUEUE_PATH, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS,
+                     retention_hours=JOB_RETENTION_HOURS)
@@ -0,0 +1,148 @@
+# File: services/llm_cache.py
+# Content-addressed cache for LLM responses
+#
+# Responses are keyed by a SHA-256 of (model, system prompt, user prompt,
+# generation parameters), so an identical request - a double submit, a retry
+# after a downstream failure, or two customers auditing the same page - is
+# answered from SQLite instead of a paid 30+ second generation. Entries expire
+# after LLM_CACHE_TTL seconds and the least recently used entries are evicted
+# beyond LLM_CACHE_MAX_ENTRIES. Hit/miss counters are persisted alongside.
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from typing import Dict, Optional
+
+from config.settings import CACHE_DIR, ENABLE_LLM_CACHE, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+def make_key(model: str, system_prompt: str, user_prompt: str, params: Dict = None) -> str:
+    """Cache key for one chat completion request"""
+    payload = json.dumps({
+        'model': model,
+        'system': system_prompt,
+        'user': user_prompt,
+        'params': params or {}
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class LLMCache:
+    """SQLite-backed LLM response store with TTL, LRU eviction and hit/miss counters"""
+
+    def __init__(self, db_path: str, ttl: int = 604800, max_entries: int = 5000):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        # Several gunicorn workers share the file; wait for locks instead of failing
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    hit_count INTEGER DEFAULT 0
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_responses_last_accessed ON llm_responses(last_accessed)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache_counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER DEFAULT 0
+                )
+            ''')
+
+    def _count(self, conn, name: str):
+        conn.execute('INSERT OR IGNORE INTO llm_cache_counters (name, value) VALUES (?, 0)', (name,))
+        conn.execute('UPDATE llm_cache_counters SET value = value + 1 WHERE name = ?', (name,))
+
+    def get(self, cache_key: str) -> Optional[str]:
+        """Return the cached response text, or None on a miss or expired entry"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT response FROM llm_responses WHERE cache_key = ? AND expires_at > ?',
+                    (cache_key, now)
+                ).fetchone()
+                if row is None:
+                    self._count(conn, 'misses')
+                    return None
+                conn.execute(
+                    'UPDATE llm_responses SET last_accessed = ?, hit_count = hit_count + 1 WHERE cache_key = ?',
+                    (now, cache_key)
+                )
+                self._count(conn, 'hits')
+                return row['response']
+        except sqlite3.Error as e:
+            logger.warning(f'LLM cache read failed: {e}')
+            return None
+
+    def set(self, cache_key: str, response: str, model: str = '') -> bool:
+        """Store a response, then drop expired entries and evict beyond max_entries (LRU)"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO llm_responses
+                    (cache_key, model, response, created_at, expires_at, last_accessed, hit_count)
+                    VALUES (?, ?, ?, ?, ?, ?, 0)
+                ''', (cache_key, model, response, now, now + self.ttl, now))
+                conn.execute('DELETE FROM llm_responses WHERE expires_at <= ?', (now,))
+                evicted = conn.execute('''
+                    DELETE FROM llm_responses WHERE cache_key IN (
+                        SELECT cache_key FROM llm_responses ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+                    )
+                ''', (self.max_entries,)).rowcount
+                if evicted > 0:
+                    conn.execute('INSERT OR IGNORE INTO llm_cache_counters (name, value) VALUES (?, 0)', ('evictions',))
+                    conn.execute('UPDATE llm_cache_counters SET value = value + ? WHERE name = ?', (evicted, 'evictions'))
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f'LLM cache write failed: {e}')
+            return False
+
+    def clear(self) -> int:
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM llm_responses').rowcount
+
+    def get_cache_stats(self) -> Dict:
+        with self._connect() as conn:
+            counters = {row['name']: row['value'] for row in conn.execute('SELECT name, value FROM llm_cache_counters')}
+            row = conn.execute(
+                'SELECT COUNT(*) AS entries, COALESCE(SUM(LENGTH(response)), 0) AS size FROM llm_responses WHERE expires_at > ?',
+                (time.time(),)
+            ).fetchone()
+
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'enabled': ENABLE_LLM_CACHE,
+            'entries': row['entries'],
+            'total_size_mb': round(row['size'] / (1024 * 1024), 2),
+            'hits': hits,
+            'misses': misses,
+            'evictions': counters.get('evictions', 0),
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            'ttl_seconds': self.ttl,
+            'max_entries': self.max_entries
+        }
+
+# Global LLM response cache
+llm_cache = LLMCache(os.path.join(CACHE_DIR, 'llm_cache.db'), ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES)
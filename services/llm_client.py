@@ -0,0 +1,248 @@
+# File: services/llm_client.py
+# Async pooled LLM client - one interface for OpenAI and OpenRouter
+#
+# Both providers speak the OpenAI chat completions REST API, so calls go
+# straight to {base_url}/chat/completions over a shared aiohttp session with a
+# keep-alive connection pool. Each provider has its own concurrency limit so a
+# burst of audits cannot exceed its rate limits or starve the other provider.
+#
+# Each provider also has a circuit breaker (utils.circuit_breaker): once a
+# provider keeps timing out or returning 5xx, calls to it fail immediately with
+# a non-retryable LLMError so callers move straight on to the next provider.
+#
+# Passing on_delta streams the completion (server-sent events, the same
+# format for both providers): on_delta receives each text fragment as it
+# arrives and the call still returns the full content at the end.
+#
+# Every request is checked against the model's context window first
+# (max_tokens is reduced to fit), and its estimated and reported token usage
+# are recorded in utils.metrics.
+#
+# Callers await chat_completion() (sync code runs its coroutines on the
+# background event loop in utils.async_runner). close_clients() closes the
+# pooled sessions at shutdown.
+
+import asyncio
+import logging
+import json
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+from config.settings import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, OPENROUTER_API_KEY, OPENROUTER_BASE_URL,
+    OPENAI_MAX_CONCURRENCY, OPENROUTER_MAX_CONCURRENCY, LLM_POOL_SIZE, LLM_REQUEST_TIMEOUT
+)
+from services.token_budget import count_message_tokens, count_tokens, fit_max_tokens, TokenBudgetError
+from utils.metrics import metrics
+from utils.circuit_breaker import get_breaker
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = {
+    'openai': {
+        'base_url': OPENAI_BASE_URL,
+        'api_key': OPENAI_API_KEY,
+        'max_concurrency': OPENAI_MAX_CONCURRENCY
+    },
+    'openrouter': {
+        'base_url': OPENROUTER_BASE_URL,
+        'api_key': OPENROUTER_API_KEY,
+        'max_concurrency': OPENROUTER_MAX_CONCURRENCY
+    }
+}
+
+class LLMError(Exception):
+    """A provider call failed; retryable is True for timeouts, 429 and 5xx"""
+
+    def __init__(self, message: str, provider: str = '', status: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.provider = provider
+        self.status = status
+        self.retryable = retryable
+
+class LLMClient:
+    """Connection-pooled chat completions client bound to one event loop"""
+
+    def __init__(self, providers: Dict = None, pool_size: int = LLM_POOL_SIZE):
+        self.providers = providers if providers is not None else PROVIDERS
+        self.pool_size = pool_size
+        self._session = None
+        self._semaphores = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _get_semaphore(self, provider: str) -> asyncio.Semaphore:
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(self.providers[provider]['max_concurrency'])
+        return self._semaphores[provider]
+
+    async def chat_completion(self, provider: str, model: str, messages: List[Dict],
+                              max_tokens: int = 4000, temperature: float = 0.7,
+                              timeout: Optional[float] = None,
+                              on_delta: Optional[Callable[[str], None]] = None,
+                              on_usage: Optional[Callable[[Dict], None]] = None) -> str:
+        """Send one chat completion and return the message content (streamed to on_delta if given).
+
+        on_usage receives {'prompt_tokens', 'completion_tokens'} for the call:
+        the provider's reported usage, or local estimates when it reports none.
+        """
+        if provider not in self.providers:
+            raise LLMError(f'Unknown LLM provider: {provider}', provider)
+        config = self.providers[provider]
+        if not config['api_key']:
+            raise LLMError(f'{provider} API key is not configured', provider)
+
+        estimated_prompt_tokens = count_message_tokens(messages, model)
+        try:
+            max_tokens = fit_max_tokens(model, estimated_prompt_tokens, max_tokens)
+        except TokenBudgetError as e:
+            raise LLMError(str(e), provider)
+
+        payload = {
+            'model': model,
+            'messages': messages,
+            'max_tokens': max_tokens,
+            'temperature': temperature
+        }
+        if on_delta is not None:
+            payload['stream'] = True
+            payload['stream_options'] = {'include_usage': True}
+        headers = {
+            'Authorization': f"Bearer {config['api_key']}",
+            'Content-Type': 'application/json'
+        }
+        client_timeout = aiohttp.ClientTimeout(total=timeout or LLM_REQUEST_TIMEOUT)
+
+        async with self._get_semaphore(provider):
+            breaker = get_breaker(provider)
+            if not breaker.allow_request():
+                raise LLMError(f'{provider} circuit is open, skipping', provider)
+            try:
+                result = await self._post(provider, config, payload, headers, client_timeout, on_delta)
+            except LLMError as e:
+                # Only outages count against the breaker; a 4xx means the provider is up
+                if e.retryable:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+            breaker.record_success()
+
+        usage = result.get('usage') if isinstance(result, dict) else None
+        record_usage(provider, model, estimated_prompt_tokens, usage)
+
+        try:
+            content = result['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError):
+            raise LLMError(f'{provider} returned an unexpected response shape', provider)
+
+        if on_usage is not None:
+            usage = usage or {}
+            on_usage({
+                'prompt_tokens': usage.get('prompt_tokens') or estimated_prompt_tokens,
+                'completion_tokens': usage.get('completion_tokens') or count_tokens(content or '', model)
+            })
+        return content
+
+    async def _post(self, provider: str, config: Dict, payload: Dict, headers: Dict,
+                    client_timeout: aiohttp.ClientTimeout,
+                    on_delta: Optional[Callable[[str], None]] = None) -> Dict:
+        try:
+            async with self._get_session().post(f"{config['base_url']}/chat/completions",
+                                                json=payload, headers=headers, timeout=client_timeout) as response:
+                if response.status != 200:
+                    body = await response.text()
+                    raise LLMError(f'{provider} returned HTTP {response.status}: {body[:200]}', provider,
+                                   status=response.status,
+                                   retryable=response.status == 429 or response.status >= 500)
+                if on_delta is not None:
+                    return await self._read_stream(provider, response, on_delta)
+                return await response.json(content_type=None)
+        except asyncio.TimeoutError:
+            raise LLMError(f'{provider} request timed out', provider, retryable=True)
+        except aiohttp.ClientError as e:
+            raise LLMError(f'{provider} request failed: {e}', provider, retryable=True)
+
+    async def _read_stream(self, provider: str, response, on_delta: Callable[[str], None]) -> Dict:
+        """Collect a server-sent event stream into a regular completion response"""
+        parts = []
+        usage = None
+        async for line in response.content:
+            line = line.strip()
+            if not line.startswith(b'data:'):
+                continue
+            data = line[5:].strip()
+            if data == b'[DONE]':
+                break
+            try:
+                event = json.loads(data)
+                usage = event.get('usage') or usage
+                # The usage event that ends the stream has no choices
+                delta = event['choices'][0].get('delta', {}).get('content') if event['choices'] else None
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                raise LLMError(f'{provider} sent a malformed stream event', provider, retryable=True)
+            if delta:
+                parts.append(delta)
+                on_delta(delta)
+        return {'choices': [{'message': {'content': ''.join(parts)}}], 'usage': usage}
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+def record_usage(provider: str, model: str, estimated_prompt_tokens: int, usage: Optional[Dict]):
+    """Record the local prompt estimate next to the token usage the provider reported"""
+    metrics.increment('llm_estimated_prompt_tokens', estimated_prompt_tokens)
+    if not usage:
+        logger.debug(f'{provider}/{model}: ~{estimated_prompt_tokens} prompt tokens (no usage reported)')
+        return
+    prompt_tokens = usage.get('prompt_tokens') or 0
+    completion_tokens = usage.get('completion_tokens') or 0
+    metrics.increment('llm_prompt_tokens', prompt_tokens)
+    metrics.increment('llm_completion_tokens', completion_tokens)
+    metrics.increment(f'llm_tokens.{provider}', prompt_tokens + completion_tokens)
+    if prompt_tokens and estimated_prompt_tokens:
+        metrics.observe('llm_prompt_estimate_ratio', prompt_tokens / estimated_prompt_tokens)
+    logger.debug(f'{provider}/{model}: prompt {prompt_tokens} tokens (estimated {estimated_prompt_tokens}), '
+                 f'completion {completion_tokens} tokens')
+
+# One client per background loop (async_runner starts a fresh loop after a fork)
+_clients = {}
+
+def get_client() -> LLMClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = LLMClient()
+    return client
+
+def close_clients(timeout: float = 5):
+    """Close every loop's client and its pooled connections (worker shutdown, end of tests).
+
+    Call it from outside those loops; clients of loops that were already
+    closed are just dropped.
+    """
+    while _clients:
+        loop, client = _clients.popitem()
+        if loop.is_closed():
+            continue
+        try:
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.close(), loop).result(timeout)
+            else:
+                loop.run_until_complete(client.close())
+        except Exception as e:
+            logger.warning(f'Failed to close LLM client session: {e}')
+
+async def chat_completion(provider: str, model: str, messages: List[Dict], **kwargs) -> str:
+    """Async chat completion through the shared client for the running loop"""
+    return await get_client().chat_completion(provider, model, messages, **kwargs)
@@ -0,0 +1,73 @@
+# File: services/model_routing.py
+# Model, token and latency policy per audit tier
+#
+# AI_MODEL_ROUTING (config/settings.py) maps each audit type to the providers
+# and model its sections use, a completion token cap, a prompt content budget
+# and a latency target, with optional per-section overrides. get_route()
+# resolves an audit type to a complete policy; fields a tier leaves out take
+# the defaults below. record_analysis() reports latency and cost per tier in
+# utils.metrics.
+
+from typing import Dict, List, Optional
+
+from config.settings import AI_MODEL_ROUTING, PROMPT_CONTENT_TOKENS
+from services.analysis_sections import SECTIONS
+from services.token_budget import estimate_cost
+from utils.metrics import metrics
+
+DEFAULT_TIER = 'premium'
+
+DEFAULT_ROUTE = {
+    'providers': [('openai', 'gpt-4'), ('openrouter', 'openai/gpt-4')],
+    'max_tokens': None,
+    'content_tokens': PROMPT_CONTENT_TOKENS,
+    'latency_target': None,
+    'sections': None,
+    'section_overrides': {}
+}
+
+def get_route(audit_type: Optional[str]) -> Dict:
+    """Routing policy for an audit type; unknown types use the premium tier"""
+    tier = audit_type if audit_type in AI_MODEL_ROUTING else DEFAULT_TIER
+    route = {**DEFAULT_ROUTE, **AI_MODEL_ROUTING.get(tier, {}), 'tier': tier}
+    route['providers'] = [tuple(pair) for pair in route['providers'] or DEFAULT_ROUTE['providers']]
+    route['section_overrides'] = route['section_overrides'] or {}
+    return route
+
+def planned_sections(route: Dict) -> List[Dict]:
+    """The sections this tier generates with the LLM"""
+    if route['sections'] is None:
+        return list(SECTIONS)
+    return [section for section in SECTIONS if section['name'] in route['sections']]
+
+def section_max_tokens(route: Dict, section: Dict) -> int:
+    """Completion tokens for a section: its override, else its own limit capped by the tier"""
+    override = route['section_overrides'].get(section['name'], {}).get('max_tokens')
+    if override:
+        return override
+    if route['max_tokens']:
+        return min(section['max_tokens'], route['max_tokens'])
+    return section['max_tokens']
+
+class UsageTotals:
+    """Tokens and list-price cost of one analysis, summed over its provider calls"""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+    def add(self, model: str, usage: Dict):
+        self.prompt_tokens += usage['prompt_tokens']
+        self.completion_tokens += usage['completion_tokens']
+        self.cost += estimate_cost(model, usage['prompt_tokens'], usage['completion_tokens'])
+
+def record_analysis(route: Dict, seconds: float, usage: UsageTotals):
+    """Per-tier analysis latency, cost (in cents, so cheap tiers keep precision) and target misses"""
+    tier = route['tier']
+    metrics.increment(f'ai_analyses.{tier}')
+    metrics.increment(f'ai_tokens.{tier}', usage.prompt_tokens + usage.completion_tokens)
+    metrics.observe(f'ai_analysis_seconds.{tier}', seconds)
+    metrics.observe(f'ai_cost_cents.{tier}', usage.cost * 100)
+    if route['latency_target'] and seconds > route['latency_target']:
+        metrics.increment(f'ai_latency_target_missed.{tier}')
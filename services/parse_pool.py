@@ -0,0 +1,111 @@
+# File: services/parse_pool.py
+# Process pool for CPU-bound HTML extraction
+#
+# Parsing a large page holds the GIL for the whole extraction, which under the
+# gevent worker class stalls every other greenlet in the process. When enabled,
+# the scraper hands the raw body bytes to this pool and gets back only the
+# compact (website_data, links) result.
+#
+# Workers are started with the 'spawn' method so they never inherit the gevent
+# hub, sockets or locks of the gunicorn worker; they only import the
+# dependency-free services.html_extractor module.
+#
+# A worker cannot be interrupted once it has started a page, so at most
+# PARSE_POOL_MAX_PENDING pages are in the pool at a time. A page that finds the
+# pool full, or is not parsed within PARSE_POOL_TIMEOUT, is not re-parsed in
+# full in-process: only its first PARSE_POOL_MIN_BYTES are, and the result is
+# marked content_truncated.
+
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import PARSE_POOL_WORKERS, PARSE_POOL_MIN_BYTES, PARSE_POOL_TIMEOUT, PARSE_POOL_MAX_PENDING
+from services.html_extractor import extract_page, available_backend
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(max(1, PARSE_POOL_MAX_PENDING))
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Return this process's pool, creating it on first use or after a fork"""
+    global _executor, _executor_pid
+
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ProcessPoolExecutor(
+                    max_workers=PARSE_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                _executor_pid = pid
+    return _executor
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+
+def _warm_up() -> str:
+    """Runs in a pool worker to force the extractor and parser imports"""
+    return available_backend()
+
+def warm_start():
+    """Start every pool worker now instead of on the first large page.
+
+    Called from the gunicorn post_worker_init hook, after the gevent worker has
+    monkey-patched the process, so the pool's management thread is cooperative.
+    """
+    executor = _get_executor()
+    futures = [executor.submit(_warm_up) for _ in range(PARSE_POOL_WORKERS)]
+    for future in futures:
+        future.result(timeout=PARSE_POOL_TIMEOUT)
+    logger.info(f'HTML parse pool started with {PARSE_POOL_WORKERS} workers (pid {os.getpid()})')
+
+def _release_slot(future):
+    _pending.release()
+
+def _extract_head(url: str, body: bytes, backend: str, encoding: Optional[str]) -> Tuple[Dict, List[str]]:
+    """Parse only the start of the body in-process, cheap enough not to stall the event loop"""
+    website_data, links = extract_page(url, body[:PARSE_POOL_MIN_BYTES], backend=backend, encoding=encoding)
+    website_data['content_truncated'] = True
+    return website_data, links
+
+def extract_in_pool(url: str, body: bytes, backend: str = 'auto', encoding: Optional[str] = None) -> Tuple[Dict, List[str]]:
+    """Extract a page in a pool worker; parses only the start of the page in-process if the pool is full or too slow"""
+    if not _pending.acquire(blocking=False):
+        logger.warning(f'HTML parse pool is full, parsing only the first {PARSE_POOL_MIN_BYTES} bytes of {url} in-process')
+        return _extract_head(url, body, backend, encoding)
+
+    try:
+        try:
+            future = _get_executor().submit(extract_page, url, body, backend, encoding)
+        except BaseException:
+            _pending.release()
+            raise
+        # The slot is held until the worker is done with the page, even after a timeout
+        future.add_done_callback(_release_slot)
+        return future.result(timeout=PARSE_POOL_TIMEOUT)
+    except FutureTimeout:
+        # Frees the slot now if the page never reached a worker; a running parse cannot be stopped
+        future.cancel()
+        logger.warning(f'HTML parse pool did not parse {url} within {PARSE_POOL_TIMEOUT}s, '
+                       f'parsing only its first {PARSE_POOL_MIN_BYTES} bytes in-process')
+        return _extract_head(url, body, backend, encoding)
+    except BrokenProcessPool:
+        logger.warning(f'HTML parse pool is broken, parsing {url} in-process and restarting the pool')
+        _reset_executor()
+        return extract_page(url, body, backend=backend, encoding=encoding)
+
+def shutdown():
+    _reset_executor()
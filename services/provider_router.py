@@ -0,0 +1,178 @@
+# File: services/provider_router.py
+# Latency-aware provider ordering and hedged LLM requests
+#
+# Every call records its latency per (provider, model). rank() orders the
+# configured providers by moving-average latency, with providers whose circuit
+# is open last. hedged() starts the call on the first provider and, if it has
+# not answered within that provider's p95 latency, fires a duplicate at the
+# second one and takes whichever answers first. Hedges draw from a token
+# bucket refilled by HEDGE_BUDGET_PERCENT of each primary call, so they add at
+# most that share of extra spend.
+#
+# Like the circuit breakers, this state is process-local and only updated from
+# the background event loop.
+
+import time
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config.settings import (
+    ENABLE_HEDGING, HEDGE_BUDGET_PERCENT, HEDGE_DEFAULT_DELAY, HEDGE_MIN_SAMPLES, LATENCY_WINDOW
+)
+from services.llm_client import LLMError
+from utils.circuit_breaker import get_breaker, OPEN
+
+# Weight of the newest sample in the moving average
+EWMA_ALPHA = 0.2
+
+class LatencyTracker:
+    """Moving latency distribution for one provider/model"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=max(1, window))
+        self.ewma = None
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self.ewma = seconds if self.ewma is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.ewma
+
+    def record_at_least(self, seconds: float):
+        """Record a call that was abandoned after seconds, so it took at least that long.
+
+        Such a sample can only make the provider look slower: one shorter than
+        the current average says nothing and is dropped.
+        """
+        if self.ewma is None or seconds >= self.ewma:
+            self.record(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def get_stats(self) -> Dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            'samples': len(self.samples),
+            'ewma_seconds': round(self.ewma, 2) if self.ewma is not None else None,
+            'p50_seconds': round(p50, 2) if p50 is not None else None,
+            'p95_seconds': round(p95, 2) if p95 is not None else None
+        }
+
+class HedgeBudget:
+    """Token bucket: each primary call earns percent/100 of a hedge, each hedge spends one"""
+
+    def __init__(self, percent: int = 10, burst: float = 2.0):
+        self.rate = max(0, percent) / 100
+        self.burst = burst
+        self.tokens = burst if self.rate else 0.0
+        self.primary_calls = 0
+        self.hedges = 0
+
+    def record_primary(self):
+        self.primary_calls += 1
+        self.tokens = min(self.burst, self.tokens + self.rate)
+
+    def try_spend(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.hedges += 1
+        return True
+
+_trackers = {}
+budget = HedgeBudget(HEDGE_BUDGET_PERCENT)
+
+def get_tracker(provider: str, model: str) -> LatencyTracker:
+    key = (provider, model)
+    tracker = _trackers.get(key)
+    if tracker is None:
+        tracker = _trackers[key] = LatencyTracker(LATENCY_WINDOW)
+    return tracker
+
+def rank(providers: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Providers ordered fastest first; untried providers keep their configured
+    place ahead of measured ones, and providers with an open circuit go last"""
+    def expected(item):
+        index, (provider, model) = item
+        ewma = get_tracker(provider, model).ewma
+        return (get_breaker(provider).state == OPEN, ewma if ewma is not None else 0.0, index)
+
+    return [pair for _, pair in sorted(enumerate(providers), key=expected)]
+
+def hedge_delay(provider: str, model: str) -> float:
+    """Seconds to wait for a provider before hedging: its p95 once it has enough samples"""
+    tracker = get_tracker(provider, model)
+    if len(tracker.samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return tracker.percentile(95)
+
+async def timed(provider: str, model: str, call: Callable[[], Awaitable[str]]) -> str:
+    """Await call() and record how long it took.
+
+    Timeouts and outages are recorded too, as they are still evidence of how
+    slow the provider was; a lost hedge race only counts when it cannot make
+    the provider look faster. Immediate rejections (a missing API key, an open
+    circuit) are not recorded, so they cannot make a provider look fast.
+    """
+    started = time.monotonic()
+    try:
+        result = await call()
+    except LLMError as e:
+        if e.retryable:
+            get_tracker(provider, model).record(time.monotonic() - started)
+        raise
+    except asyncio.CancelledError:
+        get_tracker(provider, model).record_at_least(time.monotonic() - started)
+        raise
+    get_tracker(provider, model).record(time.monotonic() - started)
+    return result
+
+async def hedged(primary: Tuple[str, str], send_primary: Callable[[], Awaitable[str]],
+                 secondary: Optional[Tuple[str, str]] = None,
+                 send_secondary: Optional[Callable[[], Awaitable[str]]] = None) -> str:
+    """Run the primary call, hedging onto the secondary once it passes its p95.
+
+    The first successful answer wins and the other call is cancelled. If the
+    primary fails before the hedge fires, its error is raised so the caller's
+    retry logic applies; once both are running, an error is raised only if
+    both fail.
+    """
+    budget.record_primary()
+    primary_task = asyncio.ensure_future(timed(*primary, send_primary))
+    if not ENABLE_HEDGING or secondary is None or get_breaker(secondary[0]).state == OPEN:
+        return await primary_task
+
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=hedge_delay(*primary))
+    except asyncio.CancelledError:
+        primary_task.cancel()
+        raise
+    if done or not budget.try_spend():
+        return await primary_task
+
+    secondary_task = asyncio.ensure_future(timed(*secondary, send_secondary))
+    pending = {primary_task, secondary_task}
+    first_error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                if first_error is None or task is primary_task:
+                    first_error = task.exception()
+        raise first_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+def get_stats() -> Dict:
+    return {
+        'hedging_enabled': ENABLE_HEDGING,
+        'primary_calls': budget.primary_calls,
+        'hedges': budget.hedges,
+        'latency': {f'{provider}/{model}': tracker.get_stats() for (provider, model), tracker in _trackers.items()}
+    }
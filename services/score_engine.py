@@ -0,0 +1,492 @@
+# File: services/score_engine.py
+# Deterministic technical-SEO rule engine - scores computed from website_data without the LLM
+#
+# Every check is a row in RULES. A rule's check returns a credit between 0 and
+# 1 (True/False are accepted), or None when the rule does not apply to the
+# page (e.g. alt-text coverage on a page with no images). A category scores
+# 100 * sum(weight * credit) / sum(weight) over its applicable rules. The
+# overall score is the CATEGORY_WEIGHTS-weighted mean of the category scores.
+#
+# To add a check, append a rule dict to RULES (or call add_rule) - nothing in
+# SEOAuditor needs to change.
+
+import re
+from typing import Dict, List, Optional
+
+SCORING_VERSION = '1'
+
+CATEGORY_WEIGHTS = {
+    'technical_seo': 0.35,
+    'content_quality': 0.25,
+    'schema_markup': 0.15,
+    'ai_readiness': 0.25
+}
+
+QUESTION_PATTERN = re.compile(r'^(who|what|when|where|why|how|can|does|is|are|should)\b|\?\s*$', re.IGNORECASE)
+
+def _length_credit(text: str, minimum: int, maximum: int) -> float:
+    """Full credit inside [minimum, maximum], proportionally less outside it"""
+    length = len((text or '').strip())
+    if not length:
+        return 0.0
+    if length < minimum:
+        return length / minimum
+    if length > maximum:
+        return max(0.0, 1 - (length - maximum) / maximum)
+    return 1.0
+
+def _site_ratio(data: Dict, key: str) -> Optional[float]:
+    """Share of crawled pages WITHOUT the problem counted by site_summary[key] (None for single pages)"""
+    site_summary = data.get('site_summary')
+    if not site_summary or not site_summary.get('pages_crawled'):
+        return None
+    return 1 - site_summary.get(key, 0) / site_summary['pages_crawled']
+
+def _schema_has(data: Dict, *types: str) -> bool:
+    return any(schema_type in types for schema_type in data.get('schema_types', []))
+
+def _headings(data: Dict) -> List[str]:
+    return data.get('h1_tags', []) + data.get('h2_tags', []) + data.get('h3_tags', [])
+
+RULES = [
+    # Technical SEO
+    {
+        'id': 'title_present',
+        'category': 'technical_seo',
+        'weight': 15,
+        'check': lambda d: bool((d.get('title') or '').strip()),
+        'issue': 'Missing or inadequate title tag optimization',
+        'recommendation': 'Add a unique, descriptive title tag to every page',
+        'business_impact': 'high',
+        'implementation_effort': '1 week',
+        'expected_improvement': '25% improvement in click-through rates',
+        'priority_score': 10
+    },
+    {
+        'id': 'title_length',
+        'category': 'technical_seo',
+        'weight': 5,
+        'check': lambda d: _length_credit(d.get('title'), 30, 60) if d.get('title') else None,
+        'issue': 'Title tag length is outside the 30-60 character range shown in search results',
+        'recommendation': 'Rewrite the title to 30-60 characters with the primary keyword first',
+        'business_impact': 'medium',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Titles displayed in full in search results',
+        'priority_score': 5
+    },
+    {
+        'id': 'meta_description_present',
+        'category': 'technical_seo',
+        'weight': 10,
+        'check': lambda d: bool((d.get('meta_description') or '').strip()),
+        'issue': 'Missing meta descriptions reducing AI extraction potential',
+        'recommendation': 'Write a compelling meta description for every page',
+        'business_impact': 'medium',
+        'implementation_effort': '1 week',
+        'expected_improvement': '15% improvement in search visibility',
+        'priority_score': 8
+    },
+    {
+        'id': 'meta_description_length',
+        'category': 'technical_seo',
+        'weight': 3,
+        'check': lambda d: _length_credit(d.get('meta_description'), 70, 160) if d.get('meta_description') else None,
+        'issue': 'Meta description length is outside the 70-160 character range',
+        'recommendation': 'Keep meta descriptions between 70 and 160 characters',
+        'business_impact': 'low',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Snippets shown without truncation',
+        'priority_score': 4
+    },
+    {
+        'id': 'single_h1',
+        'category': 'technical_seo',
+        'weight': 8,
+        'check': lambda d: 1.0 if len(d.get('h1_tags', [])) == 1 else (0.5 if d.get('h1_tags') else 0.0),
+        'issue': 'Page does not have exactly one H1 heading',
+        'recommendation': 'Use a single H1 that states the page topic',
+        'business_impact': 'medium',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Clearer topic signals for search engines',
+        'priority_score': 7
+    },
+    {
+        'id': 'ssl_certificate',
+        'category': 'technical_seo',
+        'weight': 12,
+        'check': lambda d: bool(d.get('ssl_certificate')),
+        'issue': 'Site is not served over HTTPS',
+        'recommendation': 'Install an SSL certificate and redirect all HTTP traffic to HTTPS',
+        'business_impact': 'critical',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Removes browser security warnings and ranking penalty',
+        'priority_score': 10
+    },
+    {
+        'id': 'canonical_url',
+        'category': 'technical_seo',
+        'weight': 5,
+        'check': lambda d: bool(d.get('canonical_url')),
+        'issue': 'No canonical URL declared',
+        'recommendation': 'Add a rel="canonical" link to consolidate duplicate URLs',
+        'business_impact': 'medium',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Ranking signals consolidated on one URL',
+        'priority_score': 6
+    },
+    {
+        'id': 'image_alt_text',
+        'category': 'technical_seo',
+        'weight': 6,
+        'check': lambda d: 1 - d.get('images_without_alt', 0) / d['images'] if d.get('images') else None,
+        'issue': 'Images lacking accessibility and SEO optimization (missing alt text)',
+        'recommendation': 'Add descriptive alt text to every meaningful image',
+        'business_impact': 'medium',
+        'implementation_effort': '1-2 weeks',
+        'expected_improvement': '10% improvement in page comprehension by AI',
+        'priority_score': 6
+    },
+    {
+        'id': 'page_size',
+        'category': 'technical_seo',
+        'weight': 5,
+        'check': lambda d: not d.get('content_truncated'),
+        'issue': 'Page HTML exceeds the crawl size limit; search and AI crawlers may not read all content',
+        'recommendation': 'Reduce page weight by removing inline scripts, styles and unused markup',
+        'business_impact': 'medium',
+        'implementation_effort': '2-3 weeks',
+        'expected_improvement': 'Faster crawling and complete content indexing',
+        'priority_score': 7
+    },
+    {
+        'id': 'internal_linking',
+        'category': 'technical_seo',
+        'weight': 5,
+        'check': lambda d: min(1.0, d.get('internal_links', 0) / 10),
+        'issue': 'Few internal links to help crawlers discover the rest of the site',
+        'recommendation': 'Link to key pages from the homepage and navigation',
+        'business_impact': 'medium',
+        'implementation_effort': '1-2 weeks',
+        'expected_improvement': 'Better crawl coverage and link equity distribution',
+        'priority_score': 5
+    },
+    {
+        'id': 'robots_allows_homepage',
+        'category': 'technical_seo',
+        'weight': 15,
+        'check': lambda d: not d['site_summary'].get('robots_blocks_homepage') if d.get('site_summary') else None,
+        'issue': 'robots.txt blocks the homepage from being crawled',
+        'recommendation': 'Remove the Disallow rule that matches the homepage',
+        'business_impact': 'critical',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Homepage becomes eligible for indexing',
+        'priority_score': 10
+    },
+    {
+        'id': 'sitemap_present',
+        'category': 'technical_seo',
+        'weight': 4,
+        'check': lambda d: d['site_summary'].get('sitemap_url_count', 0) > 0 if d.get('site_summary') else None,
+        'issue': 'No XML sitemap found',
+        'recommendation': 'Publish an XML sitemap and reference it from robots.txt',
+        'business_impact': 'medium',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Faster discovery of new and updated pages',
+        'priority_score': 6
+    },
+    {
+        'id': 'site_titles_unique',
+        'category': 'technical_seo',
+        'weight': 5,
+        'check': lambda d: _site_ratio(d, 'duplicate_titles'),
+        'issue': 'Duplicate title tags across crawled pages',
+        'recommendation': 'Give every page a unique title',
+        'business_impact': 'medium',
+        'implementation_effort': '1-2 weeks',
+        'expected_improvement': 'Pages stop competing with each other in results',
+        'priority_score': 6
+    },
+    {
+        'id': 'site_meta_descriptions',
+        'category': 'technical_seo',
+        'weight': 5,
+        'check': lambda d: _site_ratio(d, 'pages_missing_meta_description'),
+        'issue': 'Crawled pages missing meta descriptions',
+        'recommendation': 'Add meta descriptions to all crawled pages',
+        'business_impact': 'medium',
+        'implementation_effort': '1-2 weeks',
+        'expected_improvement': 'Consistent snippets across the site',
+        'priority_score': 5
+    },
+
+    # Content quality
+    {
+        'id': 'content_depth',
+        'category': 'content_quality',
+        'weight': 30,
+        'check': lambda d: min(1.0, d.get('content_length', 0) / 1500),
+        'issue': 'Insufficient content depth for AI search visibility',
+        'recommendation': 'Create comprehensive, AI-optimized content covering user questions in depth',
+        'business_impact': 'high',
+        'implementation_effort': '2-3 weeks',
+        'expected_improvement': '40% increase in AI search mentions',
+        'priority_score': 9
+    },
+    {
+        'id': 'heading_structure',
+        'category': 'content_quality',
+        'weight': 15,
+        'check': lambda d: min(1.0, len(d.get('h2_tags', [])) / 3),
+        'issue': 'Content lacks H2 subheadings to structure the page',
+        'recommendation': 'Break content into sections with descriptive H2 headings',
+        'business_impact': 'medium',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Easier scanning for readers and passage ranking',
+        'priority_score': 6
+    },
+    {
+        'id': 'h1_present',
+        'category': 'content_quality',
+        'weight': 15,
+        'check': lambda d: bool(d.get('h1_tags')),
+        'issue': 'No H1 heading describing the page',
+        'recommendation': 'Add an H1 that matches the main search intent',
+        'business_impact': 'high',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Stronger topical relevance',
+        'priority_score': 8
+    },
+    {
+        'id': 'outbound_references',
+        'category': 'content_quality',
+        'weight': 5,
+        'check': lambda d: d.get('external_links', 0) > 0,
+        'issue': 'No outbound links to supporting sources',
+        'recommendation': 'Cite authoritative sources where claims are made',
+        'business_impact': 'low',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Improved trust signals',
+        'priority_score': 3
+    },
+    {
+        'id': 'site_thin_content',
+        'category': 'content_quality',
+        'weight': 15,
+        'check': lambda d: _site_ratio(d, 'thin_content_pages'),
+        'issue': 'Many crawled pages have thin content (under 1,000 characters)',
+        'recommendation': 'Expand or consolidate thin pages',
+        'business_impact': 'high',
+        'implementation_effort': '3-4 weeks',
+        'expected_improvement': 'Higher site-wide quality signals',
+        'priority_score': 7
+    },
+    {
+        'id': 'site_h1_coverage',
+        'category': 'content_quality',
+        'weight': 10,
+        'check': lambda d: _site_ratio(d, 'pages_missing_h1'),
+        'issue': 'Crawled pages missing an H1 heading',
+        'recommendation': 'Add an H1 to every indexable page',
+        'business_impact': 'medium',
+        'implementation_effort': '1-2 weeks',
+        'expected_improvement': 'Consistent topical signals across the site',
+        'priority_score': 5
+    },
+
+    # Schema markup
+    {
+        'id': 'structured_data_present',
+        'category': 'schema_markup',
+        'weight': 40,
+        'check': lambda d: bool(d.get('has_schema')),
+        'issue': 'Complete absence of structured data markup',
+        'recommendation': 'Implement comprehensive schema markup for all content types',
+        'business_impact': 'critical',
+        'implementation_effort': '3-4 weeks',
+        'expected_improvement': '60% improvement in AI search understanding',
+        'priority_score': 10
+    },
+    {
+        'id': 'organization_schema',
+        'category': 'schema_markup',
+        'weight': 20,
+        'check': lambda d: _schema_has(d, 'Organization', 'LocalBusiness', 'Corporation', 'Person'),
+        'issue': 'No Organization or LocalBusiness schema identifying the business',
+        'recommendation': 'Add Organization (or LocalBusiness) schema with name, logo and contact details',
+        'business_impact': 'high',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Eligibility for knowledge panel and brand results',
+        'priority_score': 8
+    },
+    {
+        'id': 'website_schema',
+        'category': 'schema_markup',
+        'weight': 10,
+        'check': lambda d: _schema_has(d, 'WebSite'),
+        'issue': 'No WebSite schema',
+        'recommendation': 'Add WebSite schema with the site name and search action',
+        'business_impact': 'low',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Site name shown correctly in results',
+        'priority_score': 4
+    },
+    {
+        'id': 'rich_result_schema',
+        'category': 'schema_markup',
+        'weight': 20,
+        'check': lambda d: _schema_has(d, 'FAQPage', 'HowTo', 'Product', 'Article', 'BlogPosting', 'Service', 'Review'),
+        'issue': 'No rich-result schema (FAQ, HowTo, Product, Article)',
+        'recommendation': 'Mark up FAQs, products or articles with the matching schema type',
+        'business_impact': 'high',
+        'implementation_effort': '2-3 weeks',
+        'expected_improvement': 'Eligibility for rich results',
+        'priority_score': 7
+    },
+    {
+        'id': 'breadcrumb_schema',
+        'category': 'schema_markup',
+        'weight': 10,
+        'check': lambda d: _schema_has(d, 'BreadcrumbList'),
+        'issue': 'No BreadcrumbList schema',
+        'recommendation': 'Add BreadcrumbList schema to show site hierarchy',
+        'business_impact': 'low',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Breadcrumb trails in search results',
+        'priority_score': 3
+    },
+
+    # AI readiness
+    {
+        'id': 'question_headings',
+        'category': 'ai_readiness',
+        'weight': 20,
+        'check': lambda d: min(1.0, sum(1 for h in _headings(d) if QUESTION_PATTERN.search(h.strip())) / 2),
+        'issue': 'No question-style headings for AI answers and voice search',
+        'recommendation': 'Add headings phrased as the questions customers ask, each followed by a direct answer',
+        'business_impact': 'high',
+        'implementation_effort': '2-3 weeks',
+        'expected_improvement': 'Content eligible for AI Overview and voice answers',
+        'priority_score': 8
+    },
+    {
+        'id': 'faq_schema',
+        'category': 'ai_readiness',
+        'weight': 20,
+        'check': lambda d: _schema_has(d, 'FAQPage', 'QAPage', 'HowTo'),
+        'issue': 'No FAQ or HowTo schema for AI answer extraction',
+        'recommendation': 'Implement FAQ schema for Google AI Overview inclusion',
+        'business_impact': 'high',
+        'implementation_effort': '1-2 weeks',
+        'expected_improvement': 'Answers extracted directly by AI assistants',
+        'priority_score': 8
+    },
+    {
+        'id': 'ai_summary_metadata',
+        'category': 'ai_readiness',
+        'weight': 15,
+        'check': lambda d: bool(d.get('meta_description')) and bool(d.get('open_graph')),
+        'issue': 'Missing summary metadata (meta description and Open Graph) that AI tools use to describe the page',
+        'recommendation': 'Add a meta description and Open Graph title/description',
+        'business_impact': 'medium',
+        'implementation_effort': '1 week',
+        'expected_improvement': 'Accurate page summaries in AI tools and link previews',
+        'priority_score': 6
+    },
+    {
+        'id': 'ai_content_depth',
+        'category': 'ai_readiness',
+        'weight': 25,
+        'check': lambda d: min(1.0, d.get('content_length', 0) / 3000),
+        'issue': 'Not enough in-depth content for AI assistants to cite',
+        'recommendation': 'Publish authoritative, cite-worthy content that covers the topic comprehensively',
+        'business_impact': 'high',
+        'implementation_effort': '3-4 weeks',
+        'expected_improvement': 'More citations in ChatGPT and Perplexity answers',
+        'priority_score': 7
+    },
+    {
+        'id': 'ai_structured_data',
+        'category': 'ai_readiness',
+        'weight': 20,
+        'check': lambda d: bool(d.get('has_schema')),
+        'issue': 'No machine-readable structured data for AI search understanding',
+        'recommendation': 'Describe the business and content with JSON-LD structured data',
+        'business_impact': 'high',
+        'implementation_effort': '2-3 weeks',
+        'expected_improvement': 'Entities understood without guessing',
+        'priority_score': 8
+    }
+]
+
+def add_rule(rule: Dict):
+    """Register an additional rule (same shape as the RULES entries)"""
+    if rule.get('category') not in CATEGORY_WEIGHTS:
+        raise ValueError(f"Unknown score category: {rule.get('category')}")
+    RULES.append(rule)
+
+def score_website(website_data: Dict) -> Dict:
+    """Score website_data against every rule.
+
+    Returns {'overall_score', 'category_scores', 'critical_issues',
+    'recommendations', 'rule_results', 'scoring_version'}. Issues are the
+    failed or partially failed rules in the critical_issues shape used by the
+    AI analysis, highest priority first.
+    """
+    earned = {category: 0.0 for category in CATEGORY_WEIGHTS}
+    possible = {category: 0.0 for category in CATEGORY_WEIGHTS}
+    rule_results = []
+    failed = []
+
+    for rule in RULES:
+        try:
+            credit = rule['check'](website_data)
+        except (KeyError, TypeError, ValueError, ZeroDivisionError):
+            credit = None
+        if credit is None:
+            continue
+
+        credit = max(0.0, min(1.0, float(credit)))
+        earned[rule['category']] += rule['weight'] * credit
+        possible[rule['category']] += rule['weight']
+        rule_results.append({'id': rule['id'], 'category': rule['category'], 'score': round(credit, 2)})
+        if credit < 0.75:
+            failed.append((rule, credit))
+
+    category_scores = {
+        category: int(round(100 * earned[category] / possible[category])) if possible[category] else 100
+        for category in CATEGORY_WEIGHTS
+    }
+    overall_score = int(round(sum(category_scores[category] * weight for category, weight in CATEGORY_WEIGHTS.items())))
+
+    # Highest priority first; among equals, the least credit first
+    failed.sort(key=lambda item: (-item[0]['priority_score'], item[1]))
+    critical_issues = [{
+        'issue': rule['issue'],
+        'business_impact': rule['business_impact'],
+        'implementation_effort': rule['implementation_effort'],
+        'expected_improvement': rule['expected_improvement'],
+        'priority_score': rule['priority_score'],
+        'rule_id': rule['id']
+    } for rule, credit in failed]
+
+    return {
+        'overall_score': overall_score,
+        'category_scores': category_scores,
+        'critical_issues': critical_issues,
+        'recommendations': [rule['recommendation'] for rule, credit in failed],
+        'rule_results': rule_results,
+        'scoring_version': SCORING_VERSION
+    }
+
+def apply_scores(audit_data: Dict, scores: Dict) -> Dict:
+    """Overwrite the LLM's scores in audit_data with the rule engine's.
+
+    Categories the engine does not score (voice_search, competitive_position)
+    keep the LLM's values.
+    """
+    audit_data['overall_score'] = scores['overall_score']
+    audit_data['category_scores'] = {**(audit_data.get('category_scores') or {}), **scores['category_scores']}
+    if isinstance(audit_data.get('executive_summary'), dict):
+        audit_data['executive_summary']['overall_score'] = scores['overall_score']
+    audit_data['scoring_version'] = scores['scoring_version']
+    return audit_data
@@ -2,54 +2,65 @@
 # Enhanced SEO auditor service for premium $997 audits
 
 import os
+import uuid
 import logging
-from typing import Dict
-from services.web_scraper import scrape_website
-from services.ai_service import analyze_with_ai
+from functools import wraps
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from services.web_scraper import scrape_website, crawl_website, compute_content_fingerprint
+from services.ai_service import analyze_with_ai, generate_premium_fallback_analysis
+from services.score_engine import score_website, apply_scores
 from services.report_generator import generate_pdf_report
 from services.email_service import send_email_report
-from models.database import save_audit_data
+from models.database import (
+    save_audit_data, find_reusable_analysis, mark_email_sent, start_audit_run, get_audit_run,
+    get_stage_checkpoints, save_stage_checkpoint, delete_stage_checkpoints, finish_audit_run
+)
+from services.coalescer import audit_coalescer, flight_key
+from services.audit_pipeline import AuditPipeline, Stage, PipelineRun, StageFailed, CONTINUE
+from config.settings import (
+    CRAWL_MAX_PAGES_FREE, CRAWL_MAX_PAGES_PREMIUM, ENABLE_FINGERPRINT_REUSE, FINGERPRINT_REUSE_HOURS,
+    FREE_AUDIT_AI_ANALYSIS, AUDIT_TIMEOUT_SECONDS, AUDIT_DELIVERY_RESERVE_SECONDS, AUDIT_STAGE_TIMEOUTS,
+    AUDIT_ADMISSION_WAIT_SECONDS
+)
+from utils.deadline import Deadline
+from utils.concurrency_limiter import audit_limiter, CapacityExceeded
 
 logger = logging.getLogger(__name__)
 
+def admitted(compute):
+    """Run the scrape and analysis in one of the MAX_CONCURRENT_AUDITS slots shared by all processes.
+
+    Only the caller that computes holds a slot; audits that join another
+    audit's computation wait for it outside any slot. Raises
+    utils.concurrency_limiter.CapacityExceeded, instead of returning a failed
+    audit, when no slot frees up in time, so callers can shed the load.
+    """
+    @wraps(compute)
+    def wrapper(*args, **kwargs):
+        with audit_limiter.slot():
+            return compute(*args, **kwargs)
+    return wrapper
+
 class SEOAuditor:
     def __init__(self):
         pass
     
-    def run_full_audit(self, url: str, email: str) -> Dict:
-        """Run basic free audit process"""
+    def run_full_audit(self, url: str, email: str, bypass_cache: bool = False,
+                       on_section: Optional[Callable[[str, Dict], None]] = None, run_id: str = None) -> Dict:
+        """Run basic free audit process (bypass_cache forces a fresh AI analysis;
+        on_section receives each AI analysis section as soon as it is ready;
+        an existing run_id resumes that run from its completed stages)"""
+        run_id = run_id or uuid.uuid4().hex
         try:
             logger.info(f'Starting free audit for {url}')
             
-            # Step 1: Scrape website
-            website_data = scrape_website(url)
-            if 'error' in website_data:
-                raise Exception(f'Failed to analyze website: {website_data["error"]}')
-            
-            logger.info(f'Website scraped successfully for {url}')
-            
-            # Step 2: Basic AI Analysis
-            audit_data = analyze_with_ai(website_data)
-            
-            logger.info(f'AI analysis completed for {url}')
-            
-            # Step 3: Generate Basic PDF Report  
-            pdf_path = generate_pdf_report(audit_data, website_data)
-            
-            logger.info(f'PDF report generated for {url}')
-            
-            # Step 4: Save to database
-            save_audit_data(email, url, audit_data)
-            
-            logger.info(f'Audit data saved to database for {url}')
-            
-            # Step 5: Send email report
-            email_sent = send_email_report(email, audit_data, pdf_path, url)
-            
-            if not email_sent:
-                logger.warning(f'Email report not sent for {url}')
-            else:
-                logger.info(f'Email report sent successfully for {url}')
+            # Scrape and analyse (shared with concurrent audits of this URL), then render
+            # the PDF and save to the database side by side; the email goes out after we return
+            pipeline_run = self._run_pipeline(run_id, url, email, 'free', bypass_cache=bypass_cache,
+                                              on_section=on_section)
+            audit_data = pipeline_run.outputs['analysis']['audit_data']
+            pdf_path = pipeline_run.outputs['pdf']
             
             # Prepare response data for free audit
             response_data = {
@@ -60,7 +71,9 @@ class SEOAuditor:
                 'recommendations': audit_data.get('recommendations', [])[:5],
                 'pdf_path': f'reports/{os.path.basename(pdf_path)}' if pdf_path else None,
                 'categories': audit_data.get('category_scores', {}),
-                'email_sent': email_sent,
+                'email_status': 'sending',
+                'stage_timings': pipeline_run.timings,
+                'audit_run_id': run_id,
                 'quick_wins': audit_data.get('quick_wins', []),
                 'voice_search_issues': audit_data.get('voice_search_issues', []),
                 'critical_issues': audit_data.get('critical_issues', []),
@@ -71,64 +84,33 @@ class SEOAuditor:
             logger.info(f'Free audit completed successfully for {url} with score {response_data["score"]}')
             return response_data
             
+        except CapacityExceeded:
+            raise
         except Exception as e:
             logger.error(f'Free audit failed for {url}: {str(e)}')
             return {
                 'success': False,
                 'error': str(e),
-                'audit_type': 'free'
+                'audit_type': 'free',
+                'audit_run_id': run_id
             }
     
-    def run_premium_audit(self, url: str, email: str, company: str = '', industry: str = '') -> Dict:
-        """Run comprehensive $997 premium audit process"""
+    def run_premium_audit(self, url: str, email: str, company: str = '', industry: str = '', bypass_cache: bool = False,
+                          on_section: Optional[Callable[[str, Dict], None]] = None, run_id: str = None) -> Dict:
+        """Run comprehensive $997 premium audit process (bypass_cache forces a fresh AI analysis;
+        on_section receives each AI analysis section as soon as it is ready;
+        an existing run_id resumes that run from its completed stages)"""
+        run_id = run_id or uuid.uuid4().hex
         try:
             logger.info(f'Starting premium audit for {url} - Customer: {email}')
             
-            # Step 1: Enhanced website scraping
-            website_data = scrape_website(url)
-            if 'error' in website_data:
-                raise Exception(f'Failed to analyze website: {website_data["error"]}')
-            
-            # Add business context to website data
-            website_data['company'] = company
-            website_data['industry'] = industry
-            website_data['audit_type'] = 'premium'
-            
-            logger.info(f'Website scraped successfully for premium audit: {url}')
-            
-            # Step 2: Comprehensive AI Analysis (using enhanced prompts)
-            audit_data = analyze_with_ai(website_data)
-            
-            # Ensure we have the enhanced data structure
-            if 'executive_summary' not in audit_data:
-                audit_data = self._ensure_premium_data_structure(audit_data, website_data)
-            
-            logger.info(f'Premium AI analysis completed for {url}')
-            
-            # Step 3: Generate Premium PDF Report (25+ pages)
-            pdf_path = generate_pdf_report(audit_data, website_data)
-            
-            logger.info(f'Premium PDF report generated for {url}')
-            
-            # Step 4: Save premium audit to database with enhanced data
-            premium_audit_data = {
-                **audit_data,
-                'audit_type': 'premium',
-                'payment_amount': 997,
-                'company': company,
-                'industry': industry
-            }
-            save_audit_data(email, url, premium_audit_data)
-            
-            logger.info(f'Premium audit data saved to database for {url}')
-            
-            # Step 5: Send premium email report
-            email_sent = self._send_premium_email_report(email, audit_data, pdf_path, url, company)
-            
-            if not email_sent:
-                logger.warning(f'Premium email report not sent for {url}')
-            else:
-                logger.info(f'Premium email report sent successfully for {url}')
+            # Site crawl and comprehensive AI analysis (shared with concurrent premium audits
+            # of this URL), then the premium PDF (25+ pages) and the database save side by
+            # side; the email goes out after we return
+            pipeline_run = self._run_pipeline(run_id, url, email, 'premium', company, industry, bypass_cache,
+                                              on_section)
+            audit_data = pipeline_run.outputs['analysis']['audit_data']
+            pdf_path = pipeline_run.outputs['pdf']
             
             # Prepare premium response data
             response_data = {
@@ -150,7 +132,9 @@ class SEOAuditor:
                 'success_metrics': audit_data.get('success_metrics', {}),
                 'pdf_path': f'reports/{os.path.basename(pdf_path)}' if pdf_path else None,
                 'categories': audit_data.get('category_scores', {}),
-                'email_sent': email_sent,
+                'email_status': 'sending',
+                'stage_timings': pipeline_run.timings,
+                'audit_run_id': run_id,
                 'audit_type': 'premium',
                 'payment_amount': 997,
                 'company': company,
@@ -162,14 +146,273 @@ class SEOAuditor:
             logger.info(f'Premium audit completed successfully for {url} with score {response_data["score"]} - Revenue impact: ${response_data["estimated_monthly_revenue_loss"]}/month')
             return response_data
             
+        except CapacityExceeded:
+            raise
         except Exception as e:
             logger.error(f'Premium audit failed for {url}: {str(e)}')
             return {
                 'success': False,
                 'error': f'Premium audit failed: {str(e)}',
-                'audit_type': 'premium'
+                'audit_type': 'premium',
+                'audit_run_id': run_id
             }
     
+    def resume_audit(self, run_id: str, rerun: Optional[List[str]] = None, wait: bool = True) -> Dict:
+        """Resume an audit run from its completed stages (admin retry).
+
+        Stages that never completed run again; rerun forces the named stages,
+        and the stages that depend on them, to run again too. With wait, the
+        email stage is awaited so the result reports it. This is also the only
+        way to recover an inline (non-queued) run interrupted by a restart.
+
+        Returns {'success', 'run'}; when a stage fails again, success is False
+        and 'failed_stage' and 'error' say which and why.
+        """
+        run = get_audit_run(run_id)
+        if run is None:
+            return {'success': False, 'error': 'Audit run not found'}
+        try:
+            if rerun:
+                stages = self._audit_pipeline(run['url'], run['email'], run['audit_type'],
+                                              run['company'], run['industry']).downstream(rerun)
+                delete_stage_checkpoints(run_id, stages)
+            logger.info(f'Resuming {run["audit_type"]} audit run {run_id} for {run["url"]}')
+            pipeline_run = self._run_pipeline(run_id, run['url'], run['email'], run['audit_type'], run['company'],
+                                              run['industry'], run['bypass_cache'])
+            if wait:
+                pipeline_run.wait_for_background(AUDIT_STAGE_TIMEOUTS['email'] + 5)
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+        except CapacityExceeded:
+            raise
+        except StageFailed as e:
+            logger.error(f'Resuming audit run {run_id} failed in stage {e.stage}: {e.error}')
+            return {'success': False, 'error': e.error, 'failed_stage': e.stage, 'run': get_audit_run(run_id)}
+        except Exception as e:
+            logger.error(f'Resuming audit run {run_id} failed: {str(e)}')
+            return {'success': False, 'error': str(e), 'run': get_audit_run(run_id)}
+        
+        if pipeline_run.errors:
+            stage, error = next(iter(pipeline_run.errors.items()))
+            return {'success': False, 'error': error, 'failed_stage': stage, 'run': get_audit_run(run_id)}
+        return {'success': True, 'run': get_audit_run(run_id)}
+    
+    def _run_pipeline(self, run_id: str, url: str, email: str, audit_type: str, company: str = '',
+                      industry: str = '', bypass_cache: bool = False,
+                      on_section: Optional[Callable[[str, Dict], None]] = None) -> PipelineRun:
+        """Run (or resume) an audit run, checkpointing each stage's output as it completes"""
+        start_audit_run(run_id, audit_type, url, email, company, industry, bypass_cache)
+        completed = get_stage_checkpoints(run_id)
+        if completed:
+            logger.info(f'Audit run {run_id} resumes after completed stages: {", ".join(completed)}')
+        
+        pipeline = self._audit_pipeline(url, email, audit_type, company, industry, bypass_cache, on_section)
+        
+        def on_finish(pipeline_run: PipelineRun):
+            errors = dict(pipeline_run.errors)
+            finish_audit_run(run_id, 'failed' if errors else 'completed', errors)
+        
+        try:
+            return pipeline.run(
+                completed,
+                checkpoint=lambda stage, output: save_stage_checkpoint(run_id, stage, output),
+                on_finish=on_finish
+            )
+        except StageFailed as e:
+            # No audit slot for the analysis: let the caller shed the load
+            if isinstance(e.__cause__, CapacityExceeded):
+                raise e.__cause__
+            raise
+    
+    def _audit_pipeline(self, url: str, email: str, audit_type: str, company: str = '',
+                        industry: str = '', bypass_cache: bool = False,
+                        on_section: Optional[Callable[[str, Dict], None]] = None) -> AuditPipeline:
+        """The stages of one audit (see services.audit_pipeline):
+
+            analysis -> pdf  -> email (background)
+                     -> save ->
+
+        Only the analysis and the save can fail the audit; without a PDF the
+        email still goes out, and email failures are logged. Each completed
+        stage is checkpointed, so a retry repeats only failed stages.
+        """
+        def analysis(outputs):
+            return self._compute_coalesced(url, audit_type, bypass_cache, on_section)
+
+        def pdf(outputs):
+            computed = outputs['analysis']
+            pdf_path = generate_pdf_report(computed['audit_data'], {'url': computed.get('website_url', url)})
+            if not pdf_path:
+                raise Exception('PDF report could not be generated')
+            logger.info(f'PDF report generated for {url}')
+            return pdf_path
+
+        def save(outputs):
+            computed = outputs['analysis']
+            audit_data = computed['audit_data']
+            if audit_type == 'premium':
+                # Save premium audit to database with enhanced data
+                audit_data = {
+                    **audit_data,
+                    'audit_type': 'premium',
+                    'payment_amount': 997,
+                    'company': company,
+                    'industry': industry
+                }
+            audit_id = save_audit_data(email, url, audit_data, content_fingerprint=computed['content_fingerprint'])
+            logger.info(f'{audit_type.capitalize()} audit data saved to database for {url}')
+            return audit_id
+
+        def send(outputs):
+            audit_data = outputs['analysis']['audit_data']
+            pdf_path = outputs['pdf']
+            if audit_type == 'premium':
+                email_sent = self._send_premium_email_report(email, dict(audit_data), pdf_path, url, company)
+            else:
+                email_sent = send_email_report(email, audit_data, pdf_path, url)
+            if not email_sent:
+                raise Exception(f'{audit_type.capitalize()} email report not sent')
+            logger.info(f'{audit_type.capitalize()} email report sent successfully for {url}')
+            mark_email_sent(outputs['save'], pdf_path or '')
+            return True
+
+        return AuditPipeline(audit_type, [
+            Stage('analysis', analysis, timeout=AUDIT_STAGE_TIMEOUTS['analysis']),
+            Stage('pdf', pdf, after=['analysis'], timeout=AUDIT_STAGE_TIMEOUTS['pdf'], on_error=CONTINUE),
+            Stage('save', save, after=['analysis'], timeout=AUDIT_STAGE_TIMEOUTS['save']),
+            Stage('email', send, after=['pdf', 'save'], timeout=AUDIT_STAGE_TIMEOUTS['email'], on_error=CONTINUE,
+                  default=False, background=True)
+        ])
+    
+    def _compute_coalesced(self, url: str, audit_type: str, bypass_cache: bool = False,
+                           on_section: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """The customer-independent part of an audit, computed once for concurrent
+        audits of the same URL and type (see services.coalescer).
+
+        Callers that joined another audit's computation do not receive
+        on_section callbacks. Raises if the shared computation failed.
+        """
+        # A refresh never joins a computation that may reuse cached analysis
+        key = flight_key(audit_type, url) + (':refresh' if bypass_cache else '')
+        computed, shared = audit_coalescer.run(
+            key,
+            lambda: self._compute_audit(url, audit_type, bypass_cache, on_section),
+            wait_timeout=AUDIT_TIMEOUT_SECONDS + AUDIT_ADMISSION_WAIT_SECONDS
+        )
+        if shared:
+            logger.info(f'Joined in-flight {audit_type} audit of {url}')
+        if not computed.get('success'):
+            raise Exception(computed.get('error', 'Audit computation failed'))
+        return computed
+    
+    @admitted
+    def _compute_audit(self, url: str, audit_type: str, bypass_cache: bool = False,
+                       on_section: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """Scrape and analyse - the slow part that does not depend on the customer.
+
+        Returns {'success', 'audit_data', 'website_url', 'content_fingerprint'}, or
+        {'success': False, 'error'}; failures are returned rather than raised so
+        coalesced callers share them instead of each retrying the same site.
+        """
+        try:
+            deadline = Deadline(AUDIT_TIMEOUT_SECONDS)
+            max_pages = CRAWL_MAX_PAGES_PREMIUM if audit_type == 'premium' else CRAWL_MAX_PAGES_FREE
+            
+            website_data = self._collect_website_data(url, max_pages, deadline)
+            if 'error' in website_data:
+                raise Exception(f'Failed to analyze website: {website_data["error"]}')
+            if audit_type == 'premium':
+                website_data['audit_type'] = 'premium'
+            
+            logger.info(f'Website scraped successfully for {audit_type} audit: {url}')
+            
+            # AI analysis (reused when identical content was analysed recently)
+            audit_data, content_fingerprint = self._analyze(website_data, audit_type, bypass_cache, deadline, on_section)
+            
+            # Ensure we have the enhanced data structure
+            if audit_type == 'premium' and 'executive_summary' not in audit_data:
+                audit_data = self._ensure_premium_data_structure(audit_data, website_data)
+            
+            logger.info(f'AI analysis completed for {url}')
+            return {
+                'success': True,
+                'audit_data': audit_data,
+                'website_url': website_data.get('url', url),
+                'content_fingerprint': content_fingerprint
+            }
+        except Exception as e:
+            logger.error(f'Audit computation failed for {url}: {str(e)}')
+            return {'success': False, 'error': str(e)}
+    
+    def _collect_website_data(self, url: str, max_pages: int, deadline: Deadline = None) -> Dict:
+        """Scrape the homepage, or crawl the site when the page budget allows it.
+
+        Crawls return the homepage website_data with the site-level rollup
+        attached as 'site_summary' so downstream steps keep working unchanged.
+        The scrape gets the audit deadline minus the analysis and delivery reserve.
+        """
+        scrape_deadline = deadline.reserve(AUDIT_DELIVERY_RESERVE_SECONDS * 2) if deadline else None
+        if max_pages <= 1:
+            return scrape_website(url, deadline=scrape_deadline)
+        
+        crawl_result = crawl_website(url, max_pages=max_pages, deadline=scrape_deadline)
+        if 'error' in crawl_result:
+            return crawl_result
+        
+        website_data = crawl_result['pages'][0]
+        website_data['site_summary'] = crawl_result['site_summary']
+        website_data['crawled_pages'] = crawl_result['pages'][1:]
+        
+        logger.info(f'Crawled {len(crawl_result["pages"])} pages for {url} ({len(crawl_result["failed_pages"])} failed)')
+        return website_data
+    
+    def _analyze(self, website_data: Dict, audit_type: str, bypass_cache: bool = False,
+                 deadline: Deadline = None, on_section: Callable[[str, Dict], None] = None) -> Tuple[Dict, str]:
+        """Run the AI analysis, or reuse a recent one for identical page content.
+
+        Scores always come from the deterministic rule engine; the AI analysis
+        supplies the narrative and strategy, with the models and limits of the
+        audit type's tier in AI_MODEL_ROUTING. Free audits skip the AI entirely
+        when FREE_AUDIT_AI_ANALYSIS is off. bypass_cache skips both fingerprint
+        reuse and the LLM response cache. The AI analysis must finish within
+        the deadline, less AUDIT_DELIVERY_RESERVE_SECONDS for PDF and email.
+
+        Returns (audit_data, content_fingerprint). The fingerprint is blanked for
+        fallback, partially fallback and rules-only analyses so they are never
+        reused in place of a real one.
+        """
+        scores = score_website(website_data)
+        
+        if audit_type == 'free' and not FREE_AUDIT_AI_ANALYSIS:
+            audit_data = generate_premium_fallback_analysis(website_data)
+            audit_data['analysis_source'] = 'rules'
+            return apply_scores(audit_data, scores), ''
+        
+        content_fingerprint = compute_content_fingerprint(website_data)
+        
+        if ENABLE_FINGERPRINT_REUSE and not bypass_cache:
+            try:
+                reusable = find_reusable_analysis(content_fingerprint, audit_type, FINGERPRINT_REUSE_HOURS)
+            except Exception as e:
+                logger.warning(f'Fingerprint lookup failed for {website_data.get("url")}: {str(e)}')
+                reusable = None
+            
+            if reusable:
+                logger.info(f'Reusing analysis from audit {reusable["audit_id"]} for {website_data.get("url")} (content unchanged)')
+                audit_data = reusable['audit_data']
+                for customer_field in ('audit_type', 'payment_amount', 'company', 'industry'):
+                    audit_data.pop(customer_field, None)
+                return apply_scores(audit_data, scores), content_fingerprint
+        
+        ai_deadline = deadline.reserve(AUDIT_DELIVERY_RESERVE_SECONDS) if deadline else None
+        audit_data = apply_scores(analyze_with_ai(website_data, bypass_cache=bypass_cache, deadline=ai_deadline,
+                                                  on_section=on_section, audit_type=audit_type), scores)
+        if audit_data.get('analysis_source') == 'fallback' or audit_data.get('fallback_sections'):
+            return audit_data, ''
+        
+        audit_data['analysis_generated_at'] = datetime.now().isoformat()
+        return audit_data, content_fingerprint
+    
     def _extract_issues(self, audit_data: Dict) -> list:
         """Extract issues for free audit display"""
         issues = []
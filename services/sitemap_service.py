@@ -0,0 +1,335 @@
+# File: services/sitemap_service.py
+# robots.txt and sitemap discovery with a per-host TTL cache
+#
+# robots.txt is parsed with the matching rules search engines use (most
+# specific user-agent group, longest matching path wins, Allow wins ties,
+# '*' and '$' wildcards). Sitemaps are read from the robots.txt Sitemap lines,
+# falling back to /sitemap.xml. Sitemap indexes are followed to nested sitemaps
+# and gzipped files are decompressed on the fly. Each sitemap is parsed as a
+# stream with iterparse, so a 50k-URL file never exists as a full tree in memory.
+
+import io
+import re
+import gzip
+import time
+import logging
+import threading
+import requests
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from urllib.parse import urlparse, urljoin, unquote
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import (
+    ROBOTS_CACHE_TTL, SITEMAP_MAX_URLS, SITEMAP_MAX_FILES, SITEMAP_MAX_BYTES, CRAWL_PAGE_TIMEOUT
+)
+from services import http_client
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Search engines stop reading robots.txt after 500 KiB
+ROBOTS_MAX_BYTES = 512000
+
+# Hosts kept in the in-memory cache before the least recently used is dropped
+MAX_CACHED_HOSTS = 256
+
+class RobotsRules:
+    """Parsed robots.txt groups with path matching"""
+
+    def __init__(self, groups: Dict[str, List[Tuple[bool, str]]] = None, sitemaps: List[str] = None,
+                 crawl_delays: Dict[str, float] = None, found: bool = False, disallow_all: bool = False):
+        self.groups = groups or {}
+        self.sitemaps = sitemaps or []
+        self.crawl_delays = crawl_delays or {}
+        self.found = found
+        self.disallow_all = disallow_all
+        self._compiled = {
+            agent: [(allow, len(path), self._compile(path)) for allow, path in rules]
+            for agent, rules in self.groups.items()
+        }
+
+    @classmethod
+    def parse(cls, text: str) -> 'RobotsRules':
+        groups = {}
+        sitemaps = []
+        crawl_delays = {}
+        current_agents = []
+        in_rules = False
+
+        for raw_line in text.splitlines():
+            line = raw_line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            field, value = line.split(':', 1)
+            field = field.strip().lower()
+            value = value.strip()
+
+            if field == 'user-agent':
+                # A user-agent line after rules starts a new group
+                if in_rules:
+                    current_agents = []
+                    in_rules = False
+                agent = value.lower()
+                current_agents.append(agent)
+                groups.setdefault(agent, [])
+            elif field in ('allow', 'disallow'):
+                in_rules = True
+                # An empty Disallow allows everything and adds no rule
+                if value:
+                    for agent in current_agents:
+                        groups[agent].append((field == 'allow', value))
+            elif field == 'crawl-delay':
+                in_rules = True
+                try:
+                    for agent in current_agents:
+                        crawl_delays[agent] = float(value)
+                except ValueError:
+                    pass
+            elif field == 'sitemap' and value:
+                sitemaps.append(value)
+
+        return cls(groups, sitemaps, crawl_delays, found=True)
+
+    @staticmethod
+    def _compile(path: str):
+        anchored = path.endswith('$')
+        if anchored:
+            path = path[:-1]
+        pattern = '.*'.join(re.escape(part) for part in path.split('*'))
+        return re.compile(pattern + ('$' if anchored else ''))
+
+    def _group_for(self, user_agent: str) -> Optional[str]:
+        """Most specific group whose name is contained in the user agent, else '*'"""
+        user_agent = user_agent.lower()
+        best = None
+        for agent in self._compiled:
+            if agent != '*' and agent in user_agent and (best is None or len(agent) > len(best)):
+                best = agent
+        if best is None and '*' in self._compiled:
+            best = '*'
+        return best
+
+    def is_allowed(self, url: str, user_agent: str = '*') -> bool:
+        if self.disallow_all:
+            return False
+        group = self._group_for(user_agent)
+        if group is None:
+            return True
+
+        parsed = urlparse(url)
+        path = unquote(parsed.path) or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+
+        best_length = -1
+        allowed = True
+        for allow, length, pattern in self._compiled[group]:
+            if pattern.match(path) and (length > best_length or (length == best_length and allow)):
+                best_length = length
+                allowed = allow
+        return allowed
+
+    def crawl_delay(self, user_agent: str = '*') -> Optional[float]:
+        group = self._group_for(user_agent)
+        return self.crawl_delays.get(group) if group else None
+
+class HostCache:
+    """Thread-safe per-host cache with a TTL and a bound on the number of hosts"""
+
+    def __init__(self, ttl: int = 3600, max_entries: int = MAX_CACHED_HOSTS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+robots_cache = HostCache(ROBOTS_CACHE_TTL)
+sitemap_cache = HostCache(ROBOTS_CACHE_TTL)
+
+def _origin(url: str) -> str:
+    parsed = urlparse(url)
+    return f'{parsed.scheme}://{parsed.netloc.lower()}'
+
+def get_robots(url: str, timeout: int = CRAWL_PAGE_TIMEOUT) -> RobotsRules:
+    """Fetch (or return the cached) robots.txt rules for the URL's host"""
+    origin = _origin(url)
+    rules = robots_cache.get(origin)
+    if rules is None:
+        rules = _fetch_robots(origin, timeout)
+        robots_cache.set(origin, rules)
+    return rules
+
+def _fetch_robots(origin: str, timeout: int) -> RobotsRules:
+    try:
+        with http_client.get(f'{origin}/robots.txt', headers=HEADERS, timeout=timeout, stream=True) as response:
+            if response.status_code in (401, 403):
+                return RobotsRules(disallow_all=True)
+            if response.status_code != 200:
+                # A missing robots.txt (and a server error) places no restrictions
+                return RobotsRules()
+            body = b''
+            for chunk in response.iter_content(chunk_size=65536):
+                body += chunk
+                if len(body) >= ROBOTS_MAX_BYTES:
+                    break
+    except requests.exceptions.RequestException as e:
+        logger.debug(f'robots.txt fetch failed for {origin}: {e}')
+        return RobotsRules()
+
+    return RobotsRules.parse(body[:ROBOTS_MAX_BYTES].decode('utf-8', errors='replace'))
+
+def is_allowed(url: str, user_agent: str = '*') -> bool:
+    """True if robots.txt lets user_agent fetch url (fetches robots.txt on first use per host)"""
+    return get_robots(url).is_allowed(url, user_agent)
+
+def list_urls(url: str, timeout: int = CRAWL_PAGE_TIMEOUT, limit: int = None) -> List[Dict]:
+    """The first limit page URLs listed in the host's sitemaps as [{'loc', 'lastmod'}, ...].
+
+    Sitemaps come from robots.txt, falling back to /sitemap.xml. Nested
+    indexes are followed up to SITEMAP_MAX_FILES files, and reading stops once
+    limit (at most SITEMAP_MAX_URLS) entries are found. The bounded list is
+    cached per host and reused by calls that need no more entries.
+    """
+    limit = min(limit or SITEMAP_MAX_URLS, SITEMAP_MAX_URLS)
+    origin = _origin(url)
+    cached = sitemap_cache.get(origin)
+    if cached is not None:
+        cached_limit, entries = cached
+        # A list shorter than its limit holds every entry there is
+        if limit <= cached_limit or len(entries) < cached_limit:
+            return entries[:limit]
+    entries = _collect_sitemap_urls(origin, timeout, limit)
+    sitemap_cache.set(origin, (limit, entries))
+    return entries
+
+def _collect_sitemap_urls(origin: str, timeout: int, limit: int) -> List[Dict]:
+    queue = list(get_robots(origin, timeout).sitemaps) or [f'{origin}/sitemap.xml']
+    visited = set()
+    entries = []
+
+    while queue and len(visited) < SITEMAP_MAX_FILES and len(entries) < limit:
+        sitemap_url = urljoin(origin + '/', queue.pop(0))
+        if sitemap_url in visited:
+            continue
+        visited.add(sitemap_url)
+
+        try:
+            for kind, loc, lastmod in _iter_sitemap(sitemap_url, timeout):
+                if kind == 'sitemap':
+                    queue.append(loc)
+                else:
+                    entries.append({'loc': loc, 'lastmod': lastmod})
+                    if len(entries) >= limit:
+                        break
+        except (requests.exceptions.RequestException, ET.ParseError, OSError, ValueError) as e:
+            logger.debug(f'Sitemap {sitemap_url} could not be read: {e}')
+
+    return entries
+
+class _LimitedReader(io.RawIOBase):
+    """File wrapper that replays already-read prefix bytes and stops the stream at max_bytes"""
+
+    def __init__(self, stream, max_bytes: int, prefix: bytes = b''):
+        self.stream = stream
+        self.remaining = max_bytes
+        self.prefix = prefix
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.remaining <= 0:
+            raise ValueError('Sitemap exceeds the size limit')
+        size = min(len(buffer), self.remaining)
+        if self.prefix:
+            data, self.prefix = self.prefix[:size], self.prefix[size:]
+        else:
+            data = self.stream.read(size)
+        self.remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+def _iter_sitemap(sitemap_url: str, timeout: int):
+    """Stream (kind, loc, lastmod) tuples from one sitemap or sitemap index.
+
+    kind is 'url' for page entries and 'sitemap' for nested sitemaps. Finished
+    elements are cleared as they are read, so memory stays flat regardless of
+    the number of entries.
+    """
+    with http_client.get(sitemap_url, headers=HEADERS, timeout=timeout, stream=True) as response:
+        if response.status_code != 200:
+            return
+        response.raw.decode_content = True
+        head = response.raw.read(2)
+        # .xml.gz files are usually served as application/gzip without Content-Encoding
+        if head == b'\x1f\x8b':
+            compressed = _LimitedReader(response.raw, SITEMAP_MAX_BYTES, head)
+            source = _LimitedReader(gzip.GzipFile(fileobj=compressed), SITEMAP_MAX_BYTES)
+        else:
+            source = _LimitedReader(response.raw, SITEMAP_MAX_BYTES, head)
+
+        root = None
+        loc = lastmod = None
+        for event, element in ET.iterparse(source, events=('start', 'end')):
+            tag = element.tag.rsplit('}', 1)[-1]
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+
+            if tag == 'loc':
+                loc = (element.text or '').strip()
+            elif tag == 'lastmod':
+                lastmod = (element.text or '').strip() or None
+            elif tag in ('url', 'sitemap'):
+                if loc:
+                    yield tag, loc, lastmod
+                loc = lastmod = None
+                root.clear()
+
+def get_site_signals(url: str, limit: int = None) -> Dict:
+    """robots.txt and sitemap facts for the audit (uses the cached lookups).
+
+    Sitemaps are read up to limit entries; sitemap_url_count_capped says the
+    count stopped there.
+    """
+    robots = get_robots(url)
+    limit = min(limit or SITEMAP_MAX_URLS, SITEMAP_MAX_URLS)
+    entries = list_urls(url, limit=limit)
+    return {
+        'robots_txt_found': robots.found,
+        'robots_blocks_homepage': not robots.is_allowed(url),
+        'robots_sitemaps': len(robots.sitemaps),
+        'sitemap_url_count': len(entries),
+        'sitemap_url_count_capped': len(entries) >= limit,
+        'sitemap_urls_with_lastmod': sum(1 for entry in entries if entry['lastmod'])
+    }
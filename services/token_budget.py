@@ -0,0 +1,178 @@
+# File: services/token_budget.py
+# Local token counting and prompt compression for LLM calls
+#
+# Tokens are counted with tiktoken when it is installed and estimated at
+# CHARS_PER_TOKEN otherwise. compress_text() drops navigation and boilerplate
+# lines, then keeps the most informative sentences (in page order) that fit a
+# token budget. fit_max_tokens() keeps prompt plus completion inside the
+# model's context window. estimate_cost() prices a call from its token usage.
+
+import re
+import math
+from typing import Dict, Iterable, List
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken is optional
+    tiktoken = None
+
+CONTEXT_WINDOWS = {
+    'gpt-4': 8192,
+    'gpt-4-32k': 32768,
+    'gpt-4-turbo': 128000,
+    'gpt-4o': 128000,
+    'gpt-4o-mini': 128000,
+    'gpt-3.5-turbo': 16385
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# USD per 1K (prompt, completion) tokens
+MODEL_PRICES = {
+    'gpt-4': (0.03, 0.06),
+    'gpt-4-32k': (0.06, 0.12),
+    'gpt-4-turbo': (0.01, 0.03),
+    'gpt-4o': (0.0025, 0.01),
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-3.5-turbo': (0.0005, 0.0015)
+}
+
+CHARS_PER_TOKEN = 4
+# Chat format overhead per message, and for priming the reply
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_OVERHEAD_TOKENS = 3
+# Headroom for estimation error when tiktoken is not installed
+ESTIMATE_MARGIN = 0.1
+MIN_COMPLETION_TOKENS = 256
+
+# Short lines matching these are cookie banners, legal footers, menus and calls to action
+BOILERPLATE_RE = re.compile(
+    r'cookie|privacy policy|terms (of|and) (use|service|conditions)|all rights reserved|©|copyright|'
+    r'skip to (main )?content|sign in|log in|subscribe|newsletter|follow us|accept all|'
+    r'read more|learn more|add to cart|back to top',
+    re.IGNORECASE
+)
+BOILERPLATE_MAX_WORDS = 20
+MIN_LINE_WORDS = 4
+
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9'-]*")
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can do for from has have how i if in into is it its more most
+no not of on or our so than that the their them then there these they this to was we were what
+when which who will with you your
+""".split())
+
+class TokenBudgetError(ValueError):
+    """The prompt alone does not leave room for a completion in the model's context window"""
+
+def base_model(model: str) -> str:
+    """'openai/gpt-4' -> 'gpt-4'"""
+    return model.split('/')[-1]
+
+def context_window(model: str) -> int:
+    return CONTEXT_WINDOWS.get(base_model(model), DEFAULT_CONTEXT_WINDOW)
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD for a call at list price; 0.0 for models without a known price"""
+    prompt_price, completion_price = MODEL_PRICES.get(base_model(model), (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+_encodings = {}
+
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    name = base_model(model)
+    if name not in _encodings:
+        try:
+            _encodings[name] = tiktoken.encoding_for_model(name)
+        except KeyError:
+            _encodings[name] = tiktoken.get_encoding('cl100k_base')
+    return _encodings[name]
+
+def count_tokens(text: str, model: str = 'gpt-4') -> int:
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def count_message_tokens(messages: List[Dict], model: str = 'gpt-4') -> int:
+    """Prompt tokens for a chat completion request"""
+    return sum(count_tokens(message.get('content') or '', model) + MESSAGE_OVERHEAD_TOKENS
+               for message in messages) + REPLY_OVERHEAD_TOKENS
+
+def fit_max_tokens(model: str, prompt_tokens: int, max_tokens: int) -> int:
+    """max_tokens reduced so prompt plus completion fit the context window"""
+    window = context_window(model)
+    margin = 0 if tiktoken is not None else int(window * ESTIMATE_MARGIN)
+    available = window - prompt_tokens - margin
+    if available < MIN_COMPLETION_TOKENS:
+        raise TokenBudgetError(
+            f'Prompt of ~{prompt_tokens} tokens leaves no room for a completion in the '
+            f'{window}-token context window of {model}'
+        )
+    return min(max_tokens, available)
+
+def strip_boilerplate(text: str) -> List[str]:
+    """Content lines of text without menus, banners, legal lines and repeats"""
+    lines = []
+    seen = set()
+    for line in text.splitlines():
+        line = ' '.join(line.split())
+        words = len(line.split())
+        if words < MIN_LINE_WORDS:
+            continue
+        if words <= BOILERPLATE_MAX_WORDS and BOILERPLATE_RE.search(line):
+            continue
+        key = line.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        lines.append(line)
+    return lines
+
+def score_sentence(sentence: str, keywords: frozenset) -> float:
+    """Informativeness: distinct content words (length-normalized), topic keywords and figures"""
+    words = WORD_RE.findall(sentence.lower())
+    if len(words) < MIN_LINE_WORDS:
+        return 0.0
+    content_words = {word for word in words if word not in STOPWORDS}
+    score = len(content_words) / math.sqrt(len(words))
+    score += 2 * len(content_words & keywords)
+    if any(char.isdigit() for char in sentence):
+        score += 0.5
+    return score
+
+def compress_text(text: str, budget_tokens: int, keywords: Iterable[str] = (), model: str = 'gpt-4') -> str:
+    """The most informative sentences of text, in their original order, within budget_tokens"""
+    sentences = [sentence for line in strip_boilerplate(text) for sentence in SENTENCE_SPLIT_RE.split(line)]
+    joined = ' '.join(sentences)
+    if count_tokens(joined, model) <= budget_tokens:
+        return joined
+
+    keyword_set = frozenset(word for keyword in keywords for word in WORD_RE.findall(keyword.lower())) - STOPWORDS
+    ranked = sorted(range(len(sentences)), key=lambda i: (-score_sentence(sentences[i], keyword_set), i))
+
+    chosen = []
+    used = 0
+    for index in ranked:
+        cost = count_tokens(sentences[index], model) + 1
+        if used + cost > budget_tokens:
+            continue
+        chosen.append(index)
+        used += cost
+    return ' '.join(sentences[index] for index in sorted(chosen))
+
+def compact_list(items: Iterable[str], limit: int, max_chars: int = 120) -> List[str]:
+    """Distinct non-empty entries, each truncated to max_chars, at most limit of them"""
+    result = []
+    seen = set()
+    for item in items:
+        item = ' '.join(str(item).split())[:max_chars]
+        if item and item.lower() not in seen:
+            seen.add(item.lower())
+            result.append(item)
+    if len(result) > limit:
+        return result[:limit] + [f'(+{len(result) - limit} more)']
+    return result
@@ -1,61 +1,484 @@
-# Save this as services/web_scraper_fix.py
-# Then rename your current web_scraper.py to ai_service.py
-# Then rename this file to web_scraper.py
+# File: services/web_scraper.py
+# Website scraping service - single page scrape and multi-page site crawl
 
-import requests
-from bs4 import BeautifulSoup
-from typing import Dict
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urlencode, parse_qsl, urlunparse
+from typing import Dict, List, Optional, Tuple
 
-def scrape_website(url: str) -> Dict:
-    """Scrape website content and metadata"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+from config.settings import (
+    CRAWL_CONCURRENCY, CRAWL_PAGE_TIMEOUT, HTML_PARSER_BACKEND, SCRAPE_MAX_BYTES, SCRAPE_CHUNK_SIZE,
+    CACHE_DIR, ENABLE_HTTP_CACHE, HTTP_CACHE_MAX_AGE, HTTP_CACHE_MAX_BYTES,
+    ENABLE_PARSE_POOL, PARSE_POOL_MIN_BYTES, RESPECT_ROBOTS_TXT
+)
+from services import http_client, parse_pool, sitemap_service
+from services.html_extractor import PageExtractor, extract_page, detect_encoding, normalize_page_url, same_site
+from utils.deadline import Deadline, cap_timeout
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+# Sitemap entries read per page of crawl budget; the spare ones stand in for
+# duplicates, off-site URLs and pages robots.txt blocks
+SITEMAP_CANDIDATES_PER_PAGE = 4
+
+# A full page cache is trimmed to this share of max_bytes, so the directory is
+# rescanned once per batch of writes rather than on every write
+PAGE_CACHE_EVICT_TO = 0.9
+
+def normalize_cache_url(url: str) -> str:
+    """Canonical form of a URL for cache keys (case, default port, fragment, query order)"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme, netloc.rsplit(':', 1)[-1]) in (('http', '80'), ('https', '443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    path = parsed.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, netloc, path, '', query, ''))
+
+class PageCache:
+    """Disk-backed HTTP response cache for scraped pages.
+
+    Stores the body plus its ETag/Last-Modified validators so repeat fetches
+    can be revalidated with a conditional GET. Entries expire after max_age
+    seconds and the oldest entries are evicted once the cache exceeds
+    max_bytes. The size is kept as a running total, so the directory is only
+    scanned on first use and when that total goes over the limit.
+    """
+
+    def __init__(self, cache_dir: str, max_age: int = 604800, max_bytes: int = 209715200):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._total_size = None
+        self._size_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _get_cache_key(self, url: str) -> str:
+        return hashlib.sha256(normalize_cache_url(url).encode()).hexdigest()
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        cache_key = self._get_cache_key(url)
+        return (os.path.join(self.cache_dir, f'{cache_key}.json'),
+                os.path.join(self.cache_dir, f'{cache_key}.body'))
+
+    def is_cacheable(self, response) -> bool:
+        """Only 200 responses with a validator and without no-store are kept"""
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        has_validator = bool(response.headers.get('ETag') or response.headers.get('Last-Modified'))
+        return response.status_code == 200 and has_validator and 'no-store' not in cache_control
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Get cache metadata for a URL, or None if missing, expired or without its body"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                entry = json.load(f)
+        except (IOError, ValueError):
+            return None
+
+        # Validators are only worth sending when a 304 can be answered from the body
+        if time.time() - entry.get('stored_at', 0) > self.max_age or not os.path.exists(body_path):
+            self.delete(url)
+            return None
+        return entry
+
+    def read_body(self, url: str) -> Optional[bytes]:
+        _, body_path = self._paths(url)
+        try:
+            with open(body_path, 'rb') as f:
+                return f.read()
+        except IOError:
+            return None
+
+    def set(self, url: str, body: bytes, headers, truncated: bool = False) -> bool:
+        """Store a response body with its validators"""
+        meta_path, body_path = self._paths(url)
+        replaced_size = self._file_size(body_path)
+        entry = {
+            'url': normalize_cache_url(url),
+            'etag': headers.get('ETag', ''),
+            'last_modified': headers.get('Last-Modified', ''),
+            'content_type': headers.get('Content-Type', ''),
+            'truncated': truncated,
+            'size': len(body),
+            'stored_at': time.time()
         }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        website_data = {
-            'url': url,
-            'title': soup.find('title').get_text() if soup.find('title') else '',
-            'meta_description': '',
-            'h1_tags': [h1.get_text().strip() for h1 in soup.find_all('h1')],
-            'h2_tags': [h2.get_text().strip() for h2 in soup.find_all('h2')],
-            'h3_tags': [h3.get_text().strip() for h3 in soup.find_all('h3')],
-            'images': len(soup.find_all('img')),
-            'images_without_alt': len([img for img in soup.find_all('img') if not img.get('alt')]),
-            'internal_links': 0,
-            'external_links': 0,
-            'content_length': len(soup.get_text()),
-            'has_schema': bool(soup.find('script', {'type': 'application/ld+json'})),
-            'schema_types': [],
-            'ssl_certificate': url.startswith('https://'),
-            'content_text': soup.get_text()[:5000],
-            'meta_keywords': '',
-            'canonical_url': '',
-            'open_graph': {},
-            'twitter_cards': {},
-            'structured_data': []
+        try:
+            # Write body first and replace atomically so readers never see a half-written entry
+            self._write_atomic(body_path, body)
+            self._write_atomic(meta_path, json.dumps(entry).encode())
+        except IOError:
+            return False
+
+        self._track_size(len(body) - replaced_size)
+        return True
+
+    def touch(self, url: str):
+        """Restart the age window after a successful revalidation (304)"""
+        entry = self.get(url)
+        if entry:
+            entry['stored_at'] = time.time()
+            meta_path, _ = self._paths(url)
+            try:
+                self._write_atomic(meta_path, json.dumps(entry).encode())
+            except IOError:
+                pass
+
+    def delete(self, url: str):
+        meta_path, body_path = self._paths(url)
+        removed_size = self._file_size(body_path)
+        for path in (meta_path, body_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if removed_size:
+            self._track_size(-removed_size)
+
+    def _write_atomic(self, path: str, payload: bytes):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def _file_size(self, path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _track_size(self, delta: int):
+        """Add delta bytes to the running total and evict once it passes max_bytes.
+
+        The total starts from a scan of the directory; scanning again when it
+        goes over the limit also picks up entries written by other processes.
+        """
+        with self._size_lock:
+            if self._total_size is None:
+                self._total_size = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_size += delta
+            if self._total_size > self.max_bytes:
+                self._total_size = self._enforce_size_limit()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(stored_at, size, cache_key) for every entry on disk"""
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.cache_dir, filename), 'r') as f:
+                    entry = json.load(f)
+                entries.append((entry.get('stored_at', 0), entry.get('size', 0), filename[:-5]))
+            except (IOError, ValueError):
+                pass
+        return entries
+
+    def _enforce_size_limit(self) -> int:
+        """Evict the oldest entries down to PAGE_CACHE_EVICT_TO of max_bytes; returns the size left"""
+        entries = sorted(self._entries())
+        total_size = sum(size for _, size, _ in entries)
+        if total_size <= self.max_bytes:
+            return total_size
+        target_size = int(self.max_bytes * PAGE_CACHE_EVICT_TO)
+        for _, size, cache_key in entries:
+            if total_size <= target_size:
+                break
+            for suffix in ('.json', '.body'):
+                try:
+                    os.remove(os.path.join(self.cache_dir, cache_key + suffix))
+                except OSError:
+                    pass
+            total_size -= size
+        return total_size
+
+    def get_cache_stats(self) -> Dict:
+        entries = self._entries()
+        now = time.time()
+        return {
+            'total_cached_pages': len(entries),
+            'total_size_bytes': sum(size for _, size, _ in entries),
+            'expired_pages': sum(1 for stored_at, _, _ in entries if now - stored_at > self.max_age)
         }
-        
-        # Extract meta description
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        if meta_desc:
-            website_data['meta_description'] = meta_desc.get('content', '')
-        
-        # Count links
-        all_links = soup.find_all('a', href=True)
-        for link in all_links:
-            href = link.get('href')
-            if href.startswith('http') and url not in href:
-                website_data['external_links'] += 1
-            elif href.startswith('/') or url in href:
-                website_data['internal_links'] += 1
-        
+
+# Global page cache instance
+page_cache = PageCache(os.path.join(CACHE_DIR, 'http'), max_age=HTTP_CACHE_MAX_AGE, max_bytes=HTTP_CACHE_MAX_BYTES)
+
+def scrape_website(url: str, deadline: Optional[Deadline] = None) -> Dict:
+    """Scrape website content and metadata (the 30s timeout is capped by deadline)"""
+    try:
+        website_data, _ = _scrape_page(url, timeout=cap_timeout(deadline, 30))
         return website_data
-        
     except Exception as e:
-        return {'error': str(e)}
\ No newline at end of file
+        return {'error': str(e)}
+
+def _scrape_page(url: str, timeout: int, revalidate: bool = True) -> Tuple[Dict, List[str]]:
+    """Fetch and parse a single page, returning its data and same-site links.
+
+    The body is streamed in chunks straight into the incremental extractor and
+    reading stops at SCRAPE_MAX_BYTES; website_data['content_truncated'] records
+    whether the page was cut short. Pages with an ETag/Last-Modified validator
+    are kept in the page cache and revalidated with a conditional GET. With
+    ENABLE_PARSE_POOL the capped body is buffered instead and large pages are
+    parsed in the parse process pool.
+    """
+    cached = page_cache.get(url) if ENABLE_HTTP_CACHE and revalidate else None
+    headers = dict(HEADERS)
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    with http_client.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304 and cached:
+            body = page_cache.read_body(url)
+            if body is not None:
+                page_cache.touch(url)
+                return _extract_body(url, body, cached.get('content_type', ''), cached.get('truncated', False))
+            # The body went missing after we sent its validators; fetch the page in full
+            page_cache.delete(url)
+            return _scrape_page(url, timeout, revalidate=False)
+
+        response.raise_for_status()
+
+        content_type = response.headers.get('Content-Type', '')
+        if content_type and not is_html_content_type(content_type):
+            raise ValueError(f'Unsupported content type: {content_type.split(";")[0]}')
+
+        encoding = detect_encoding(content_type) if 'charset=' in content_type.lower() else None
+        # With the parse pool enabled the body is collected and parsed off-process instead
+        extractor = None if ENABLE_PARSE_POOL else PageExtractor(url, backend=HTML_PARSER_BACKEND, encoding=encoding)
+
+        cacheable = ENABLE_HTTP_CACHE and page_cache.is_cacheable(response)
+        keep_body = cacheable or extractor is None
+        body_chunks = []
+        bytes_read = 0
+        truncated = False
+        for chunk in response.iter_content(chunk_size=SCRAPE_CHUNK_SIZE):
+            if not bytes_read and not content_type and not looks_like_html(chunk):
+                raise ValueError('Response does not look like an HTML page')
+
+            remaining = SCRAPE_MAX_BYTES - bytes_read
+            if len(chunk) > remaining:
+                chunk = chunk[:remaining]
+                truncated = True
+
+            if extractor:
+                extractor.feed(chunk)
+            if keep_body:
+                body_chunks.append(chunk)
+            bytes_read += len(chunk)
+            if truncated:
+                break
+
+        body = b''.join(body_chunks)
+        if cacheable:
+            page_cache.set(url, body, response.headers, truncated)
+
+    if extractor:
+        website_data, links = extractor.close()
+    else:
+        website_data, links = _parse_body(url, body, encoding)
+    website_data['content_truncated'] = truncated or website_data.get('content_truncated', False)
+    website_data['bytes_downloaded'] = bytes_read
+    return website_data, links
+
+def _extract_body(url: str, body: bytes, content_type: str, truncated: bool) -> Tuple[Dict, List[str]]:
+    """Extract a page from a stored body (page cache hit)"""
+    encoding = detect_encoding(content_type) if 'charset=' in content_type.lower() else None
+    website_data, links = _parse_body(url, body, encoding)
+    website_data['content_truncated'] = truncated or website_data.get('content_truncated', False)
+    website_data['bytes_downloaded'] = 0
+    return website_data, links
+
+def _parse_body(url: str, body: bytes, encoding: Optional[str]) -> Tuple[Dict, List[str]]:
+    """Parse a complete body, in the parse process pool when it is enabled and the page is large"""
+    if ENABLE_PARSE_POOL and len(body) >= PARSE_POOL_MIN_BYTES:
+        return parse_pool.extract_in_pool(url, body, backend=HTML_PARSER_BACKEND, encoding=encoding)
+    return extract_page(url, body, backend=HTML_PARSER_BACKEND, encoding=encoding)
+
+def is_html_content_type(content_type: str) -> bool:
+    """True for HTML/XHTML responses"""
+    mime_type = content_type.split(';')[0].strip().lower()
+    return mime_type in HTML_CONTENT_TYPES
+
+def looks_like_html(head: bytes) -> bool:
+    """Sniff the first chunk of a response without a Content-Type header"""
+    if b'\x00' in head[:1024]:
+        return False
+    return head.lstrip()[:1] == b'<' or b'<html' in head[:1024].lower()
+
+def _fetch_sitemap_urls(url: str, timeout: int, limit: int) -> List[str]:
+    """Same-site page URLs from the first limit sitemap entries, most recently modified first (best effort)"""
+    try:
+        entries = sitemap_service.list_urls(url, timeout, limit=limit)
+    except Exception:
+        return []
+
+    # Entries without a lastmod keep their sitemap order after the dated ones
+    entries = sorted(entries, key=lambda entry: entry['lastmod'] or '', reverse=True)
+    urls = []
+    for entry in entries:
+        page_url = normalize_page_url(url, entry['loc'])
+        if page_url and same_site(url, page_url):
+            urls.append(page_url)
+    return urls
+
+def _select_frontier(candidates: List[str], budget: int) -> Tuple[List[str], int]:
+    """The first budget candidates robots.txt allows, and how many were blocked on the way.
+
+    May fetch robots.txt, so keep it off the event loop.
+    """
+    frontier = []
+    blocked = 0
+    for page_url in candidates:
+        if len(frontier) >= budget:
+            break
+        if RESPECT_ROBOTS_TXT and not sitemap_service.is_allowed(page_url):
+            blocked += 1
+            continue
+        frontier.append(page_url)
+    return frontier, blocked
+
+def crawl_website(url: str, max_pages: int = 25, concurrency: int = None,
+                  deadline: Optional[Deadline] = None) -> Dict:
+    """Crawl up to max_pages pages of a site concurrently.
+
+    Pages are discovered from the homepage links and the site's sitemaps, and
+    pages disallowed by robots.txt are skipped when RESPECT_ROBOTS_TXT is set. Returns
+    {'url', 'pages': [website_data, ...], 'site_summary': {...}, 'failed_pages': [...]}
+    with the homepage first, or {'error': ...} if the homepage cannot be scraped.
+
+    With a deadline, page timeouts are capped by the time left and pages not
+    started before it passes are reported as failed.
+    """
+    concurrency = max(1, concurrency or CRAWL_CONCURRENCY)
+    try:
+        return asyncio.run(_crawl(url, max(1, max_pages), concurrency, deadline))
+    except Exception as e:
+        return {'error': str(e)}
+
+async def _crawl(url: str, max_pages: int, concurrency: int, deadline: Optional[Deadline] = None) -> Dict:
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='crawler') as executor:
+
+        async def fetch_page(page_url: str):
+            async with semaphore:
+                timeout = cap_timeout(deadline, CRAWL_PAGE_TIMEOUT)
+                return await loop.run_in_executor(executor, _scrape_page, page_url, timeout)
+
+        # Homepage and sitemap are fetched together, everything else depends on them
+        homepage_task = asyncio.ensure_future(fetch_page(url))
+        sitemap_task = loop.run_in_executor(executor, _fetch_sitemap_urls, url,
+                                            cap_timeout(deadline, CRAWL_PAGE_TIMEOUT),
+                                            max_pages * SITEMAP_CANDIDATES_PER_PAGE)
+
+        try:
+            homepage_data, homepage_links = await homepage_task
+        except Exception as e:
+            sitemap_task.cancel()
+            return {'error': str(e)}
+        sitemap_urls = await sitemap_task
+
+        seen = {url.rstrip('/')}
+        candidates = []
+        for page_url in homepage_links + sitemap_urls:
+            if page_url not in seen:
+                seen.add(page_url)
+                candidates.append(page_url)
+        frontier, blocked_pages = await loop.run_in_executor(executor, _select_frontier, candidates, max_pages - 1)
+
+        results = await asyncio.gather(*(fetch_page(page_url) for page_url in frontier), return_exceptions=True)
+
+    pages = [homepage_data]
+    failed_pages = []
+    for page_url, result in zip(frontier, results):
+        if isinstance(result, Exception):
+            failed_pages.append({'url': page_url, 'error': str(result)})
+        else:
+            pages.append(result[0])
+
+    site_summary = summarize_site(pages, failed_pages)
+    site_summary['pages_blocked_by_robots'] = blocked_pages
+    try:
+        site_summary.update(sitemap_service.get_site_signals(url, limit=max_pages * SITEMAP_CANDIDATES_PER_PAGE))
+    except Exception:
+        pass
+
+    return {
+        'url': url,
+        'pages': pages,
+        'site_summary': site_summary,
+        'failed_pages': failed_pages
+    }
+
+def compute_content_fingerprint(website_data: Dict) -> str:
+    """Hash of the normalized scrape output that the analysis depends on.
+
+    The URL itself is left out so different URLs serving the same content
+    share a fingerprint; whitespace and case changes do not alter it.
+    """
+    def normalize(text) -> str:
+        return ' '.join(str(text or '').split()).lower()
+
+    site_summary = dict(website_data.get('site_summary') or {})
+    site_summary.pop('page_urls', None)
+
+    fingerprint_source = {
+        'title': normalize(website_data.get('title')),
+        'meta_description': normalize(website_data.get('meta_description')),
+        'headings': [[normalize(h) for h in website_data.get(f'h{level}_tags', [])] for level in (1, 2, 3)],
+        'content_text': normalize(website_data.get('content_text')),
+        'content_length': website_data.get('content_length', 0),
+        'content_truncated': bool(website_data.get('content_truncated')),
+        'has_schema': bool(website_data.get('has_schema')),
+        'schema_types': sorted(website_data.get('schema_types', [])),
+        'images': website_data.get('images', 0),
+        'images_without_alt': website_data.get('images_without_alt', 0),
+        'internal_links': website_data.get('internal_links', 0),
+        'external_links': website_data.get('external_links', 0),
+        'ssl_certificate': bool(website_data.get('ssl_certificate')),
+        'site_summary': site_summary
+    }
+    payload = json.dumps(fingerprint_source, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def summarize_site(pages: List[Dict], failed_pages: List[Dict] = None) -> Dict:
+    """Roll per-page website_data up into site-level metrics"""
+    failed_pages = failed_pages or []
+    titles = [page.get('title', '').strip() for page in pages if page.get('title', '').strip()]
+    total_images = sum(page.get('images', 0) for page in pages)
+    schema_types = sorted({schema_type for page in pages for schema_type in page.get('schema_types', [])})
+
+    return {
+        'pages_crawled': len(pages),
+        'pages_failed': len(failed_pages),
+        'pages_missing_title': sum(1 for page in pages if not page.get('title', '').strip()),
+        'pages_missing_meta_description': sum(1 for page in pages if not page.get('meta_description')),
+        'pages_missing_h1': sum(1 for page in pages if not page.get('h1_tags')),
+        'pages_with_multiple_h1': sum(1 for page in pages if len(page.get('h1_tags', [])) > 1),
+        'duplicate_titles': len(titles) - len(set(titles)),
+        'pages_with_schema': sum(1 for page in pages if page.get('has_schema')),
+        'schema_types': schema_types,
+        'pages_without_ssl': sum(1 for page in pages if not page.get('ssl_certificate')),
+        'thin_content_pages': sum(1 for page in pages if page.get('content_length', 0) < 1000),
+        'average_content_length': int(sum(page.get('content_length', 0) for page in pages) / max(len(pages), 1)),
+        'total_images': total_images,
+        'total_images_without_alt': sum(page.get('images_without_alt', 0) for page in pages),
+        'truncated_pages': sum(1 for page in pages if page.get('content_truncated')),
+        'page_urls': [page.get('url') for page in pages]
+    }
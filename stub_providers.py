@@ -0,0 +1,254 @@
+# File: stub_providers.py
+# Local stand-in for the OpenAI, OpenRouter and Resend APIs, for load tests and benchmarks
+
+#!/usr/bin/env python3
+"""
+Stand-in provider server for load testing the audit pipeline without paid APIs.
+
+Implements the endpoints the app calls:
+    POST /v1/chat/completions   OpenAI/OpenRouter chat completions (JSON or streamed SSE)
+    POST /emails                Resend send-email
+and serves a small synthetic website to audit:
+    GET  /site/<path>           HTML pages with headings, images, schema and internal links
+plus GET /stats and POST /stats/reset for request counters.
+
+Latency is drawn per request from a distribution:
+    fixed:SECONDS | uniform:LOW,HIGH | normal:MEAN,STDDEV | lognormal:MEDIAN,SIGMA
+and a share of requests (--error-rate) fails with --error-status.
+
+Chat responses are canned: each audit_data key the prompt asks for is answered
+from DEFAULT_RESPONSES, overridable per key with --responses FILE (a JSON object).
+
+Point the app at it with:
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1  OPENROUTER_BASE_URL=http://127.0.0.1:8089/v1
+    RESEND_BASE_URL=http://127.0.0.1:8089     OPENAI_API_KEY=stub OPENROUTER_API_KEY=stub RESEND_API_KEY=stub
+"""
+import re
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from typing import Callable, Dict
+
+from flask import Flask, Response, jsonify, request
+
+from services.analysis_sections import AUDIT_DATA_SCHEMA
+
+DEFAULT_RESPONSES = {
+    'executive_summary': {
+        'overall_score': 58,
+        'business_impact_rating': 'High',
+        'estimated_monthly_traffic_loss': 1800,
+        'estimated_monthly_revenue_loss': 90000,
+        'implementation_complexity': 'Medium',
+        'expected_roi_timeline': '60 days'
+    },
+    'category_scores': {
+        'technical_seo': 62, 'content_quality': 55, 'ai_readiness': 41,
+        'voice_search': 38, 'schema_markup': 30, 'competitive_position': 50
+    },
+    'competitor_analysis': {
+        'likely_competitors': [
+            {'domain': 'competitor1.example', 'competitive_advantage': 'Deeper service pages',
+             'content_gaps': ['pricing guide', 'FAQ'], 'estimated_traffic': 'medium'}
+        ],
+        'market_opportunity': 'Local service queries are under-served by structured answers.',
+        'competitive_recommendations': ['Publish a pricing guide', 'Add FAQ schema']
+    },
+    'critical_issues': [
+        {'issue': 'No structured data on service pages', 'business_impact': 'high',
+         'implementation_effort': '1-2 weeks', 'expected_improvement': 'Rich results eligibility',
+         'priority_score': 9},
+        {'issue': 'Images missing alt text', 'business_impact': 'medium',
+         'implementation_effort': '2-3 days', 'expected_improvement': 'Accessibility and image search',
+         'priority_score': 6}
+    ],
+    'ai_search_strategy': {
+        'google_ai_optimization': ['Answer top questions in the first paragraph'],
+        'chatgpt_visibility': ['Publish citable statistics'],
+        'voice_search_plan': ['Add conversational FAQ content'],
+        'schema_roadmap': ['LocalBusiness', 'FAQPage']
+    },
+    'content_blueprint': {
+        'priority_topics': ['Emergency repairs', 'Pricing'],
+        'content_calendar': ['Week 1: pricing guide'],
+        'faq_opportunities': ['How fast can you arrive?']
+    },
+    'implementation_roadmap': {
+        'weeks_1_2': {'focus': 'Technical fixes', 'tasks': ['Add schema', 'Fix alt text']},
+        'weeks_3_6': {'focus': 'Content', 'tasks': ['Publish pricing guide']},
+        'weeks_7_12': {'focus': 'Authority', 'tasks': ['Earn local citations']}
+    },
+    'roi_projections': {
+        '30_day_impact': {'traffic_increase': '15%'},
+        '90_day_impact': {'traffic_increase': '40%'},
+        '12_month_potential': {'traffic_increase': '120%'}
+    },
+    'success_metrics': {'kpis_to_track': ['Organic sessions', 'Leads'], 'reporting_frequency': 'Monthly'},
+    'next_steps': {'immediate_actions': ['Add LocalBusiness schema'], 'week_1_priorities': ['Fix alt text']}
+}
+
+ONLY_KEYS_RE = re.compile(r'Include only these keys, the others are already complete: ([\w, ]+)')
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """A sampler for a latency spec such as 'lognormal:1.5,0.6' (seconds, never negative)"""
+    kind, _, args = spec.partition(':')
+    try:
+        values = [float(value) for value in args.split(',')] if args else []
+        if kind == 'fixed':
+            return lambda: values[0]
+        if kind == 'uniform':
+            return lambda: random.uniform(values[0], values[1])
+        if kind == 'normal':
+            return lambda: max(0.0, random.gauss(values[0], values[1]))
+        if kind == 'lognormal':
+            return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    except (ValueError, IndexError):
+        pass
+    raise ValueError(f'Invalid latency spec: {spec!r}')
+
+def canned_response(prompt: str, responses: Dict) -> Dict:
+    """The canned values for the audit_data keys the prompt asks for (all of them if none match)"""
+    only = ONLY_KEYS_RE.search(prompt)
+    if only:
+        keys = [key.strip() for key in only.group(1).split(',')]
+    else:
+        keys = [key for key in AUDIT_DATA_SCHEMA if f'"{key}"' in prompt]
+    return {key: responses[key] for key in (keys or list(AUDIT_DATA_SCHEMA)) if key in responses}
+
+def site_page(path: str) -> str:
+    """A synthetic page; every path gets distinct text so content fingerprints differ"""
+    links = ''.join(f'<li><a href="/site/{path.split("/")[0]}/page-{n}">Service {n}</a></li>' for n in range(1, 6))
+    paragraphs = ''.join(
+        f'<p>Stub Plumbing {path} has repaired {120 + n * 7} boilers and burst pipes across the city '
+        f'since {1990 + n}. Engineers arrive within {n + 1} hours for emergency call-outs.</p>'
+        for n in range(12)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en"><head>
+<title>Stub Plumbing - {path}</title>
+<meta name="description" content="Emergency plumbing and boiler repairs ({path}).">
+<script type="application/ld+json">{{"@context": "https://schema.org", "@type": "LocalBusiness", "name": "Stub Plumbing"}}</script>
+</head><body>
+<nav><ul>{links}</ul></nav>
+<main><h1>Stub Plumbing {path}</h1><h2>Emergency repairs</h2>{paragraphs}
+<img src="/img/van.jpg" alt="Service van"><img src="/img/boiler.jpg"></main>
+<footer>Copyright Stub Plumbing. All rights reserved.</footer>
+</body></html>"""
+
+def create_app(chat_latency: str = 'fixed:0', email_latency: str = 'fixed:0', error_rate: float = 0.0,
+               error_status: int = 503, responses: Dict = None, stream_chunk_chars: int = 40) -> Flask:
+    """The stub server; latency specs are as in parse_latency"""
+    app = Flask(__name__)
+    sample_chat_latency = parse_latency(chat_latency)
+    sample_email_latency = parse_latency(email_latency)
+    canned = {**DEFAULT_RESPONSES, **(responses or {})}
+    stats = {'chat_requests': 0, 'chat_errors': 0, 'streamed': 0, 'completion_tokens': 0, 'emails': 0, 'pages': 0}
+    lock = threading.Lock()
+
+    def count(name: str, amount: int = 1):
+        with lock:
+            stats[name] += amount
+
+    def injected_error():
+        if error_rate and random.random() < error_rate:
+            return jsonify({'error': {'message': 'Injected stub failure', 'type': 'server_error'}}), error_status
+        return None
+
+    @app.route('/v1/chat/completions', methods=['POST'])
+    @app.route('/api/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        count('chat_requests')
+        payload = request.get_json(force=True) or {}
+        latency = sample_chat_latency()
+        error = injected_error()
+        if error is not None:
+            time.sleep(latency)
+            count('chat_errors')
+            return error
+
+        messages = payload.get('messages', [])
+        content = json.dumps(canned_response(messages[-1].get('content', '') if messages else '', canned))
+        usage = {
+            'prompt_tokens': sum(len(message.get('content') or '') for message in messages) // 4,
+            'completion_tokens': len(content) // 4
+        }
+        count('completion_tokens', usage['completion_tokens'])
+        model = payload.get('model', 'stub')
+
+        if not payload.get('stream'):
+            time.sleep(latency)
+            return jsonify({
+                'id': f'chatcmpl-{uuid.uuid4().hex}', 'object': 'chat.completion', 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                'usage': usage
+            })
+
+        count('streamed')
+        chunks = [content[i:i + stream_chunk_chars] for i in range(0, len(content), stream_chunk_chars)]
+
+        def events():
+            # The latency is spread over the stream: time to first token, then even gaps
+            pause = latency / (len(chunks) + 1)
+            for chunk in chunks:
+                time.sleep(pause)
+                yield f"data: {json.dumps({'model': model, 'choices': [{'index': 0, 'delta': {'content': chunk}}]})}\n\n"
+            yield f"data: {json.dumps({'model': model, 'choices': [], 'usage': usage})}\n\n"
+            yield 'data: [DONE]\n\n'
+
+        return Response(events(), mimetype='text/event-stream')
+
+    @app.route('/emails', methods=['POST'])
+    def send_email():
+        time.sleep(sample_email_latency())
+        error = injected_error()
+        if error is not None:
+            return error
+        count('emails')
+        return jsonify({'id': str(uuid.uuid4())})
+
+    @app.route('/site/<path:path>')
+    def site(path):
+        count('pages')
+        return Response(site_page(path), mimetype='text/html')
+
+    @app.route('/stats')
+    def get_stats():
+        with lock:
+            return jsonify(dict(stats))
+
+    @app.route('/stats/reset', methods=['POST'])
+    def reset_stats():
+        with lock:
+            for name in stats:
+                stats[name] = 0
+        return jsonify({'success': True})
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in OpenAI/OpenRouter/Resend server for load testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', default='lognormal:2.0,0.5', help='chat completion latency distribution')
+    parser.add_argument('--email-latency', default='uniform:0.1,0.3', help='email send latency distribution')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests that fail (0-1)')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--responses', help='JSON file of canned audit_data values by key')
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses) as f:
+            responses = json.load(f)
+
+    app = create_app(args.latency, args.email_latency, args.error_rate, args.error_status, responses)
+    print(f'Stub providers listening on http://{args.host}:{args.port} '
+          f'(chat latency {args.latency}, error rate {args.error_rate})')
+    app.run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == '__main__':
+    main()
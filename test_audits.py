@@ -50,7 +50,7 @@ try:
         data = response.json()
         print(f"   Success: {data.get('success')}")
         print(f"   Score: {data.get('score')}")
-        print(f"   Email sent: {data.get('email_sent')}")
+        print(f"   Email status: {data.get('email_status', data.get('email_sent'))}")
         print(f"   Issues found: {len(data.get('issues', []))}")
         print(f"   Recommendations: {len(data.get('recommendations', []))}")
     else:
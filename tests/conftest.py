@@ -0,0 +1,35 @@
+# File: tests/conftest.py
+
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.settings migrates the database and the services open their SQLite files on
+# import, so point them at a scratch directory before any test module imports them
+_work_dir = tempfile.mkdtemp(prefix='seo-auditor-tests-')
+os.environ.update({
+    'DATABASE_PATH': os.path.join(_work_dir, 'seo_auditor.db'),
+    'JOB_QUEUE_PATH': os.path.join(_work_dir, 'jobs.db'),
+    'CACHE_DIR': os.path.join(_work_dir, 'cache'),
+    'REPORTS_DIR': os.path.join(_work_dir, 'reports')
+})
+
+@pytest.fixture(scope='session', autouse=True)
+def scratch_directory():
+    """Remove the scratch directory the runtime databases were redirected to"""
+    yield _work_dir
+    shutil.rmtree(_work_dir, ignore_errors=True)
+
+@pytest.fixture(scope='session', autouse=True)
+def close_llm_sessions():
+    """Close the pooled aiohttp sessions the LLM clients opened during the run"""
+    yield
+    llm_client = sys.modules.get('services.llm_client')
+    if llm_client is not None:
+        llm_client.close_clients()
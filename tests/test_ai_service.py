@@ -0,0 +1,227 @@
+# File: tests/test_ai_service.py
+
+import unittest
+import os
+import sys
+import json
+import time
+import asyncio
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import ai_service, model_routing, provider_router
+from services.analysis_sections import SECTIONS
+from services.llm_client import LLMError
+from utils.deadline import Deadline
+from utils.metrics import metrics
+
+WEBSITE_DATA = {
+    'url': 'https://a.example', 'title': 'Home', 'meta_description': 'Welcome',
+    'h1_tags': ['Hello'], 'content_text': 'Some body text', 'content_length': 14
+}
+
+SECTION_RESPONSES = {
+    'executive_summary': {'executive_summary': {'overall_score': 40}, 'category_scores': {'voice_search': 33}},
+    'competitor_analysis': {'competitor_analysis': {'likely_competitors': []}},
+    'critical_issues': {'critical_issues': [{'issue': 'AI issue'}]},
+    'ai_search_strategy': {'ai_search_strategy': {'google_ai_optimization': ['AI tip']}},
+    'content_blueprint': {'content_blueprint': {'priority_topics': []}},
+    'implementation_roadmap': {'implementation_roadmap': {'weeks_1_2': {}}},
+    'roi_projections': {'roi_projections': {'30_day_impact': {}}, 'success_metrics': {'kpis_to_track': []}},
+    'next_steps': {'next_steps': {'immediate_actions': ['Start']}}
+}
+
+def section_of(messages):
+    prompt = messages[-1]['content']
+    for section in SECTIONS:
+        if section['instructions'].strip() in prompt:
+            return section['name']
+    raise AssertionError('prompt does not match a section')
+
+class TestSectionalAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            mock.patch.object(ai_service, 'ENABLE_LLM_CACHE', False),
+            mock.patch.object(ai_service, 'AI_SECTION_ATTEMPTS', 2),
+            mock.patch.object(ai_service, 'AI_RETRY_BACKOFF_BASE', 0.01)
+        ]
+        for patch in self.patches:
+            patch.start()
+        provider_router._trackers.clear()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def run_analysis(self, fake_completion, deadline=None):
+        with mock.patch.object(ai_service.llm_client, 'chat_completion', side_effect=fake_completion):
+            return ai_service.analyze_with_ai(dict(WEBSITE_DATA), deadline=deadline)
+
+    def test_sections_run_concurrently_and_merge(self):
+        async def fake_completion(provider, model, messages, **kwargs):
+            await asyncio.sleep(0.2)
+            return json.dumps(SECTION_RESPONSES[section_of(messages)])
+
+        started = time.time()
+        analysis = self.run_analysis(fake_completion)
+        self.assertLess(time.time() - started, 0.2 * len(SECTIONS) / 2)
+        self.assertNotIn('fallback_sections', analysis)
+        self.assertEqual(analysis['critical_issues'], [{'issue': 'AI issue'}])
+        self.assertEqual(analysis['next_steps'], {'immediate_actions': ['Start']})
+        for section in SECTIONS:
+            for key in section['keys']:
+                self.assertIn(key, analysis)
+
+    def test_failed_section_is_retried_then_filled_from_fallback(self):
+        calls = []
+
+        async def fake_completion(provider, model, messages, **kwargs):
+            name = section_of(messages)
+            calls.append((name, provider))
+            if name == 'competitor_analysis':
+                raise LLMError('overloaded', provider, status=503, retryable=True)
+            if name == 'content_blueprint' and calls.count((name, provider)) == 1:
+                return 'not json'
+            return json.dumps(SECTION_RESPONSES[name])
+
+        analysis = self.run_analysis(fake_completion)
+        self.assertEqual(analysis['fallback_sections'], ['competitor_analysis'])
+        self.assertEqual(calls.count(('competitor_analysis', 'openai')), 2)
+        self.assertEqual(calls.count(('competitor_analysis', 'openrouter')), 2)
+        fallback = ai_service.generate_premium_fallback_analysis(dict(WEBSITE_DATA))
+        self.assertEqual(analysis['competitor_analysis'], fallback['competitor_analysis'])
+        self.assertEqual(analysis['content_blueprint'], {'priority_topics': []})
+        self.assertEqual(analysis['critical_issues'], [{'issue': 'AI issue'}])
+
+    def test_non_retryable_errors_move_to_next_provider(self):
+        calls = []
+
+        async def fake_completion(provider, model, messages, **kwargs):
+            calls.append(provider)
+            if provider == 'openai':
+                raise LLMError('openai API key is not configured', provider)
+            return json.dumps(SECTION_RESPONSES[section_of(messages)])
+
+        analysis = self.run_analysis(fake_completion)
+        self.assertNotIn('fallback_sections', analysis)
+        self.assertEqual(calls.count('openai'), len(SECTIONS))
+
+    def test_all_sections_failing_returns_fallback_analysis(self):
+        async def fake_completion(provider, model, messages, **kwargs):
+            raise LLMError('down', provider, retryable=False)
+
+        analysis = self.run_analysis(fake_completion)
+        self.assertEqual(analysis['analysis_source'], 'fallback')
+
+    def test_repairable_output_is_not_regenerated(self):
+        calls = []
+
+        async def fake_completion(provider, model, messages, **kwargs):
+            calls.append(section_of(messages))
+            body = json.dumps(SECTION_RESPONSES[section_of(messages)], indent=2)
+            return f"```json\n{body[:-1]},\n}}\n```"
+
+        analysis = self.run_analysis(fake_completion)
+        self.assertNotIn('fallback_sections', analysis)
+        self.assertEqual(len(calls), len(SECTIONS))
+
+    def test_only_missing_keys_are_requested_again(self):
+        prompts = []
+
+        async def fake_completion(provider, model, messages, **kwargs):
+            name = section_of(messages)
+            if name != 'executive_summary':
+                return json.dumps(SECTION_RESPONSES[name])
+            prompts.append(messages[-1]['content'])
+            if len(prompts) == 1:
+                # Truncated after the first key, with an invalid value type for the second
+                return '{"executive_summary": {"overall_score": 40}, "category_scores": ["tech'
+            return json.dumps({'category_scores': {'voice_search': 33}})
+
+        analysis = self.run_analysis(fake_completion)
+        self.assertNotIn('fallback_sections', analysis)
+        self.assertEqual(len(prompts), 2)
+        self.assertNotIn('Include only these keys', prompts[0])
+        self.assertIn('Include only these keys, the others are already complete: category_scores', prompts[1])
+        self.assertEqual(analysis['category_scores'], {'voice_search': 33})
+
+    def test_deadline_caps_call_timeouts(self):
+        timeouts = []
+
+        async def fake_completion(provider, model, messages, **kwargs):
+            timeouts.append(kwargs['timeout'])
+            return json.dumps(SECTION_RESPONSES[section_of(messages)])
+
+        analysis = self.run_analysis(fake_completion, deadline=Deadline(5))
+        self.assertNotIn('fallback_sections', analysis)
+        self.assertTrue(all(0 < timeout <= 5 for timeout in timeouts))
+
+    def test_sections_still_pending_at_the_deadline_use_fallback(self):
+        async def fake_completion(provider, model, messages, **kwargs):
+            name = section_of(messages)
+            if name == 'next_steps':
+                await asyncio.sleep(kwargs['timeout'])
+                raise LLMError('timed out', provider, retryable=True)
+            return json.dumps(SECTION_RESPONSES[name])
+
+        started = time.time()
+        analysis = self.run_analysis(fake_completion, deadline=Deadline(0.5))
+        self.assertLess(time.time() - started, 2)
+        self.assertEqual(analysis['fallback_sections'], ['next_steps'])
+
+    def test_expired_deadline_skips_the_ai(self):
+        async def fake_completion(provider, model, messages, **kwargs):
+            raise AssertionError('no provider call expected')
+
+        analysis = self.run_analysis(fake_completion, deadline=Deadline(0))
+        self.assertEqual(analysis['analysis_source'], 'fallback')
+
+    def test_streamed_sections_are_reported_before_the_completion_ends(self):
+        ready_at = {}
+
+        async def fake_completion(provider, model, messages, on_delta=None, **kwargs):
+            content = json.dumps(SECTION_RESPONSES[section_of(messages)])
+            for i in range(0, len(content), 7):
+                on_delta(content[i:i + 7])
+            await asyncio.sleep(0.3)
+            return content
+
+        metrics.reset()
+        started = time.time()
+        with mock.patch.object(ai_service.llm_client, 'chat_completion', side_effect=fake_completion):
+            analysis = ai_service.analyze_with_ai(
+                dict(WEBSITE_DATA), on_section=lambda name, result: ready_at.setdefault(name, time.time() - started))
+        self.assertEqual(set(ready_at), {section['name'] for section in SECTIONS})
+        self.assertTrue(all(seconds < 0.25 for seconds in ready_at.values()))
+        self.assertEqual(analysis['next_steps'], {'immediate_actions': ['Start']})
+        self.assertEqual(metrics.snapshot()['histograms']['ai_time_to_first_section_seconds']['count'], 1)
+
+    def test_free_tier_uses_its_own_models_and_sections(self):
+        calls = []
+
+        async def fake_completion(provider, model, messages, on_usage=None, **kwargs):
+            calls.append((section_of(messages), model, kwargs['max_tokens']))
+            on_usage({'prompt_tokens': 1000, 'completion_tokens': 100})
+            return json.dumps(SECTION_RESPONSES[section_of(messages)])
+
+        routing = {'free': {'providers': [['openai', 'gpt-4o-mini']], 'max_tokens': 300,
+                            'sections': ['executive_summary', 'critical_issues'], 'latency_target': 10}}
+        metrics.reset()
+        with mock.patch.object(model_routing, 'AI_MODEL_ROUTING', routing), \
+                mock.patch.object(ai_service.llm_client, 'chat_completion', side_effect=fake_completion):
+            analysis = ai_service.analyze_with_ai(dict(WEBSITE_DATA), audit_type='free')
+
+        self.assertEqual(sorted(calls), [('critical_issues', 'gpt-4o-mini', 300), ('executive_summary', 'gpt-4o-mini', 300)])
+        self.assertNotIn('fallback_sections', analysis)
+        self.assertEqual(len(analysis['rule_based_sections']), len(SECTIONS) - 2)
+        self.assertEqual(analysis['critical_issues'], [{'issue': 'AI issue'}])
+        fallback = ai_service.generate_premium_fallback_analysis(dict(WEBSITE_DATA))
+        self.assertEqual(analysis['next_steps'], fallback['next_steps'])
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['counters']['ai_tokens.free'], 2200)
+        self.assertAlmostEqual(snapshot['histograms']['ai_cost_cents.free']['max'], 0.042)
+
+if __name__ == '__main__':
+    unittest.main()
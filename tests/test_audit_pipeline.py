@@ -0,0 +1,119 @@
+# File: tests/test_audit_pipeline.py
+
+import unittest
+import os
+import sys
+import time
+import threading
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.audit_pipeline import AuditPipeline, Stage, StageFailed, CONTINUE
+from utils.metrics import metrics
+
+def sleeper(seconds, value):
+    def run(outputs):
+        time.sleep(seconds)
+        return value
+    return run
+
+class TestAuditPipeline(unittest.TestCase):
+    def test_independent_stages_run_concurrently(self):
+        pipeline = AuditPipeline('test', [
+            Stage('analysis', sleeper(0.05, 'data')),
+            Stage('pdf', sleeper(0.3, 'a.pdf'), after=['analysis']),
+            Stage('save', sleeper(0.3, None), after=['analysis']),
+            Stage('summary', lambda outputs: (outputs['pdf'], outputs['save']), after=['pdf', 'save'])
+        ])
+        started = time.monotonic()
+        pipeline_run = pipeline.run()
+
+        self.assertLess(time.monotonic() - started, 0.55)
+        self.assertEqual(pipeline_run.outputs['summary'], ('a.pdf', None))
+        self.assertEqual(set(pipeline_run.timings), {'analysis', 'pdf', 'save', 'summary'})
+        self.assertGreaterEqual(pipeline_run.timings['pdf'], 0.3)
+        self.assertIn('audit_stage_seconds.test.pdf', metrics.snapshot()['histograms'])
+
+    def test_background_stages_run_after_the_response(self):
+        release = threading.Event()
+        sent = []
+
+        def email(outputs):
+            release.wait(5)
+            sent.append(outputs['pdf'])
+            return True
+
+        pipeline = AuditPipeline('test', [
+            Stage('pdf', lambda outputs: 'a.pdf'),
+            Stage('email', email, after=['pdf'], background=True)
+        ])
+        pipeline_run = pipeline.run()
+        self.assertNotIn('email', pipeline_run.outputs)
+
+        release.set()
+        self.assertTrue(pipeline_run.wait_for_background(timeout=5))
+        self.assertEqual(sent, ['a.pdf'])
+        self.assertTrue(pipeline_run.outputs['email'])
+
+    def test_error_policies_and_timeouts(self):
+        def broken(outputs):
+            raise RuntimeError('renderer crashed')
+
+        pipeline = AuditPipeline('test', [
+            Stage('pdf', broken, on_error=CONTINUE),
+            Stage('slow', sleeper(1, 'late'), timeout=0.1, on_error=CONTINUE, default='fallback'),
+            Stage('email', lambda outputs: (outputs['pdf'], outputs['slow']), after=['pdf', 'slow'])
+        ])
+        pipeline_run = pipeline.run()
+        self.assertEqual(pipeline_run.outputs['email'], (None, 'fallback'))
+        self.assertEqual(pipeline_run.errors['pdf'], 'renderer crashed')
+        self.assertIn('timed out', pipeline_run.errors['slow'])
+        self.assertLess(pipeline_run.timings['slow'], 0.5)
+
+        failing = AuditPipeline('test', [
+            Stage('analysis', broken),
+            Stage('save', lambda outputs: self.fail('save ran without analysis'), after=['analysis'])
+        ])
+        with self.assertRaises(StageFailed) as raised:
+            failing.run()
+        self.assertEqual((raised.exception.stage, str(raised.exception)), ('analysis', 'renderer crashed'))
+
+    def test_completed_stages_are_not_run_again(self):
+        pipeline = AuditPipeline('test', [
+            Stage('analysis', lambda outputs: self.fail('analysis ran again')),
+            Stage('pdf', lambda outputs: outputs['analysis'] + '.pdf', after=['analysis'])
+        ])
+        self.assertEqual(pipeline.run({'analysis': 'report'}).outputs['pdf'], 'report.pdf')
+
+    def test_checkpoints_and_finish_hook(self):
+        checkpoints = []
+        finished = threading.Event()
+
+        def broken(outputs):
+            raise RuntimeError('no PDF')
+
+        pipeline = AuditPipeline('test', [
+            Stage('analysis', lambda outputs: 'data'),
+            Stage('pdf', broken, after=['analysis'], on_error=CONTINUE),
+            Stage('email', lambda outputs: True, after=['pdf'], background=True)
+        ])
+        pipeline_run = pipeline.run(checkpoint=lambda stage, output: checkpoints.append((stage, output)),
+                                    on_finish=lambda run: finished.set())
+        self.assertTrue(finished.wait(5))
+        # Failed stages are not checkpointed, so a resumed run repeats them
+        self.assertEqual(checkpoints, [('analysis', 'data'), ('email', True)])
+        self.assertEqual(list(pipeline_run.errors), ['pdf'])
+        self.assertEqual(pipeline.downstream(['pdf']), ['pdf', 'email'])
+
+    def test_invalid_graphs_are_rejected(self):
+        noop = lambda outputs: None
+        with self.assertRaises(ValueError):
+            AuditPipeline('test', [Stage('a', noop, after=['b']), Stage('b', noop, after=['a'])])
+        with self.assertRaises(ValueError):
+            AuditPipeline('test', [Stage('a', noop, after=['missing'])])
+        with self.assertRaises(ValueError):
+            AuditPipeline('test', [Stage('email', noop, background=True), Stage('save', noop, after=['email'])])
+
+if __name__ == '__main__':
+    unittest.main()
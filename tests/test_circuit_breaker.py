@@ -0,0 +1,65 @@
+# File: tests/test_circuit_breaker.py
+
+import unittest
+import os
+import sys
+import time
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.circuit_breaker import CircuitBreaker, backoff_delay, CLOSED, OPEN, HALF_OPEN
+from utils.deadline import Deadline, DeadlineExceeded, cap_timeout
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker('openai', failure_threshold=3, cooldown=30)
+        for _ in range(2):
+            breaker.record_failure()
+        breaker.record_success()
+        for _ in range(2):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow_request())
+
+    def test_half_open_allows_one_trial(self):
+        breaker = CircuitBreaker('openai', failure_threshold=1, cooldown=30)
+        breaker.record_failure()
+        with mock.patch('utils.circuit_breaker.time.monotonic', return_value=time.monotonic() + 31):
+            self.assertTrue(breaker.allow_request())
+            self.assertEqual(breaker.state, HALF_OPEN)
+            self.assertFalse(breaker.allow_request())
+
+            breaker.record_failure()
+            self.assertEqual(breaker.state, OPEN)
+
+        with mock.patch('utils.circuit_breaker.time.monotonic', return_value=time.monotonic() + 62):
+            self.assertTrue(breaker.allow_request())
+            breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_backoff_is_jittered_and_capped(self):
+        delays = [backoff_delay(attempt, 1.0, 5.0) for attempt in range(1, 8) for _ in range(20)]
+        self.assertTrue(all(0 <= delay <= 5.0 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+        self.assertTrue(all(backoff_delay(1, 1.0, 5.0) <= 1.0 for _ in range(20)))
+
+class TestDeadline(unittest.TestCase):
+    def test_cap_and_reserve(self):
+        deadline = Deadline(10)
+        self.assertEqual(deadline.cap(3), 3)
+        self.assertLessEqual(deadline.cap(60), 10)
+        self.assertLessEqual(deadline.reserve(4).remaining(), 6)
+        self.assertTrue(deadline.reserve(11).expired())
+        self.assertEqual(cap_timeout(None, 30), 30)
+
+    def test_expired_deadline_raises(self):
+        with self.assertRaises(DeadlineExceeded):
+            Deadline(0).cap(5)
+
+if __name__ == '__main__':
+    unittest.main()
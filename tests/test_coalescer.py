@@ -0,0 +1,93 @@
+# File: tests/test_coalescer.py
+
+import unittest
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.coalescer import AuditCoalescer, flight_key
+
+class TestAuditCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'coalescer.db')
+        self.coalescer = AuditCoalescer(self.db_path, lease_seconds=30, result_ttl=60, poll_interval=0.02)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_concurrently(self, count, compute, key='free:https://a.example/'):
+        results = [None] * count
+
+        def worker(index):
+            results[index] = self.coalescer.run(key, compute, wait_timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_callers_share_one_computation(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.3)
+            return {'success': True, 'score': 61}
+
+        results = self.run_concurrently(5, compute)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result == {'success': True, 'score': 61} for result, _ in results))
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+        self.assertEqual(self.coalescer.get_stats()['in_flight'], 0)
+
+        # A later caller starts a new flight instead of reusing the finished one
+        self.coalescer.run('free:https://a.example/', compute, wait_timeout=5)
+        self.assertEqual(len(calls), 2)
+
+    def test_waiting_caller_takes_over_when_the_owner_raises(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            if len(calls) == 1:
+                raise RuntimeError('scrape crashed')
+            return {'success': True}
+
+        results = []
+
+        def owner():
+            with self.assertRaises(RuntimeError):
+                self.coalescer.run('k', compute, wait_timeout=5)
+
+        thread = threading.Thread(target=owner)
+        thread.start()
+        time.sleep(0.05)
+        results.append(self.coalescer.run('k', compute, wait_timeout=5))
+        thread.join()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(results, [({'success': True}, False)])
+
+    def test_expired_lease_is_taken_over(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('INSERT INTO audit_flights VALUES (?, ?, ?, ?, ?)',
+                         ('k', 'dead-owner', 1, time.time() - 100, time.time() - 1))
+        result, shared = self.coalescer.run('k', lambda: {'success': True}, wait_timeout=1)
+        self.assertEqual((result, shared), ({'success': True}, False))
+
+    def test_keys_normalize_the_url(self):
+        self.assertEqual(flight_key('free', 'HTTPS://A.example:443/#top'), flight_key('free', 'https://a.example/'))
+        self.assertNotEqual(flight_key('free', 'https://a.example'), flight_key('premium', 'https://a.example'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+# File: tests/test_concurrency_limiter.py
+
+import unittest
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.concurrency_limiter import ConcurrencyLimiter, CapacityExceeded
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'admission.db')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def limiter(self, **kwargs):
+        options = {'max_concurrent': 2, 'max_waiting': 10, 'wait_timeout': 5, 'poll_interval': 0.01}
+        options.update(kwargs)
+        return ConcurrencyLimiter(self.db_path, **options)
+
+    def test_never_more_than_max_concurrent(self):
+        limiter = self.limiter()
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def audit():
+            with limiter.slot():
+                with lock:
+                    running[0] += 1
+                    peak[0] = max(peak[0], running[0])
+                time.sleep(0.05)
+                with lock:
+                    running[0] -= 1
+
+        threads = [threading.Thread(target=audit) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(peak[0], 2)
+        stats = limiter.get_stats()
+        self.assertEqual((stats['running'], stats['waiting'], stats['admitted_last_hour']), (0, 0, 6))
+        self.assertGreater(stats['max_wait_seconds'], 0)
+
+    def test_full_wait_queue_is_rejected_at_once(self):
+        limiter = self.limiter(max_concurrent=1, max_waiting=1)
+        release = threading.Event()
+        waiter_admitted = threading.Event()
+
+        def hold():
+            with limiter.slot():
+                release.wait(5)
+
+        def wait():
+            with limiter.slot():
+                waiter_admitted.set()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        time.sleep(0.05)
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.05)
+
+        started = time.monotonic()
+        with self.assertRaises(CapacityExceeded):
+            with limiter.slot():
+                pass
+        self.assertLess(time.monotonic() - started, 0.5)
+
+        release.set()
+        holder.join()
+        waiter.join()
+        self.assertTrue(waiter_admitted.is_set())
+
+    def test_waiters_give_up_after_the_timeout(self):
+        limiter = self.limiter(max_concurrent=1)
+        with limiter.slot():
+            with self.assertRaises(CapacityExceeded):
+                with limiter.slot(wait_timeout=0.1):
+                    pass
+            self.assertEqual(limiter.get_stats()['waiting'], 0)
+
+    def test_waiters_are_admitted_in_arrival_order(self):
+        limiter = self.limiter(max_concurrent=1)
+        order = []
+        release = threading.Event()
+
+        def hold():
+            with limiter.slot():
+                release.wait(5)
+
+        def wait(name):
+            with limiter.slot():
+                order.append(name)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        time.sleep(0.05)
+        waiters = []
+        for name in ('first', 'second', 'third'):
+            waiters.append(threading.Thread(target=wait, args=(name,)))
+            waiters[-1].start()
+            time.sleep(0.05)
+        release.set()
+        for thread in [holder] + waiters:
+            thread.join()
+
+        self.assertEqual(order, ['first', 'second', 'third'])
+
+    def test_slots_of_dead_processes_expire(self):
+        limiter = self.limiter(max_concurrent=1, slot_lease_seconds=60)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO limiter_slots (holder_id, state, owner_pid, enqueued_at, lease_expires) "
+                         "VALUES ('dead', 'active', 1, ?, ?)", (time.time() - 120, time.time() - 1))
+        conn.close()
+
+        with limiter.slot(wait_timeout=0):
+            self.assertEqual(limiter.get_stats()['running'], 1)
+
+    def test_disabled_limiter_admits_everyone(self):
+        limiter = self.limiter(max_concurrent=1, max_waiting=0, enabled=False)
+        with limiter.slot():
+            with limiter.slot():
+                pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+# File: tests/test_http_client.py
+
+import unittest
+import os
+import sys
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import http_client
+
+class TestHttpClient(unittest.TestCase):
+    def test_session_is_shared_within_a_process(self):
+        self.assertIs(http_client.get_session(), http_client.get_session())
+
+    def test_session_is_rebuilt_after_fork(self):
+        session = http_client.get_session()
+        with mock.patch('services.http_client.os.getpid', return_value=-1):
+            self.assertIsNot(http_client.get_session(), session)
+
+    def test_adapter_pool_and_retry_configuration(self):
+        adapter = http_client.get_session().get_adapter('https://api.resend.com')
+        self.assertEqual(adapter._pool_maxsize, http_client.HTTP_POOL_MAXSIZE)
+        self.assertNotIn('POST', adapter.max_retries.allowed_methods)
+
+    def test_retry_after_sleep_is_capped(self):
+        retry = http_client.get_session().get_adapter('https://example.com').max_retries
+        response = mock.Mock()
+        response.headers = {'Retry-After': '86400'}
+        with mock.patch('urllib3.util.retry.time.sleep') as sleep:
+            # Retry.new() must keep the cap for later attempts
+            self.assertTrue(retry.new().sleep_for_retry(response))
+        sleep.assert_called_once_with(http_client.HTTP_RETRY_MAX_SLEEP)
+
+    def test_cookies_are_not_stored(self):
+        session = http_client._build_session()
+        self.assertTrue(session.cookies.get_policy().is_not_allowed('example.com'))
+
+if __name__ == '__main__':
+    unittest.main()
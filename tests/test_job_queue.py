@@ -0,0 +1,222 @@
+# File: tests/test_job_queue.py
+
+import unittest
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import audit_worker
+from services.audit_worker import AuditWorker
+from services.job_queue import JobQueue, QueueFullError
+from utils.concurrency_limiter import CapacityExceeded
+
+PAYLOAD = {'url': 'https://a.example', 'email': 'a@example.com'}
+
+class JobQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'jobs.db')
+        self.queue = JobQueue(self.db_path, lease_seconds=30, max_attempts=2)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def expire_lease(self, job_id):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('UPDATE audit_jobs SET lease_expires = ? WHERE job_id = ?', (time.time() - 1, job_id))
+
+class TestJobQueue(JobQueueTestCase):
+    def test_jobs_are_claimed_once_in_order(self):
+        first = self.queue.enqueue('free', PAYLOAD)
+        second = self.queue.enqueue('premium', PAYLOAD)
+
+        claimed = []
+        threads = [threading.Thread(target=lambda n=n: claimed.append(self.queue.claim(f'w{n}'))) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        jobs = [job for job in claimed if job is not None]
+        self.assertEqual(sorted(job['job_id'] for job in jobs), sorted([first, second]))
+        self.assertEqual(self.queue.get(first)['status'], 'running')
+        self.assertEqual(self.queue.get(first)['payload'], PAYLOAD)
+
+    def test_only_the_lease_holder_can_finish(self):
+        job_id = self.queue.enqueue('free', PAYLOAD)
+        self.queue.claim('w1')
+        self.assertFalse(self.queue.heartbeat(job_id, 'w2'))
+        self.assertFalse(self.queue.complete(job_id, 'w2', {'success': True}))
+        self.assertTrue(self.queue.heartbeat(job_id, 'w1', {'sections_ready': ['executive_summary']}))
+        self.assertEqual(self.queue.get(job_id)['progress'], {'sections_ready': ['executive_summary']})
+
+        self.assertTrue(self.queue.complete(job_id, 'w1', {'success': True, 'score': 70}))
+        job = self.queue.get(job_id)
+        self.assertEqual((job['status'], job['result']), ('succeeded', {'success': True, 'score': 70}))
+        self.assertIsNone(self.queue.claim('w1'))
+
+    def test_lapsed_jobs_are_rerun_until_attempts_run_out(self):
+        job_id = self.queue.enqueue('free', PAYLOAD)
+        self.queue.claim('w1')
+        self.expire_lease(job_id)
+
+        rerun = self.queue.claim('w2')
+        self.assertEqual((rerun['job_id'], rerun['attempts']), (job_id, 2))
+        # The first worker's late result no longer counts
+        self.assertFalse(self.queue.complete(job_id, 'w1', {'success': True}))
+
+        self.expire_lease(job_id)
+        self.assertIsNone(self.queue.claim('w3'))
+        job = self.queue.get(job_id)
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('stopped', job['error'])
+
+    def test_failed_runs_are_retried_then_failed(self):
+        job_id = self.queue.enqueue('free', PAYLOAD)
+        self.queue.claim('w1')
+        self.assertTrue(self.queue.fail(job_id, 'w1', 'boom', retry=True))
+        self.assertEqual(self.queue.get(job_id)['status'], 'queued')
+
+        self.queue.claim('w1')
+        self.queue.fail(job_id, 'w1', 'boom again', retry=True)
+        job = self.queue.get(job_id)
+        self.assertEqual((job['status'], job['error']), ('failed', 'boom again'))
+        self.assertEqual(self.queue.get_stats()['failed'], 1)
+
+class TestScheduling(JobQueueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.queue = JobQueue(self.db_path, lease_seconds=30, max_attempts=2, classes={
+            'premium': {'priority': 0, 'deadline_seconds': 3600, 'max_running': None,
+                        'max_queued': None, 'sheddable': False},
+            'free': {'priority': 1, 'deadline_seconds': 600, 'max_running': 1,
+                     'max_queued': 2, 'sheddable': True}
+        })
+
+    def set_deadline(self, job_id, deadline_at):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('UPDATE audit_jobs SET deadline_at = ? WHERE job_id = ?', (deadline_at, job_id))
+
+    def test_premium_first_then_earliest_deadline(self):
+        free = self.queue.enqueue('free', PAYLOAD)
+        late = self.queue.enqueue('premium', PAYLOAD)
+        early = self.queue.enqueue('premium', PAYLOAD)
+        self.set_deadline(early, time.time() + 60)
+
+        claimed = [self.queue.claim('w1')['job_id'] for _ in range(3)]
+        self.assertEqual(claimed, [early, late, free])
+
+    def test_free_jobs_respect_their_running_cap(self):
+        first = self.queue.enqueue('free', PAYLOAD)
+        self.queue.enqueue('free', PAYLOAD)
+        self.assertEqual(self.queue.claim('w1')['job_id'], first)
+        self.assertIsNone(self.queue.claim('w2'))
+
+        premium = self.queue.enqueue('premium', PAYLOAD)
+        self.assertEqual(self.queue.claim('w2')['job_id'], premium)
+        # A free slot opens once the running free job finishes
+        self.queue.complete(first, 'w1', {'success': True})
+        self.assertIsNotNone(self.queue.claim('w1'))
+
+    def test_free_jobs_are_shed_past_deadline_and_over_depth(self):
+        expired = self.queue.enqueue('free', PAYLOAD)
+        self.queue.enqueue('free', PAYLOAD)
+        with self.assertRaises(QueueFullError):
+            self.queue.enqueue('free', PAYLOAD)
+        # Premium orders are never refused or shed
+        premium = self.queue.enqueue('premium', PAYLOAD)
+        self.set_deadline(premium, time.time() - 1)
+
+        self.set_deadline(expired, time.time() - 1)
+        self.assertEqual(self.queue.claim('w1')['job_id'], premium)
+        job = self.queue.get(expired)
+        self.assertEqual(job['status'], 'shed')
+        self.assertIn('busy', job['error'])
+        self.queue.enqueue('free', PAYLOAD)
+
+    def test_stats_per_class(self):
+        self.queue.enqueue('free', PAYLOAD)
+        overdue = self.queue.enqueue('free', PAYLOAD)
+        self.queue.enqueue('premium', PAYLOAD)
+        self.queue.claim('w1')
+        self.set_deadline(overdue, time.time() - 1)
+
+        stats = self.queue.get_stats()
+        self.assertEqual((stats['queued'], stats['running']), (2, 1))
+        self.assertEqual(stats['classes']['premium']['running'], 1)
+        self.assertIsNotNone(stats['classes']['premium']['mean_wait_seconds'])
+        self.assertEqual(stats['classes']['free']['queued'], 2)
+        self.assertEqual(stats['classes']['free']['overdue_queued'], 1)
+        self.assertIsNone(stats['classes']['free']['max_wait_seconds'])
+
+    def test_existing_queues_gain_the_scheduling_columns(self):
+        legacy_path = os.path.join(self.tmp_dir.name, 'legacy.db')
+        with sqlite3.connect(legacy_path) as conn:
+            conn.execute('''CREATE TABLE audit_jobs (job_id TEXT PRIMARY KEY, audit_type TEXT NOT NULL,
+                payload TEXT NOT NULL, status TEXT NOT NULL, progress TEXT DEFAULT '{}', result TEXT, error TEXT,
+                attempts INTEGER DEFAULT 0, worker_id TEXT, lease_expires REAL, created_at REAL NOT NULL,
+                started_at REAL, finished_at REAL)''')
+            conn.execute("INSERT INTO audit_jobs (job_id, audit_type, payload, status, created_at) "
+                         "VALUES ('old', 'premium', '{}', 'queued', ?)", (time.time(),))
+        conn.close()
+
+        queue = JobQueue(legacy_path)
+        self.assertEqual(queue.claim('w1')['job_id'], 'old')
+
+class TestAuditWorker(JobQueueTestCase):
+    def test_worker_runs_a_job_and_reports_progress(self):
+        job_id = self.queue.enqueue('free', PAYLOAD)
+        progress_seen = []
+
+        def fake_audit(url, email, bypass_cache=False, on_section=None, run_id=None):
+            # A re-run of the job resumes the same audit run
+            self.assertEqual(run_id, job_id)
+            on_section('executive_summary', {})
+            time.sleep(0.2)
+            progress_seen.append(self.queue.get(job_id)['progress'])
+            return {'success': True, 'score': 64}
+
+        auditor = mock.Mock()
+        auditor.run_full_audit.side_effect = fake_audit
+        worker = AuditWorker(self.queue, 'w1', auditor)
+        with mock.patch.object(audit_worker, 'cache') as cache:
+            worker.process(self.queue.claim('w1'))
+
+        job = self.queue.get(job_id)
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['result']['score'], 64)
+        self.assertEqual(job['result']['audit_type'], 'free')
+        self.assertEqual(progress_seen[0]['sections_ready'], ['executive_summary'])
+        cache.set.assert_called_once()
+
+    def test_audit_failures_are_final_and_exceptions_retry(self):
+        job_id = self.queue.enqueue('free', PAYLOAD)
+        auditor = mock.Mock()
+        auditor.run_full_audit.side_effect = [RuntimeError('worker bug'), {'success': False, 'error': 'Unreachable'}]
+        worker = AuditWorker(self.queue, 'w1', auditor)
+
+        worker.process(self.queue.claim('w1'))
+        self.assertEqual(self.queue.get(job_id)['status'], 'queued')
+        worker.process(self.queue.claim('w1'))
+        job = self.queue.get(job_id)
+        self.assertEqual((job['status'], job['error']), ('failed', 'Unreachable'))
+
+    def test_jobs_without_an_admission_slot_go_back_without_an_attempt(self):
+        job_id = self.queue.enqueue('free', PAYLOAD)
+        auditor = mock.Mock()
+        auditor.run_full_audit.side_effect = CapacityExceeded('busy')
+        worker = AuditWorker(self.queue, 'w1', auditor)
+
+        worker.process(self.queue.claim('w1'))
+        job = self.queue.get(job_id)
+        self.assertEqual((job['status'], job['attempts']), ('queued', 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+# File: tests/test_json_repair.py
+
+import unittest
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.json_repair import parse_llm_json
+
+class TestParseLLMJson(unittest.TestCase):
+    def test_valid_json_is_parsed_unchanged(self):
+        self.assertEqual(parse_llm_json('{"a": [1, {"b": null}]}'), {'a': [1, {'b': None}]})
+
+    def test_fences_prose_and_trailing_commas(self):
+        text = 'Here is the audit:\n```json\n{"a": [1, 2,], "b": {"c": "x, }"},}\n```\nLet me know!'
+        self.assertEqual(parse_llm_json(text), {'a': [1, 2], 'b': {'c': 'x, }'}})
+
+    def test_python_literals_and_comments(self):
+        text = '{"a": True, "b": None, // note\n "c": "True // kept"}'
+        self.assertEqual(parse_llm_json(text), {'a': True, 'b': None, 'c': 'True // kept'})
+
+    def test_truncated_output_is_closed(self):
+        self.assertEqual(parse_llm_json('{"a": {"b": [1, 2'), {'a': {'b': [1, 2]}})
+        self.assertEqual(parse_llm_json('{"a": 1, "b": "cut off mid'), {'a': 1, 'b': 'cut off mid'})
+        self.assertEqual(parse_llm_json('{"a": 1, "b":'), {'a': 1})
+        self.assertEqual(parse_llm_json('{"a": 1, "bc'), {'a': 1})
+
+    def test_complete_members_are_salvaged(self):
+        self.assertEqual(parse_llm_json('{"a": {"x": 1}, "b": tru'), {'a': {'x': 1}})
+
+    def test_unrepairable_output_raises(self):
+        for text in ('', 'no json here', None):
+            with self.assertRaises(ValueError):
+                parse_llm_json(text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+# File: tests/test_json_stream.py
+
+import unittest
+import os
+import sys
+import json
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.json_stream import ObjectStreamParser
+
+class TestObjectStreamParser(unittest.TestCase):
+    def feed_all(self, text, size):
+        parser = ObjectStreamParser()
+        members = []
+        for i in range(0, len(text), size):
+            members.append(parser.feed(text[i:i + size]))
+        return members
+
+    def test_members_are_emitted_as_soon_as_complete(self):
+        document = {'first': {'a': [1, 2, {'b': 'x}'}]}, 'second': 'text, with "quotes" and {braces}', 'third': 3}
+        text = json.dumps(document)
+        batches = self.feed_all(text, 1)
+        emitted = [member for batch in batches for member in batch]
+        self.assertEqual(dict(emitted), document)
+
+        # 'first' is complete at the comma after it, long before the closing brace
+        first_index = next(i for i, batch in enumerate(batches) if batch)
+        self.assertEqual(batches[first_index], [('first', document['first'])])
+        self.assertLess(first_index, len(text) // 2)
+
+    def test_text_around_the_object_is_ignored(self):
+        text = 'Here you go:\n```json\n{"a": 1, "b": [true, null]}\n```'
+        emitted = [member for batch in self.feed_all(text, 4) for member in batch]
+        self.assertEqual(emitted, [('a', 1), ('b', [True, None])])
+
+    def test_escaped_quotes_do_not_end_strings(self):
+        text = json.dumps({'a': 'say \\"hi\\", then {leave}', 'b': 2})
+        emitted = [member for batch in self.feed_all(text, 5) for member in batch]
+        self.assertEqual(dict(emitted), json.loads(text))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# File: tests/test_llm_cache.py
+
+import unittest
+import os
+import sys
+import tempfile
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_cache import LLMCache, make_key
+from services import ai_service
+from utils import async_runner
+
+class LLMCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = LLMCache(os.path.join(self.tmp_dir.name, 'llm.db'), ttl=60, max_entries=2)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+class TestLLMCache(LLMCacheTestCase):
+    def test_key_covers_model_prompts_and_params(self):
+        base = make_key('gpt-4', 'sys', 'user', {'temperature': 0.7})
+        self.assertEqual(base, make_key('gpt-4', 'sys', 'user', {'temperature': 0.7}))
+        self.assertNotEqual(base, make_key('openai/gpt-4', 'sys', 'user', {'temperature': 0.7}))
+        self.assertNotEqual(base, make_key('gpt-4', 'sys', 'user!', {'temperature': 0.7}))
+        self.assertNotEqual(base, make_key('gpt-4', 'sys', 'user', {'temperature': 0.2}))
+
+    def test_hits_misses_and_lru_eviction(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('a', '{"n": 1}')
+        self.cache.set('b', '{"n": 2}')
+        self.assertEqual(self.cache.get('a'), '{"n": 1}')
+        self.cache.set('c', '{"n": 3}')
+
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+        stats = self.cache.get_cache_stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses'], stats['evictions']), (2, 2, 2, 1))
+
+    def test_entries_expire(self):
+        self.cache.ttl = -1
+        self.cache.set('a', '{}')
+        self.assertIsNone(self.cache.get('a'))
+
+class TestCachedChatCompletion(LLMCacheTestCase):
+    def complete(self, model, send, bypass_cache=False):
+        with mock.patch.object(ai_service, 'llm_cache', self.cache), \
+             mock.patch.object(ai_service, 'ENABLE_LLM_CACHE', True):
+            return async_runner.run(
+                ai_service.cached_chat_completion_async(model, 'sys', 'prompt', {}, send, bypass_cache), timeout=5)
+
+    def answer(self, model, content):
+        calls = []
+
+        async def send():
+            calls.append(model)
+            return model, content
+        return send, calls
+
+    def test_identical_requests_are_sent_once(self):
+        send, calls = self.answer('gpt-4', '{"overall_score": 80}')
+        first = self.complete('gpt-4', send)
+        second = self.complete('gpt-4', send)
+        self.complete('gpt-4', send, bypass_cache=True)
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 2)
+
+    def test_unparseable_responses_are_not_cached(self):
+        send, _ = self.answer('gpt-4', 'not json')
+        with self.assertRaises(ValueError):
+            self.complete('gpt-4', send)
+        self.assertEqual(self.cache.get_cache_stats()['entries'], 0)
+
+    def test_hedged_answers_are_cached_under_the_model_that_answered(self):
+        hedge, _ = self.answer('openai/gpt-4', '{"ok": true}')
+        self.assertEqual(self.complete('gpt-4', hedge), {'ok': True})
+
+        send, calls = self.answer('gpt-4', '{"ok": false}')
+        self.assertEqual(self.complete('gpt-4', send), {'ok': False})
+        self.assertEqual(self.complete('openai/gpt-4', send), {'ok': True})
+        self.assertEqual(calls, ['gpt-4'])
+
+if __name__ == '__main__':
+    unittest.main()
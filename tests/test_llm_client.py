@@ -0,0 +1,164 @@
+# File: tests/test_llm_client.py
+
+import unittest
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_client import LLMClient, LLMError
+from services import llm_client
+from utils import async_runner, circuit_breaker
+from utils.metrics import metrics
+
+class ChatHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    status = 200
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with ChatHandler.lock:
+            ChatHandler.active += 1
+            ChatHandler.peak = max(ChatHandler.peak, ChatHandler.active)
+        time.sleep(ChatHandler.delay)
+        with ChatHandler.lock:
+            ChatHandler.active -= 1
+
+        if ChatHandler.status == 200 and request.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            content = f"{request['model']}:{request['messages'][-1]['content']}"
+            for i in range(0, len(content), 3):
+                chunk = {'choices': [{'delta': {'content': content[i:i + 3]}}]}
+                self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+                self.wfile.flush()
+            usage = {'choices': [], 'usage': {'prompt_tokens': 12, 'completion_tokens': 5}}
+            self.wfile.write(f'data: {json.dumps(usage)}\n\n'.encode())
+            self.wfile.write(b'data: [DONE]\n\n')
+            return
+
+        if ChatHandler.status != 200:
+            payload = b'{"error": "overloaded"}'
+            self.send_response(ChatHandler.status)
+        else:
+            content = f"{request['model']}:{request['messages'][-1]['content']}"
+            payload = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': content}}],
+                                  'usage': {'prompt_tokens': 12, 'completion_tokens': 5}}).encode()
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+class TestLLMClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), ChatHandler)
+        base_url = f'http://127.0.0.1:{cls.server.server_address[1]}/v1'
+        cls.providers = {
+            'openai': {'base_url': base_url, 'api_key': 'sk-test', 'max_concurrency': 2},
+            'openrouter': {'base_url': base_url, 'api_key': '', 'max_concurrency': 2}
+        }
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        ChatHandler.delay, ChatHandler.status, ChatHandler.peak = 0.0, 200, 0
+        circuit_breaker._breakers.clear()
+
+    def run_with_client(self, make_coro):
+        async def scenario():
+            client = LLMClient(self.providers)
+            try:
+                return await make_coro(client)
+            finally:
+                await client.close()
+        return async_runner.run(scenario(), timeout=10)
+
+    def messages(self, text):
+        return [{'role': 'user', 'content': text}]
+
+    def test_chat_completion_returns_content(self):
+        content = self.run_with_client(lambda client: client.chat_completion('openai', 'gpt-4', self.messages('hi')))
+        self.assertEqual(content, 'gpt-4:hi')
+
+    def test_streamed_completion_reports_deltas(self):
+        deltas = []
+        content = self.run_with_client(lambda client: client.chat_completion(
+            'openai', 'gpt-4', self.messages('streamed text'), on_delta=deltas.append))
+        self.assertEqual(content, 'gpt-4:streamed text')
+        self.assertGreater(len(deltas), 1)
+        self.assertEqual(''.join(deltas), content)
+
+    def test_token_usage_is_recorded(self):
+        metrics.reset()
+        self.run_with_client(lambda client: client.chat_completion('openai', 'gpt-4', self.messages('hi')))
+        usages = []
+        self.run_with_client(lambda client: client.chat_completion('openai', 'gpt-4', self.messages('hi'),
+                                                                  on_delta=lambda text: None, on_usage=usages.append))
+        self.assertEqual(usages, [{'prompt_tokens': 12, 'completion_tokens': 5}])
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['llm_prompt_tokens'], 24)
+        self.assertEqual(counters['llm_completion_tokens'], 10)
+        self.assertGreater(counters['llm_estimated_prompt_tokens'], 0)
+
+    def test_oversized_prompt_is_rejected_before_sending(self):
+        with self.assertRaises(LLMError) as ctx:
+            self.run_with_client(lambda client: client.chat_completion('openai', 'gpt-4', self.messages('word ' * 40000)))
+        self.assertFalse(ctx.exception.retryable)
+        self.assertIn('context window', str(ctx.exception))
+
+    def test_per_provider_concurrency_limit(self):
+        ChatHandler.delay = 0.1
+        results = self.run_with_client(lambda client: asyncio.gather(*(
+            client.chat_completion('openai', 'gpt-4', self.messages(str(i))) for i in range(6)
+        )))
+        self.assertEqual(len(results), 6)
+        self.assertEqual(ChatHandler.peak, 2)
+
+    def test_errors_are_classified(self):
+        ChatHandler.status = 503
+        with self.assertRaises(LLMError) as ctx:
+            self.run_with_client(lambda client: client.chat_completion('openai', 'gpt-4', self.messages('x')))
+        self.assertTrue(ctx.exception.retryable)
+        self.assertEqual(ctx.exception.status, 503)
+
+        with self.assertRaises(LLMError) as ctx:
+            self.run_with_client(lambda client: client.chat_completion('openrouter', 'gpt-4', self.messages('x')))
+        self.assertFalse(ctx.exception.retryable)
+
+    def test_circuit_opens_after_repeated_outages(self):
+        ChatHandler.status = 503
+        breaker = circuit_breaker.get_breaker('openai')
+        for _ in range(breaker.failure_threshold):
+            with self.assertRaises(LLMError):
+                self.run_with_client(lambda client: client.chat_completion('openai', 'gpt-4', self.messages('x')))
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+
+        # With the circuit open the call fails at once, without reaching the provider
+        ChatHandler.status, ChatHandler.delay = 200, 1.0
+        started = time.time()
+        with self.assertRaises(LLMError) as ctx:
+            self.run_with_client(lambda client: client.chat_completion('openai', 'gpt-4', self.messages('x')))
+        self.assertFalse(ctx.exception.retryable)
+        self.assertLess(time.time() - started, 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# File: tests/test_model_routing.py
+
+import unittest
+import os
+import sys
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import model_routing
+from services.analysis_sections import SECTIONS, SECTIONS_BY_NAME
+from services.model_routing import get_route, planned_sections, section_max_tokens, UsageTotals, record_analysis
+from services.token_budget import estimate_cost
+from utils.metrics import metrics
+
+ROUTING = {
+    'free': {
+        'providers': [['openai', 'gpt-4o-mini']],
+        'max_tokens': 400,
+        'sections': ['executive_summary', 'critical_issues'],
+        'section_overrides': {'critical_issues': {'max_tokens': 600}},
+        'latency_target': 30
+    },
+    'premium': {'providers': [['openai', 'gpt-4']]}
+}
+
+class TestModelRouting(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(model_routing, 'AI_MODEL_ROUTING', ROUTING)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_tiers_resolve_with_defaults(self):
+        free = get_route('free')
+        self.assertEqual(free['tier'], 'free')
+        self.assertEqual(free['providers'], [('openai', 'gpt-4o-mini')])
+        self.assertEqual(free['content_tokens'], model_routing.DEFAULT_ROUTE['content_tokens'])
+
+        premium = get_route('premium')
+        self.assertIsNone(premium['sections'])
+        self.assertEqual(get_route('enterprise')['tier'], 'premium')
+        self.assertEqual(get_route(None)['providers'], [('openai', 'gpt-4')])
+
+    def test_sections_and_token_limits(self):
+        free = get_route('free')
+        self.assertEqual([section['name'] for section in planned_sections(free)], ['executive_summary', 'critical_issues'])
+        self.assertEqual(len(planned_sections(get_route('premium'))), len(SECTIONS))
+
+        self.assertEqual(section_max_tokens(free, SECTIONS_BY_NAME['critical_issues']), 600)
+        self.assertEqual(section_max_tokens(free, SECTIONS_BY_NAME['executive_summary']), 400)
+        next_steps = SECTIONS_BY_NAME['next_steps']
+        self.assertEqual(section_max_tokens(get_route('premium'), next_steps), next_steps['max_tokens'])
+
+    def test_cost_and_latency_are_reported_per_tier(self):
+        self.assertAlmostEqual(estimate_cost('openai/gpt-4', 1000, 1000), 0.09)
+        self.assertEqual(estimate_cost('unknown-model', 1000, 1000), 0.0)
+
+        usage = UsageTotals()
+        usage.add('gpt-4o-mini', {'prompt_tokens': 2000, 'completion_tokens': 1000})
+        metrics.reset()
+        record_analysis(get_route('free'), 45.0, usage)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['counters']['ai_tokens.free'], 3000)
+        self.assertEqual(snapshot['counters']['ai_latency_target_missed.free'], 1)
+        self.assertEqual(snapshot['histograms']['ai_analysis_seconds.free']['max'], 45.0)
+        self.assertAlmostEqual(snapshot['histograms']['ai_cost_cents.free']['max'], 0.09)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# File: tests/test_provider_router.py
+
+import unittest
+import os
+import sys
+import asyncio
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import provider_router
+from services.provider_router import LatencyTracker, HedgeBudget
+from services.llm_client import LLMError
+from utils import async_runner, circuit_breaker
+
+PRIMARY = ('openai', 'gpt-4')
+SECONDARY = ('openrouter', 'openai/gpt-4')
+
+def answer(content, delay=0.0, error=None):
+    async def send():
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return content
+    return send
+
+class TestProviderRouter(unittest.TestCase):
+    def setUp(self):
+        provider_router._trackers.clear()
+        circuit_breaker._breakers.clear()
+        self.patches = [
+            mock.patch.object(provider_router, 'budget', HedgeBudget(100)),
+            mock.patch.object(provider_router, 'HEDGE_DEFAULT_DELAY', 0.1)
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def hedged(self, send_primary, send_secondary):
+        return async_runner.run(provider_router.hedged(PRIMARY, send_primary, SECONDARY, send_secondary), timeout=5)
+
+    def test_latency_tracker_percentiles(self):
+        tracker = LatencyTracker(window=100)
+        for seconds in range(1, 101):
+            tracker.record(seconds)
+        self.assertEqual(tracker.percentile(50), 51)
+        self.assertEqual(tracker.percentile(95), 96)
+        self.assertGreater(tracker.ewma, 90)
+
+    def test_rank_prefers_fastest_and_skips_open_circuits(self):
+        provider_router.get_tracker(*PRIMARY).record(20)
+        provider_router.get_tracker(*SECONDARY).record(5)
+        self.assertEqual(provider_router.rank([PRIMARY, SECONDARY]), [SECONDARY, PRIMARY])
+
+        breaker = circuit_breaker.get_breaker('openrouter')
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        self.assertEqual(provider_router.rank([PRIMARY, SECONDARY]), [PRIMARY, SECONDARY])
+
+    def test_hedge_fires_after_delay_and_fastest_answer_wins(self):
+        self.assertEqual(self.hedged(answer('primary', delay=1.0), answer('secondary', delay=0.05)), 'secondary')
+        self.assertEqual(provider_router.budget.hedges, 1)
+        self.assertEqual(len(provider_router.get_tracker(*PRIMARY).samples), 1)
+
+    def test_fast_primary_is_not_hedged(self):
+        self.assertEqual(self.hedged(answer('primary', delay=0.01), answer('secondary')), 'primary')
+        self.assertEqual(provider_router.budget.hedges, 0)
+
+    def test_hedges_are_limited_by_budget(self):
+        with mock.patch.object(provider_router, 'budget', HedgeBudget(0)):
+            self.assertEqual(self.hedged(answer('primary', delay=0.3), answer('secondary')), 'primary')
+            self.assertEqual(provider_router.budget.hedges, 0)
+
+    def test_primary_error_before_hedge_is_raised(self):
+        with self.assertRaises(LLMError):
+            self.hedged(answer('', error=LLMError('down', 'openai', status=503, retryable=True)), answer('secondary'))
+
+    def test_hedge_result_used_when_primary_fails_after_hedging(self):
+        primary = answer('', delay=0.2, error=LLMError('down', 'openai', status=503, retryable=True))
+        self.assertEqual(self.hedged(primary, answer('secondary', delay=0.3)), 'secondary')
+
+    def test_cancelled_hedges_do_not_make_a_provider_look_faster(self):
+        provider_router.get_tracker(*PRIMARY).record(0.15)
+        provider_router.get_tracker(*SECONDARY).record(0.3)
+        for _ in range(6):
+            # The hedge fires at 0.1s and loses the race 0.05s later
+            self.assertEqual(self.hedged(answer('primary', delay=0.15), answer('secondary', delay=1.0)), 'primary')
+
+        self.assertEqual(provider_router.budget.hedges, 6)
+        self.assertEqual(provider_router.get_tracker(*SECONDARY).ewma, 0.3)
+        self.assertEqual(provider_router.rank([PRIMARY, SECONDARY]), [PRIMARY, SECONDARY])
+
+    def test_immediate_rejections_are_not_recorded(self):
+        with self.assertRaises(LLMError):
+            self.hedged(answer('', error=LLMError('no key', 'openai')), answer('secondary'))
+        self.assertEqual(len(provider_router.get_tracker(*PRIMARY).samples), 0)
+
+if __name__ == '__main__':
+    unittest.main()
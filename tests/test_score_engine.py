@@ -0,0 +1,79 @@
+# File: tests/test_score_engine.py
+
+import unittest
+import os
+import sys
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import score_engine
+from services.score_engine import score_website, apply_scores, add_rule
+
+STRONG_PAGE = {
+    'url': 'https://shop.example', 'ssl_certificate': True,
+    'title': 'Handmade Leather Bags and Wallets | Shop Example',
+    'meta_description': 'Handmade leather bags, wallets and belts crafted in small batches and shipped worldwide with free returns.',
+    'canonical_url': 'https://shop.example/', 'open_graph': {'title': 'Shop Example'},
+    'h1_tags': ['Handmade leather goods'],
+    'h2_tags': ['Why choose full-grain leather?', 'How are our bags made?', 'Shipping'],
+    'h3_tags': [], 'images': 4, 'images_without_alt': 0, 'internal_links': 20, 'external_links': 2,
+    'has_schema': True, 'schema_types': ['Organization', 'WebSite', 'FAQPage', 'BreadcrumbList'],
+    'content_length': 4000
+}
+
+class TestScoreEngine(unittest.TestCase):
+    def test_strong_page_scores_high_with_no_issues(self):
+        scores = score_website(STRONG_PAGE)
+        self.assertEqual(scores['overall_score'], 100)
+        self.assertEqual(scores['critical_issues'], [])
+
+    def test_empty_page_scores_low_and_lists_issues_by_priority(self):
+        scores = score_website({'url': 'http://bare.example'})
+        self.assertLess(scores['overall_score'], 20)
+        priorities = [issue['priority_score'] for issue in scores['critical_issues']]
+        self.assertEqual(priorities, sorted(priorities, reverse=True))
+        self.assertIn('structured_data_present', [issue['rule_id'] for issue in scores['critical_issues']])
+
+    def test_scores_are_deterministic_integers(self):
+        page = dict(STRONG_PAGE, images_without_alt=3, has_schema=False, schema_types=[])
+        first, second = score_website(page), score_website(page)
+        self.assertEqual(first, second)
+        self.assertTrue(all(isinstance(score, int) for score in first['category_scores'].values()))
+        self.assertLess(first['category_scores']['schema_markup'], 10)
+
+    def test_site_rules_only_apply_to_crawls(self):
+        single = score_website(STRONG_PAGE)
+        crawled = score_website(dict(STRONG_PAGE, site_summary={
+            'pages_crawled': 10, 'thin_content_pages': 10, 'pages_missing_h1': 0, 'duplicate_titles': 0,
+            'pages_missing_meta_description': 0, 'sitemap_url_count': 10, 'robots_blocks_homepage': False
+        }))
+        self.assertNotIn('site_thin_content', [result['id'] for result in single['rule_results']])
+        self.assertLess(crawled['category_scores']['content_quality'], single['category_scores']['content_quality'])
+
+    def test_rules_can_be_added_without_touching_the_auditor(self):
+        rule = {
+            'id': 'no_lorem', 'category': 'content_quality', 'weight': 1000,
+            'check': lambda d: 'lorem ipsum' not in d.get('content_text', '').lower(),
+            'issue': 'Placeholder text', 'recommendation': 'Replace placeholder text',
+            'business_impact': 'high', 'implementation_effort': '1 week',
+            'expected_improvement': 'Credible copy', 'priority_score': 9
+        }
+        with mock.patch.object(score_engine, 'RULES', list(score_engine.RULES)):
+            add_rule(rule)
+            scores = score_website(dict(STRONG_PAGE, content_text='Lorem ipsum dolor'))
+        self.assertEqual(scores['critical_issues'][0]['rule_id'], 'no_lorem')
+        with self.assertRaises(ValueError):
+            add_rule(dict(rule, category='unknown'))
+
+    def test_apply_scores_keeps_llm_only_categories(self):
+        audit_data = {'executive_summary': {'overall_score': 12},
+                      'category_scores': {'technical_seo': 5, 'voice_search': 44}}
+        apply_scores(audit_data, score_website(STRONG_PAGE))
+        self.assertEqual(audit_data['executive_summary']['overall_score'], 100)
+        self.assertEqual(audit_data['category_scores']['technical_seo'], 100)
+        self.assertEqual(audit_data['category_scores']['voice_search'], 44)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+# File: tests/test_seo_auditor.py
+
+import unittest
+import os
+import sys
+import time
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models.database as database
+from services.seo_auditor import SEOAuditor
+from services.coalescer import AuditCoalescer
+from utils.concurrency_limiter import ConcurrencyLimiter, CapacityExceeded
+from services.audit_pipeline import wait_for_background
+from services.score_engine import score_website
+
+WEBSITE_DATA = {
+    'url': 'https://a.example', 'title': 'Home', 'meta_description': 'Welcome',
+    'h1_tags': ['Hello'], 'content_text': 'Some body text', 'content_length': 14
+}
+
+class TemporaryDatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_patch = mock.patch.object(database, 'DATABASE_PATH', os.path.join(self.tmp_dir.name, 'test.db'))
+        self.db_patch.start()
+        database.init_database()
+
+    def tearDown(self):
+        self.db_patch.stop()
+        self.tmp_dir.cleanup()
+
+class TestFingerprintReuse(TemporaryDatabaseTestCase):
+    def analysis(self, score=55, **extra):
+        return {'executive_summary': {'overall_score': score}, 'category_scores': {}, **extra}
+
+    def test_identical_content_reuses_stored_analysis(self):
+        auditor = SEOAuditor()
+        with mock.patch('services.seo_auditor.analyze_with_ai', return_value=self.analysis()) as analyze:
+            audit_data, fingerprint = auditor._analyze(dict(WEBSITE_DATA), 'premium')
+            database.save_audit_data('a@example.com', WEBSITE_DATA['url'],
+                                     {**audit_data, 'audit_type': 'premium', 'company': 'A Co'},
+                                     content_fingerprint=fingerprint)
+
+            reused, reused_fingerprint = auditor._analyze(dict(WEBSITE_DATA, url='https://mirror.example'), 'premium')
+
+        self.assertEqual(analyze.call_count, 1)
+        self.assertEqual(reused_fingerprint, fingerprint)
+        # Scores come from the rule engine, not the stored LLM output
+        self.assertEqual(reused['executive_summary']['overall_score'], score_website(WEBSITE_DATA)['overall_score'])
+        self.assertNotIn('company', reused)
+
+    def test_reuse_is_limited_to_audit_type_and_freshness_window(self):
+        auditor = SEOAuditor()
+        stale = self.analysis(analysis_generated_at=(datetime.now() - timedelta(days=30)).isoformat())
+        with mock.patch('services.seo_auditor.analyze_with_ai', return_value=self.analysis()) as analyze:
+            _, fingerprint = auditor._analyze(dict(WEBSITE_DATA), 'free')
+            database.save_audit_data('a@example.com', WEBSITE_DATA['url'], stale, content_fingerprint=fingerprint)
+
+            auditor._analyze(dict(WEBSITE_DATA), 'free')
+            auditor._analyze(dict(WEBSITE_DATA), 'premium')
+
+        self.assertEqual(analyze.call_count, 3)
+
+    def test_fallback_analysis_is_never_fingerprinted(self):
+        with mock.patch('services.seo_auditor.analyze_with_ai', return_value=self.analysis(analysis_source='fallback')):
+            _, fingerprint = SEOAuditor()._analyze(dict(WEBSITE_DATA), 'free')
+        self.assertEqual(fingerprint, '')
+
+class TestRuleScoring(TemporaryDatabaseTestCase):
+    def test_free_audit_can_skip_the_llm(self):
+        with mock.patch('services.seo_auditor.FREE_AUDIT_AI_ANALYSIS', False), \
+             mock.patch('services.seo_auditor.analyze_with_ai') as analyze:
+            audit_data, fingerprint = SEOAuditor()._analyze(dict(WEBSITE_DATA), 'free')
+        analyze.assert_not_called()
+        self.assertEqual(fingerprint, '')
+        self.assertEqual(audit_data['analysis_source'], 'rules')
+        self.assertEqual(audit_data['overall_score'], score_website(WEBSITE_DATA)['overall_score'])
+
+class TestCoalescedAudits(TemporaryDatabaseTestCase):
+    def test_concurrent_audits_share_the_computation_but_not_delivery(self):
+        coalescer = AuditCoalescer(os.path.join(self.tmp_dir.name, 'coalescer.db'), poll_interval=0.02)
+        scrapes = []
+
+        def collect(url, max_pages, deadline=None):
+            scrapes.append(url)
+            time.sleep(0.3)
+            return dict(WEBSITE_DATA)
+
+        results = {}
+        with mock.patch('services.seo_auditor.audit_coalescer', coalescer), \
+             mock.patch.object(SEOAuditor, '_collect_website_data', side_effect=collect), \
+             mock.patch('services.seo_auditor.analyze_with_ai', return_value={'category_scores': {}}), \
+             mock.patch('services.seo_auditor.generate_pdf_report', return_value='reports/a.pdf'), \
+             mock.patch('services.seo_auditor.send_email_report', return_value=True) as send:
+            threads = [
+                threading.Thread(target=lambda email=email: results.setdefault(
+                    email, SEOAuditor().run_full_audit('https://a.example', email)))
+                for email in ('a@example.com', 'b@example.com', 'c@example.com')
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertTrue(wait_for_background(timeout=5))
+
+        self.assertEqual(len(scrapes), 1)
+        self.assertTrue(all(result['success'] for result in results.values()))
+        self.assertEqual(sorted(call.args[0] for call in send.call_args_list), sorted(results))
+        self.assertEqual(sorted(row['email'] for row in self.audit_rows()), sorted(results))
+
+    def test_audits_joining_a_computation_do_not_take_a_slot(self):
+        coalescer = AuditCoalescer(os.path.join(self.tmp_dir.name, 'coalescer.db'), poll_interval=0.02)
+        limiter = ConcurrencyLimiter(os.path.join(self.tmp_dir.name, 'admission.db'), max_concurrent=1,
+                                     max_waiting=0, poll_interval=0.01)
+
+        def collect(url, max_pages, deadline=None):
+            time.sleep(0.3)
+            return dict(WEBSITE_DATA)
+
+        results = {}
+        with mock.patch('services.seo_auditor.audit_coalescer', coalescer), \
+             mock.patch('services.seo_auditor.audit_limiter', limiter), \
+             mock.patch.object(SEOAuditor, '_collect_website_data', side_effect=collect), \
+             mock.patch('services.seo_auditor.analyze_with_ai', return_value={'category_scores': {}}), \
+             mock.patch('services.seo_auditor.generate_pdf_report', return_value='reports/a.pdf'), \
+             mock.patch('services.seo_auditor.send_email_report', return_value=True):
+            threads = [
+                threading.Thread(target=lambda email=email: results.setdefault(
+                    email, SEOAuditor().run_full_audit('https://a.example', email)))
+                for email in ('a@example.com', 'b@example.com', 'c@example.com')
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertTrue(wait_for_background(timeout=5))
+
+            # A different site needs its own slot, and there is none to spare
+            with limiter.slot():
+                with self.assertRaises(CapacityExceeded):
+                    SEOAuditor().run_full_audit('https://b.example', 'a@example.com')
+
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(result['success'] for result in results.values()))
+
+    def audit_rows(self):
+        conn = database.get_db_connection()
+        try:
+            return conn.execute('SELECT email FROM audits').fetchall()
+        finally:
+            conn.close()
+
+class TestResumableAudits(TemporaryDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.scrapes = []
+
+        def collect(url, max_pages, deadline=None):
+            self.scrapes.append(url)
+            return dict(WEBSITE_DATA)
+
+        self.patches = [
+            mock.patch('services.seo_auditor.audit_coalescer',
+                       AuditCoalescer(os.path.join(self.tmp_dir.name, 'coalescer.db'), enabled=False)),
+            mock.patch.object(SEOAuditor, '_collect_website_data', side_effect=collect),
+            mock.patch('services.seo_auditor.analyze_with_ai', return_value={'category_scores': {}}),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.pdf = mock.patch('services.seo_auditor.generate_pdf_report', return_value='reports/a.pdf').start()
+        self.send = mock.patch('services.seo_auditor.send_email_report', return_value=False).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        super().tearDown()
+
+    def test_failed_email_is_retried_without_repeating_the_analysis(self):
+        result = SEOAuditor().run_full_audit('https://a.example', 'a@example.com')
+        self.assertTrue(result['success'])
+        self.assertTrue(wait_for_background(timeout=5))
+        run_id = result['audit_run_id']
+        run = database.get_audit_run(run_id)
+        self.assertEqual(run['status'], 'failed')
+        self.assertEqual(sorted(run['completed_stages']), ['analysis', 'pdf', 'save'])
+        self.assertIn('email', run['stage_errors'])
+
+        self.send.return_value = True
+        retried = SEOAuditor().resume_audit(run_id)
+        self.assertEqual(retried['run']['status'], 'completed')
+        self.assertEqual(retried['run']['attempts'], 2)
+        self.assertEqual((len(self.scrapes), self.pdf.call_count, self.send.call_count), (1, 1, 2))
+        self.assertEqual(len(self.audit_rows()), 1)
+
+    def test_retry_that_fails_again_reports_the_stage(self):
+        run_id = SEOAuditor().run_full_audit('https://a.example', 'a@example.com')['audit_run_id']
+        self.assertTrue(wait_for_background(timeout=5))
+
+        retried = SEOAuditor().resume_audit(run_id)
+        self.assertFalse(retried['success'])
+        self.assertEqual(retried['failed_stage'], 'email')
+        self.assertEqual(retried['run']['status'], 'failed')
+
+        with mock.patch.object(SEOAuditor, '_collect_website_data', side_effect=Exception('site down')):
+            retried = SEOAuditor().resume_audit(run_id, rerun=['analysis'])
+        self.assertFalse(retried['success'])
+        self.assertEqual(retried['failed_stage'], 'analysis')
+        self.assertIn('site down', retried['error'])
+
+    def test_interrupted_runs_are_failed_and_old_runs_purged(self):
+        database.start_audit_run('crashed', 'free', 'https://a.example', 'a@example.com')
+        database.start_audit_run('live', 'free', 'https://a.example', 'b@example.com')
+        database.start_audit_run('old-failure', 'free', 'https://a.example', 'c@example.com')
+        database.finish_audit_run('old-failure', 'failed', {'email': 'not sent'})
+        database.save_stage_checkpoint('old-failure', 'analysis', {'success': True})
+        conn = database.get_db_connection()
+        with conn:
+            conn.execute("UPDATE audit_runs SET updated_at = ? WHERE run_id = 'crashed'",
+                         (datetime.now() - timedelta(hours=1),))
+            conn.execute("UPDATE audit_runs SET updated_at = ? WHERE run_id = 'old-failure'",
+                         (datetime.now() - timedelta(days=30),))
+        conn.close()
+
+        self.assertEqual(database.fail_stale_audit_runs(600), 1)
+        self.assertEqual(database.get_audit_run('crashed')['status'], 'failed')
+        self.assertEqual(database.get_audit_run('live')['status'], 'running')
+
+        self.assertEqual(database.purge_audit_runs(24 * 7), 1)
+        self.assertIsNone(database.get_audit_run('old-failure'))
+        self.assertEqual(database.get_stage_checkpoints('old-failure'), {})
+        self.assertIsNotNone(database.get_audit_run('crashed'))
+
+    def test_interrupted_run_resumes_after_its_completed_stages(self):
+        database.start_audit_run('job-1', 'free', 'https://a.example', 'a@example.com')
+        database.save_stage_checkpoint('job-1', 'analysis', {
+            'success': True, 'audit_data': {'overall_score': 61}, 'website_url': 'https://a.example',
+            'content_fingerprint': 'abc'
+        })
+        self.send.return_value = True
+
+        result = SEOAuditor().run_full_audit('https://a.example', 'a@example.com', run_id='job-1')
+        self.assertTrue(wait_for_background(timeout=5))
+        self.assertEqual((result['score'], self.scrapes), (61, []))
+        self.assertEqual(database.get_audit_run('job-1')['status'], 'completed')
+
+    def test_forced_stages_rerun_with_their_dependents(self):
+        self.send.return_value = True
+        run_id = SEOAuditor().run_full_audit('https://a.example', 'a@example.com')['audit_run_id']
+        self.assertTrue(wait_for_background(timeout=5))
+
+        SEOAuditor().resume_audit(run_id, rerun=['pdf'])
+        self.assertEqual((len(self.scrapes), self.pdf.call_count, self.send.call_count), (1, 2, 2))
+        self.assertEqual(len(self.audit_rows()), 1)
+        self.assertFalse(SEOAuditor().resume_audit(run_id, rerun=['typo'])['success'])
+
+    def audit_rows(self):
+        conn = database.get_db_connection()
+        try:
+            return conn.execute('SELECT email FROM audits').fetchall()
+        finally:
+            conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+# File: tests/test_sitemap_service.py
+
+import unittest
+import os
+import sys
+import gzip
+import threading
+from unittest import mock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import sitemap_service
+from services.sitemap_service import RobotsRules, HostCache
+
+ROBOTS = """
+User-agent: *
+Disallow: /private/
+Allow: /private/press
+Disallow: /*.json$
+Crawl-delay: 2
+
+User-agent: auditbot
+User-agent: otherbot
+Disallow: /
+
+Sitemap: /sitemap_index.xml
+"""
+
+NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+class SitemapHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        SitemapHandler.requests_seen.append(self.path)
+        if self.path == '/robots.txt':
+            self.reply(ROBOTS.encode(), 'text/plain')
+        elif self.path == '/sitemap_index.xml':
+            body = (f'<?xml version="1.0"?><sitemapindex {NS}>'
+                    '<sitemap><loc>/pages.xml</loc></sitemap>'
+                    '<sitemap><loc>/posts.xml.gz</loc></sitemap></sitemapindex>')
+            self.reply(body.encode(), 'application/xml')
+        elif self.path == '/pages.xml':
+            body = (f'<?xml version="1.0"?><urlset {NS}>'
+                    '<url><loc>https://site.example/</loc><lastmod>2024-01-01</lastmod></url>'
+                    '<url><loc>https://site.example/about</loc></url></urlset>')
+            self.reply(body.encode(), 'application/xml')
+        elif self.path == '/posts.xml.gz':
+            urls = ''.join(f'<url><loc>https://site.example/post/{i}</loc></url>' for i in range(3000))
+            self.reply(gzip.compress(f'<urlset {NS}>{urls}</urlset>'.encode()), 'application/gzip')
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def reply(self, payload, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+class TestRobotsRules(unittest.TestCase):
+    def setUp(self):
+        self.rules = RobotsRules.parse(ROBOTS)
+
+    def test_longest_match_wins(self):
+        self.assertTrue(self.rules.is_allowed('https://a.example/blog'))
+        self.assertFalse(self.rules.is_allowed('https://a.example/private/data'))
+        self.assertTrue(self.rules.is_allowed('https://a.example/private/press/2024'))
+
+    def test_wildcards(self):
+        self.assertFalse(self.rules.is_allowed('https://a.example/api/feed.json'))
+        self.assertTrue(self.rules.is_allowed('https://a.example/api/feed.json?page=2'))
+
+    def test_specific_user_agent_group(self):
+        self.assertFalse(self.rules.is_allowed('https://a.example/blog', 'AuditBot/1.0'))
+        self.assertFalse(self.rules.is_allowed('https://a.example/blog', 'otherbot'))
+        self.assertEqual(self.rules.crawl_delay(), 2.0)
+        self.assertEqual(self.rules.sitemaps, ['/sitemap_index.xml'])
+
+    def test_missing_robots_allows_everything(self):
+        self.assertTrue(RobotsRules().is_allowed('https://a.example/private/'))
+        self.assertFalse(RobotsRules(disallow_all=True).is_allowed('https://a.example/'))
+
+class TestHostCache(unittest.TestCase):
+    def test_ttl_and_size_bound(self):
+        cache = HostCache(ttl=60, max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+
+        cache.ttl = -1
+        cache.set('d', 4)
+        self.assertIsNone(cache.get('d'))
+
+class TestSitemapDiscovery(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), SitemapHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        sitemap_service.robots_cache.clear()
+        sitemap_service.sitemap_cache.clear()
+        SitemapHandler.requests_seen = []
+
+    def test_nested_and_gzipped_sitemaps(self):
+        entries = sitemap_service.list_urls(self.base_url)
+        self.assertEqual(len(entries), 3002)
+        self.assertEqual(entries[0], {'loc': 'https://site.example/', 'lastmod': '2024-01-01'})
+        self.assertEqual(entries[-1]['loc'], 'https://site.example/post/2999')
+
+    def test_results_are_cached_per_host(self):
+        sitemap_service.list_urls(self.base_url)
+        sitemap_service.list_urls(self.base_url + '/other')
+        self.assertFalse(sitemap_service.is_allowed(self.base_url + '/private/x'))
+        self.assertEqual(SitemapHandler.requests_seen.count('/robots.txt'), 1)
+        self.assertEqual(SitemapHandler.requests_seen.count('/pages.xml'), 1)
+
+    def test_url_limit(self):
+        with mock.patch('services.sitemap_service.SITEMAP_MAX_URLS', 100):
+            self.assertEqual(len(sitemap_service.list_urls(self.base_url)), 100)
+
+    def test_collection_stops_at_the_limit_and_caches_the_bounded_list(self):
+        entries = sitemap_service.list_urls(self.base_url, limit=2)
+        self.assertEqual([entry['loc'] for entry in entries], ['https://site.example/', 'https://site.example/about'])
+        self.assertNotIn('/posts.xml.gz', SitemapHandler.requests_seen)
+        self.assertEqual(sitemap_service.sitemap_cache.get('http://127.0.0.1:%d' % self.server.server_address[1]),
+                         (2, entries))
+
+        # A smaller limit is served from the cache, a larger one reads further
+        self.assertEqual(len(sitemap_service.list_urls(self.base_url, limit=1)), 1)
+        self.assertEqual(SitemapHandler.requests_seen.count('/pages.xml'), 1)
+        self.assertEqual(len(sitemap_service.list_urls(self.base_url, limit=10)), 10)
+        self.assertEqual(SitemapHandler.requests_seen.count('/pages.xml'), 2)
+
+        signals = sitemap_service.get_site_signals(self.base_url, limit=10)
+        self.assertEqual((signals['sitemap_url_count'], signals['sitemap_url_count_capped']), (10, True))
+
+    def test_site_signals(self):
+        signals = sitemap_service.get_site_signals(self.base_url)
+        self.assertTrue(signals['robots_txt_found'])
+        self.assertFalse(signals['robots_blocks_homepage'])
+        self.assertEqual(signals['sitemap_urls_with_lastmod'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+# File: tests/test_stub_providers.py
+
+import unittest
+import os
+import sys
+import json
+import tempfile
+import threading
+from unittest import mock
+
+from werkzeug.serving import make_server
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stub_providers
+from stub_providers import create_app, parse_latency, canned_response
+import models.database as database
+from services import ai_service, email_service, llm_client, report_generator, seo_auditor, web_scraper
+from services.analysis_sections import SECTIONS_BY_NAME, build_section_prompt
+from services.coalescer import AuditCoalescer
+from services.audit_pipeline import wait_for_background
+
+class TestStubProviders(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app().test_client()
+
+    def test_latency_specs(self):
+        self.assertEqual(parse_latency('fixed:0.5')(), 0.5)
+        self.assertTrue(1 <= parse_latency('uniform:1,2')() <= 2)
+        self.assertGreater(parse_latency('lognormal:1.0,0.5')(), 0)
+        with self.assertRaises(ValueError):
+            parse_latency('gamma:1')
+
+    def test_canned_response_answers_the_requested_keys(self):
+        section = SECTIONS_BY_NAME['executive_summary']
+        self.assertEqual(set(canned_response(build_section_prompt(section, 'ctx'), stub_providers.DEFAULT_RESPONSES)),
+                         {'executive_summary', 'category_scores'})
+        retry = build_section_prompt(section, 'ctx', ['category_scores'])
+        self.assertEqual(set(canned_response(retry, stub_providers.DEFAULT_RESPONSES)), {'category_scores'})
+
+    def test_chat_completion_and_stream(self):
+        prompt = build_section_prompt(SECTIONS_BY_NAME['next_steps'], 'ctx')
+        body = {'model': 'gpt-4', 'messages': [{'role': 'user', 'content': prompt}]}
+        response = self.client.post('/v1/chat/completions', json=body).get_json()
+        content = json.loads(response['choices'][0]['message']['content'])
+        self.assertIn('next_steps', content)
+        self.assertGreater(response['usage']['completion_tokens'], 0)
+
+        streamed = self.client.post('/v1/chat/completions', json={**body, 'stream': True}).get_data(as_text=True)
+        events = [line[6:] for line in streamed.splitlines() if line.startswith('data: ')]
+        self.assertEqual(events[-1], '[DONE]')
+        deltas = ''.join(json.loads(event)['choices'][0]['delta']['content']
+                         for event in events[:-1] if json.loads(event)['choices'])
+        self.assertEqual(json.loads(deltas), content)
+
+    def test_injected_errors_and_emails(self):
+        failing = create_app(error_rate=1.0, error_status=429).test_client()
+        self.assertEqual(failing.post('/v1/chat/completions', json={'messages': []}).status_code, 429)
+        self.assertEqual(failing.get('/stats').get_json()['chat_errors'], 1)
+
+        self.assertIn('id', self.client.post('/emails', json={'to': ['a@example.com']}).get_json())
+        self.assertEqual(self.client.get('/stats').get_json()['emails'], 1)
+
+class TestAuditAgainstStub(unittest.TestCase):
+    """A free audit end to end - scrape, analysis, PDF, database, email - against the stub"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.stub_url = f'http://127.0.0.1:{self.server.server_port}'
+
+        tmp = self.tmp_dir.name
+        self.patches = [
+            mock.patch.dict(llm_client.PROVIDERS['openai'], {'base_url': f'{self.stub_url}/v1', 'api_key': 'stub'}),
+            mock.patch.dict(llm_client.PROVIDERS['openrouter'], {'base_url': f'{self.stub_url}/v1', 'api_key': 'stub'}),
+            mock.patch.object(email_service, 'RESEND_BASE_URL', self.stub_url),
+            mock.patch.object(email_service, 'RESEND_API_KEY', 'stub'),
+            mock.patch.object(database, 'DATABASE_PATH', os.path.join(tmp, 'test.db')),
+            mock.patch.object(report_generator, 'REPORTS_DIR', os.path.join(tmp, 'reports')),
+            mock.patch.object(seo_auditor, 'audit_coalescer', AuditCoalescer(os.path.join(tmp, 'coalescer.db'))),
+            mock.patch.object(web_scraper, 'ENABLE_HTTP_CACHE', False),
+            mock.patch.object(ai_service, 'ENABLE_LLM_CACHE', False),
+            mock.patch.object(seo_auditor, 'ENABLE_FINGERPRINT_REUSE', False)
+        ]
+        for patch in self.patches:
+            patch.start()
+        database.init_database()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.server.shutdown()
+        self.tmp_dir.cleanup()
+
+    def test_free_audit_completes_against_the_stub(self):
+        result = seo_auditor.SEOAuditor().run_full_audit(f'{self.stub_url}/site/e2e', 'bench@example.com')
+        self.assertTrue(result['success'], result.get('error'))
+        self.assertEqual(result['email_status'], 'sending')
+        self.assertTrue(wait_for_background(timeout=10))
+        self.assertEqual(result['critical_issues'], stub_providers.DEFAULT_RESPONSES['critical_issues'])
+
+        stats = json.loads(self.server.app.test_client().get('/stats').get_data())
+        self.assertGreater(stats['chat_requests'], 0)
+        self.assertEqual(stats['chat_errors'], 0)
+        self.assertEqual(stats['emails'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
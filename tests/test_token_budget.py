@@ -0,0 +1,61 @@
+# File: tests/test_token_budget.py
+
+import unittest
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.token_budget import (
+    count_tokens, count_message_tokens, fit_max_tokens, context_window, strip_boilerplate,
+    compress_text, compact_list, TokenBudgetError
+)
+
+PAGE_TEXT = """Home
+About Us
+We use cookies to improve your experience. Accept all
+Skip to main content
+Acme Plumbing repairs burst pipes and leaking boilers across Leeds within 2 hours.
+Our licensed engineers have fixed over 12,000 heating systems since 1998.
+We are really very happy that you are here with us today on this page.
+Acme Plumbing repairs burst pipes and leaking boilers across Leeds within 2 hours.
+Copyright 2024 Acme Plumbing. All rights reserved.
+"""
+
+class TestTokenBudget(unittest.TestCase):
+    def test_counts_and_context_windows(self):
+        self.assertGreater(count_tokens('hello world ' * 50), 50)
+        self.assertGreater(count_message_tokens([{'role': 'user', 'content': 'hi'}]), count_tokens('hi'))
+        self.assertEqual(context_window('openai/gpt-4'), context_window('gpt-4'))
+        self.assertEqual(context_window('unknown-model'), 8192)
+
+    def test_fit_max_tokens_keeps_requests_inside_the_window(self):
+        self.assertEqual(fit_max_tokens('gpt-4', 1000, 500), 500)
+        clamped = fit_max_tokens('gpt-4', 6000, 4000)
+        self.assertLessEqual(6000 + clamped, 8192)
+        with self.assertRaises(TokenBudgetError):
+            fit_max_tokens('gpt-4', 8100, 500)
+
+    def test_boilerplate_and_repeats_are_stripped(self):
+        lines = strip_boilerplate(PAGE_TEXT)
+        self.assertEqual(len(lines), 3)
+        self.assertFalse(any('cookies' in line or 'Copyright' in line or line == 'Home' for line in lines))
+
+    def test_compression_keeps_informative_sentences_in_order(self):
+        budget = count_tokens('Acme Plumbing repairs burst pipes and leaking boilers across Leeds within 2 hours.') + \
+            count_tokens('Our licensed engineers have fixed over 12,000 heating systems since 1998.') + 2
+        compressed = compress_text(PAGE_TEXT, budget, keywords=['Acme Plumbing Leeds'])
+        self.assertTrue(compressed.startswith('Acme Plumbing repairs'))
+        self.assertIn('12,000 heating systems', compressed)
+        self.assertNotIn('really very happy', compressed)
+        self.assertLessEqual(count_tokens(compressed), budget)
+
+    def test_text_within_budget_is_kept(self):
+        self.assertIn('really very happy', compress_text(PAGE_TEXT, 1000))
+
+    def test_compact_list(self):
+        self.assertEqual(compact_list(['A', ' a ', 'B', 'x' * 200], 2, max_chars=10), ['A', 'B', '(+1 more)'])
+
+if __name__ == '__main__':
+    unittest.main()
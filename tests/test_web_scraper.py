@@ -0,0 +1,362 @@
+# File: tests/test_web_scraper.py
+
+import unittest
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import Future
+from unittest import mock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.web_scraper import scrape_website, crawl_website, normalize_page_url, normalize_cache_url, PageCache
+from services.web_scraper import compute_content_fingerprint
+from services.html_extractor import PageExtractor, extract_page, lxml_etree
+from services import parse_pool
+
+SITE = {
+    '/': '<html><head><title>Home</title><meta name="description" content="Welcome"></head>'
+         '<body><h1>Home</h1><a href="/about">About</a><a href="/blog/">Blog</a>'
+         '<a href="https://other.example/">Out</a><img src="a.png"></body></html>',
+    '/about': '<html><head><title>About</title></head><body><h1>About us</h1></body></html>',
+    '/blog': '<html><head><title>Blog</title></head><body><p>Posts</p></body></html>',
+    '/pricing': '<html><head><title>Pricing</title></head><body><h1>Plans</h1></body></html>',
+}
+
+class SiteHandler(BaseHTTPRequestHandler):
+    full_responses = 0
+
+    def do_GET(self):
+        path = self.path.rstrip('/') or '/'
+        if path == '/etag':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            SiteHandler.full_responses += 1
+            body = '<html><head><title>Cached</title></head><body><h1>Etag page</h1></body></html>'
+            payload = body.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        if path == '/sitemap.xml':
+            port = self.server.server_address[1]
+            body = ('<?xml version="1.0"?><urlset>'
+                    f'<url><loc>http://127.0.0.1:{port}/pricing</loc></url></urlset>')
+            content_type = 'application/xml'
+        elif path == '/big':
+            body = '<html><head><title>Big</title></head><body>' + 'x' * 50000 + '</body></html>'
+            content_type = 'text/html'
+        elif path == '/file.bin':
+            body = 'PK\x03\x04 binary'
+            content_type = 'application/zip'
+        elif path in SITE:
+            body = SITE[path]
+            content_type = 'text/html; charset=utf-8'
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        payload = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+class LocalSiteTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), SiteHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+class TestScrapeWebsite(LocalSiteTestCase):
+    def test_scrape_homepage(self):
+        data = scrape_website(self.base_url)
+        self.assertEqual(data['title'], 'Home')
+        self.assertEqual(data['meta_description'], 'Welcome')
+        self.assertEqual(data['h1_tags'], ['Home'])
+        self.assertEqual(data['images'], 1)
+        self.assertEqual(data['images_without_alt'], 1)
+        self.assertEqual(data['internal_links'], 2)
+        self.assertEqual(data['external_links'], 1)
+        self.assertFalse(data['content_truncated'])
+
+    def test_scrape_truncates_large_pages(self):
+        with mock.patch('services.web_scraper.SCRAPE_MAX_BYTES', 10000), \
+             mock.patch('services.web_scraper.SCRAPE_CHUNK_SIZE', 4096):
+            data = scrape_website(self.base_url + '/big')
+        self.assertTrue(data['content_truncated'])
+        self.assertEqual(data['bytes_downloaded'], 10000)
+        self.assertEqual(data['title'], 'Big')
+
+    def test_scrape_rejects_non_html(self):
+        data = scrape_website(self.base_url + '/file.bin')
+        self.assertIn('Unsupported content type', data['error'])
+
+    def test_scrape_error_is_returned(self):
+        data = scrape_website(self.base_url + '/missing')
+        self.assertIn('error', data)
+
+class TestPageCache(LocalSiteTestCase):
+    def test_conditional_get_reuses_cached_body(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with mock.patch('services.web_scraper.page_cache', PageCache(cache_dir)):
+                SiteHandler.full_responses = 0
+                first = scrape_website(self.base_url + '/etag')
+                second = scrape_website(self.base_url + '/etag/')
+        self.assertEqual(SiteHandler.full_responses, 1)
+        self.assertEqual(first['title'], 'Cached')
+        self.assertEqual(second['h1_tags'], ['Etag page'])
+        self.assertEqual(second['bytes_downloaded'], 0)
+
+    def test_missing_cached_body_falls_back_to_a_full_fetch(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = PageCache(cache_dir)
+            with mock.patch('services.web_scraper.page_cache', cache):
+                SiteHandler.full_responses = 0
+                scrape_website(self.base_url + '/etag')
+                os.remove(cache._paths(self.base_url + '/etag')[1])
+                # No validators are sent without a body to fall back on
+                refetched = scrape_website(self.base_url + '/etag')
+
+                # The body disappears between sending the validators and the 304
+                with mock.patch.object(cache, 'read_body', return_value=None):
+                    raced = scrape_website(self.base_url + '/etag')
+        self.assertEqual(SiteHandler.full_responses, 3)
+        self.assertEqual(refetched['title'], 'Cached')
+        self.assertEqual(raced['h1_tags'], ['Etag page'])
+        self.assertGreater(raced['bytes_downloaded'], 0)
+
+    def test_cache_entries_expire_and_are_size_bounded(self):
+        headers = {'ETag': '"a"', 'Content-Type': 'text/html'}
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = PageCache(cache_dir, max_age=60, max_bytes=150)
+            cache.set('https://a.example/one', b'x' * 100, headers)
+            cache.set('https://a.example/two', b'y' * 100, headers)
+            self.assertIsNone(cache.get('https://a.example/one'))
+            self.assertEqual(cache.read_body('https://a.example/two'), b'y' * 100)
+
+            cache.max_age = -1
+            self.assertIsNone(cache.get('https://a.example/two'))
+
+    def test_cache_size_is_tracked_without_rescanning_on_each_write(self):
+        headers = {'ETag': '"a"', 'Content-Type': 'text/html'}
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = PageCache(cache_dir, max_age=60, max_bytes=1000)
+            with mock.patch.object(cache, '_entries', wraps=cache._entries) as scans:
+                for i in range(5):
+                    cache.set(f'https://a.example/{i}', b'x' * 100, headers)
+                cache.set('https://a.example/0', b'x' * 150, headers)
+                cache.delete('https://a.example/1')
+                self.assertEqual(scans.call_count, 1)
+                self.assertEqual(cache._total_size, 450)
+
+                # Going over the limit rescans once and trims below it
+                for i in range(5, 11):
+                    cache.set(f'https://a.example/{i}', b'y' * 100, headers)
+                self.assertEqual(scans.call_count, 2)
+            self.assertLessEqual(cache._total_size, 900)
+            self.assertEqual(cache._total_size, cache.get_cache_stats()['total_size_bytes'])
+
+    def test_normalize_cache_url(self):
+        self.assertEqual(normalize_cache_url('HTTPS://Example.com:443/a/?b=2&a=1#x'),
+                         'https://example.com/a?a=1&b=2')
+        self.assertEqual(normalize_cache_url('http://example.com'), 'http://example.com/')
+
+class TestCrawlWebsite(LocalSiteTestCase):
+    def test_crawl_uses_links_and_sitemap(self):
+        result = crawl_website(self.base_url, max_pages=10, concurrency=3)
+        urls = [page['url'] for page in result['pages']]
+        self.assertEqual(urls[0], self.base_url)
+        self.assertEqual(set(urls), {self.base_url, self.base_url + '/about',
+                                     self.base_url + '/blog', self.base_url + '/pricing'})
+        summary = result['site_summary']
+        self.assertEqual(summary['pages_crawled'], 4)
+        self.assertEqual(summary['pages_missing_h1'], 1)
+        self.assertEqual(summary['pages_missing_meta_description'], 3)
+
+    def test_crawl_respects_page_budget(self):
+        result = crawl_website(self.base_url, max_pages=2)
+        self.assertEqual(len(result['pages']), 2)
+
+    def test_robots_checks_run_off_the_event_loop(self):
+        threads = []
+
+        def is_allowed(page_url):
+            threads.append(threading.current_thread().name)
+            return not page_url.endswith('/blog')
+
+        with mock.patch('services.web_scraper.RESPECT_ROBOTS_TXT', True), \
+             mock.patch('services.sitemap_service.is_allowed', side_effect=is_allowed):
+            result = crawl_website(self.base_url, max_pages=10, concurrency=3)
+        self.assertEqual(result['site_summary']['pages_blocked_by_robots'], 1)
+        self.assertEqual(len(result['pages']), 3)
+        self.assertTrue(threads and all(name.startswith('crawler') for name in threads))
+
+        # Only candidates that can still fit the page budget are checked
+        del threads[:]
+        with mock.patch('services.web_scraper.RESPECT_ROBOTS_TXT', True), \
+             mock.patch('services.sitemap_service.is_allowed', side_effect=is_allowed):
+            crawl_website(self.base_url, max_pages=2)
+        self.assertEqual(len(threads), 1)
+
+    def test_normalize_page_url(self):
+        self.assertEqual(normalize_page_url('https://a.com/x/', 'y#top'), 'https://a.com/x/y')
+        self.assertEqual(normalize_page_url('https://a.com', '/'), 'https://a.com')
+        self.assertIsNone(normalize_page_url('https://a.com', 'mailto:me@a.com'))
+        self.assertIsNone(normalize_page_url('https://a.com', '/brochure.pdf'))
+
+RICH_PAGE = b'''<html><head><title>Shop &amp; Save</title>
+<meta name="description" content="Deals"><meta name="keywords" content="a,b">
+<meta property="og:title" content="OG Shop"><meta name="twitter:card" content="summary">
+<link rel="canonical" href="https://shop.example/">
+<script type="application/ld+json">{"@context": "https://schema.org", "@graph": [{"@type": "Organization"}, {"@type": ["WebSite", "Thing"]}]}</script>
+<style>body { color: red; }</style></head>
+<body><h1>Deals <b>today</b></h1><h2>One</h2><h2>Two</h2><h3>Three</h3>
+<img src="a.png" alt="A"><img src="b.png" alt=""><img src="c.png"/>
+<nav><a href="/cart">Cart</a><a href="https://shop.example/faq#q1">FAQ</a></nav><a href="https://elsewhere.example">Out</a>
+<p>Some body text.</p><footer><p>Copyright Shop</p></footer></body></html>'''
+
+class TestHtmlExtractor(unittest.TestCase):
+    def assert_rich_page(self, data, links):
+        self.assertEqual(data['title'], 'Shop & Save')
+        self.assertEqual(data['meta_description'], 'Deals')
+        self.assertEqual(data['meta_keywords'], 'a,b')
+        self.assertEqual(data['canonical_url'], 'https://shop.example/')
+        self.assertEqual(data['open_graph'], {'title': 'OG Shop'})
+        self.assertEqual(data['twitter_cards'], {'card': 'summary'})
+        self.assertEqual(data['h1_tags'], ['Deals today'])
+        self.assertEqual(data['h2_tags'], ['One', 'Two'])
+        self.assertEqual(data['h3_tags'], ['Three'])
+        self.assertEqual((data['images'], data['images_without_alt']), (3, 2))
+        self.assertEqual((data['internal_links'], data['external_links']), (2, 1))
+        self.assertTrue(data['has_schema'])
+        self.assertEqual(data['schema_types'], ['Organization', 'WebSite', 'Thing'])
+        self.assertIn('Some body text.', data['content_text'])
+        self.assertNotIn('color: red', data['content_text'])
+        self.assertIn('Some body text.', data['main_text'])
+        self.assertNotIn('Cart', data['main_text'])
+        self.assertNotIn('Copyright', data['main_text'])
+        self.assertEqual(links, ['https://shop.example/cart', 'https://shop.example/faq'])
+
+    def test_stdlib_backend(self):
+        self.assert_rich_page(*extract_page('https://shop.example', RICH_PAGE, backend='html.parser'))
+
+    @unittest.skipIf(lxml_etree is None, 'lxml not installed')
+    def test_lxml_backend(self):
+        self.assert_rich_page(*extract_page('https://shop.example', RICH_PAGE, backend='lxml'))
+
+    def test_incremental_feed_matches_single_feed(self):
+        for backend in ('html.parser', 'auto'):
+            extractor = PageExtractor('https://shop.example', backend=backend)
+            for i in range(0, len(RICH_PAGE), 7):
+                extractor.feed(RICH_PAGE[i:i + 7])
+            self.assert_rich_page(*extractor.close())
+
+    def test_incremental_feed_keeps_split_multibyte_characters(self):
+        page = '<html><head><title>Café Zürich — 東京</title></head><body><h1>Ünïcödé ✓</h1></body></html>'
+        for backend in ('html.parser', 'auto'):
+            extractor = PageExtractor('https://shop.example', backend=backend, encoding='utf-8')
+            body = page.encode('utf-8')
+            for i in range(0, len(body), 3):
+                extractor.feed(body[i:i + 3])
+            website_data, _ = extractor.close()
+            self.assertEqual(website_data['title'], 'Café Zürich — 東京')
+            self.assertEqual(website_data['h1_tags'], ['Ünïcödé ✓'])
+
+class TestParsePool(LocalSiteTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        parse_pool.shutdown()
+        super().tearDownClass()
+
+    def test_pool_extraction_matches_in_process(self):
+        parse_pool.warm_start()
+        self.assertEqual(parse_pool.extract_in_pool('https://shop.example', RICH_PAGE),
+                         extract_page('https://shop.example', RICH_PAGE))
+
+    def test_slow_pool_falls_back_to_a_truncated_in_process_parse(self):
+        executor = mock.Mock()
+        executor.submit.return_value = Future()
+        with mock.patch('services.parse_pool._get_executor', return_value=executor), \
+             mock.patch('services.parse_pool.PARSE_POOL_TIMEOUT', 0.01), \
+             mock.patch('services.parse_pool.PARSE_POOL_MIN_BYTES', 200), \
+             mock.patch('services.parse_pool.extract_page', wraps=extract_page) as in_process:
+            website_data, _ = parse_pool.extract_in_pool('https://shop.example', RICH_PAGE)
+        self.assertEqual(in_process.call_args[0][1], RICH_PAGE[:200])
+        self.assertTrue(website_data['content_truncated'])
+        self.assertTrue(executor.submit.return_value.cancelled())
+
+    def test_full_pool_does_not_queue_more_pages(self):
+        executor = mock.Mock()
+        executor.submit.side_effect = lambda *args: Future()
+        with mock.patch('services.parse_pool._get_executor', return_value=executor), \
+             mock.patch('services.parse_pool._pending', threading.BoundedSemaphore(1)), \
+             mock.patch('services.parse_pool.PARSE_POOL_TIMEOUT', 0.01):
+            parse_pool.extract_in_pool('https://shop.example', RICH_PAGE)
+            # The first page never started, so cancelling it gave its slot back
+            parse_pool.extract_in_pool('https://shop.example', RICH_PAGE)
+            self.assertEqual(executor.submit.call_count, 2)
+
+            running = Future()
+            running.set_running_or_notify_cancel()
+            executor.submit.side_effect = None
+            executor.submit.return_value = running
+            parse_pool.extract_in_pool('https://shop.example', RICH_PAGE)
+            website_data, _ = parse_pool.extract_in_pool('https://shop.example', RICH_PAGE)
+            self.assertEqual(executor.submit.call_count, 3)
+            self.assertTrue(website_data['content_truncated'])
+
+            running.set_result(({}, []))
+            parse_pool.extract_in_pool('https://shop.example', RICH_PAGE)
+            self.assertEqual(executor.submit.call_count, 4)
+
+    def test_scrape_parses_large_pages_in_pool(self):
+        with mock.patch('services.web_scraper.ENABLE_PARSE_POOL', True), \
+             mock.patch('services.web_scraper.PARSE_POOL_MIN_BYTES', 1000), \
+             mock.patch('services.parse_pool.extract_in_pool', wraps=parse_pool.extract_in_pool) as pooled:
+            big = scrape_website(self.base_url + '/big')
+            small = scrape_website(self.base_url + '/about')
+        self.assertEqual(pooled.call_count, 1)
+        self.assertEqual(big['title'], 'Big')
+        self.assertEqual(small['h1_tags'], ['About us'])
+
+class TestContentFingerprint(unittest.TestCase):
+    def page(self, **overrides):
+        data = {'url': 'https://a.example', 'title': 'Home', 'meta_description': 'Welcome',
+                'h1_tags': ['Hello'], 'content_text': 'Some body text', 'content_length': 14}
+        data.update(overrides)
+        return data
+
+    def test_same_content_on_different_urls_matches(self):
+        self.assertEqual(compute_content_fingerprint(self.page()),
+                         compute_content_fingerprint(self.page(url='https://b.example')))
+
+    def test_whitespace_and_case_are_ignored(self):
+        self.assertEqual(compute_content_fingerprint(self.page()),
+                         compute_content_fingerprint(self.page(title='  HOME ', content_text='Some\n body   text')))
+
+    def test_content_changes_alter_fingerprint(self):
+        self.assertNotEqual(compute_content_fingerprint(self.page()),
+                            compute_content_fingerprint(self.page(h1_tags=['Hello', 'New section'])))
+
+if __name__ == '__main__':
+    unittest.main()
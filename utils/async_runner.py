@@ -0,0 +1,101 @@
+# File: utils/async_runner.py
+# Background asyncio event loop for calling async services from sync code
+#
+# Each process runs one event loop in a dedicated native thread. Sync callers
+# submit coroutines with run() and wait for the result; the loop keeps every
+# in-flight call (and its pooled connections) progressing concurrently.
+#
+# Under gevent workers the loop thread is started with the original, unpatched
+# thread primitive and callers wait on a gevent event that the loop thread
+# triggers through an async watcher, so the calling greenlet yields and the
+# rest of the worker keeps serving requests.
+
+import os
+import asyncio
+import threading
+import concurrent.futures
+from typing import Any, Awaitable, Optional
+
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+def _gevent_patched() -> bool:
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+def _start_loop_thread() -> asyncio.AbstractEventLoop:
+    """Create and run a loop inside a new native thread.
+
+    The loop is created inside the thread so that, under gevent, its selector
+    and self-pipe bind to that thread's own hub rather than the worker's.
+    """
+    if _gevent_patched():
+        from gevent.monkey import get_original
+        start_new_thread, allocate_lock = get_original('_thread', ['start_new_thread', 'allocate_lock'])
+    else:
+        import _thread
+        start_new_thread, allocate_lock = _thread.start_new_thread, _thread.allocate_lock
+
+    ready = allocate_lock()
+    ready.acquire()
+    created = []
+
+    def run_loop():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        created.append(loop)
+        ready.release()
+        loop.run_forever()
+
+    start_new_thread(run_loop, ())
+    ready.acquire()
+    return created[0]
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return this process's background loop, starting it on first use or after a fork"""
+    global _loop, _loop_pid
+
+    pid = os.getpid()
+    if _loop is None or _loop_pid != pid:
+        with _loop_lock:
+            if _loop is None or _loop_pid != pid:
+                _loop = _start_loop_thread()
+                _loop_pid = pid
+    return _loop
+
+def _wait_gevent(future, timeout: Optional[float]):
+    """Wait for a loop-thread future without blocking the gevent hub.
+
+    The loop thread wakes this hub through an async watcher, the one gevent
+    primitive that is safe to trigger from another native thread.
+    """
+    from gevent import get_hub
+    from gevent.event import Event
+
+    hub = get_hub()
+    done = Event()
+    watcher = hub.loop.async_()
+    watcher.start(done.set)
+    try:
+        future.add_done_callback(lambda _: watcher.send())
+        if not done.wait(timeout):
+            raise concurrent.futures.TimeoutError()
+    finally:
+        watcher.stop()
+        watcher.close()
+    return future.result(0)
+
+def run(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the background loop and block (cooperatively under gevent) for its result"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        if _gevent_patched():
+            return _wait_gevent(future, timeout)
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
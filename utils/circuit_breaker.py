@@ -0,0 +1,90 @@
+# File: utils/circuit_breaker.py
+# Per-provider circuit breakers and jittered retry backoff
+#
+# A breaker opens after CIRCUIT_BREAKER_FAILURES consecutive failures. While it
+# is open, calls to that provider fail immediately instead of waiting out a
+# timeout; after CIRCUIT_BREAKER_COOLDOWN seconds one trial call is let
+# through (half-open) and its outcome closes or re-opens the breaker.
+#
+# Breakers are process-local. LLM calls all run on the background event loop
+# (utils.async_runner), so state changes happen on a single thread.
+
+import time
+import random
+import logging
+from typing import Dict
+
+from config.settings import CIRCUIT_BREAKER_FAILURES, CIRCUIT_BREAKER_COOLDOWN
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown: float = 30):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow_request(self) -> bool:
+        """True if a call may be attempted now (claims the trial slot when half-open)"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.state = HALF_OPEN
+            self._trial_in_flight = False
+
+        if self.state == HALF_OPEN:
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f'Circuit for {self.name} closed')
+        self.state = CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning(f'Circuit for {self.name} opened after {self.failures} consecutive failures')
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Give back a half-open trial slot without an outcome (e.g. the call was cancelled)"""
+        self._trial_in_flight = False
+
+    def get_stats(self) -> Dict:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'retry_in_seconds': round(max(0.0, self.cooldown - (time.monotonic() - self.opened_at)), 1)
+                                if self.state == OPEN else 0
+        }
+
+_breakers = {}
+
+def get_breaker(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name, CIRCUIT_BREAKER_FAILURES, CIRCUIT_BREAKER_COOLDOWN)
+    return breaker
+
+def get_breaker_stats() -> Dict:
+    return {name: breaker.get_stats() for name, breaker in _breakers.items()}
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^(attempt - 1))]"""
+    return random.uniform(0, min(cap, base * (2 ** max(0, attempt - 1))))
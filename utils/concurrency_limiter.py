@@ -0,0 +1,242 @@
+# File: utils/concurrency_limiter.py
+# Cross-process admission control for audits
+#
+# Every gunicorn worker and audit worker process shares one SQLite table of
+# slots. slot() admits the caller when fewer than max_concurrent slots are
+# held; otherwise the caller joins a bounded FIFO wait queue and polls until a
+# slot frees up. When the wait queue is already full, or the wait times out,
+# CapacityExceeded is raised at once so the API can answer with a fast 503
+# instead of starting one more scrape and LLM call.
+#
+# Held slots and waiting entries are leases: a process that dies without
+# releasing its slot frees it when the lease expires. Waiters renew their
+# lease on every poll, so only a dead waiter's entry goes stale.
+
+import os
+import time
+import uuid
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Dict
+
+from config.settings import (
+    CACHE_DIR, ENABLE_ADMISSION_CONTROL, MAX_CONCURRENT_AUDITS, AUDIT_MAX_WAITING, AUDIT_ADMISSION_WAIT_SECONDS,
+    AUDIT_TIMEOUT_SECONDS
+)
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = 'active'
+WAITING = 'waiting'
+
+# Admission waits are kept this long for get_stats()
+WAIT_HISTORY_SECONDS = 3600
+
+class CapacityExceeded(Exception):
+    """No slot is free and the caller could not wait for one"""
+
+class ConcurrencyLimiter:
+    """At most max_concurrent holders across processes, with up to max_waiting callers queued"""
+
+    def __init__(self, db_path: str, max_concurrent: int = 5, max_waiting: int = 10, wait_timeout: float = 60,
+                 slot_lease_seconds: int = 420, poll_interval: float = 0.25, enabled: bool = True):
+        self.db_path = db_path
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max(0, max_waiting)
+        self.wait_timeout = wait_timeout
+        self.slot_lease_seconds = slot_lease_seconds
+        self.poll_interval = poll_interval
+        # A waiter that misses this many polls is considered gone
+        self.waiter_lease_seconds = max(10.0, poll_interval * 20)
+        self.enabled = enabled
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        # isolation_level=None so admission decisions can take the write lock with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS limiter_slots (
+                    holder_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    owner_pid INTEGER,
+                    enqueued_at REAL NOT NULL,
+                    lease_expires REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS limiter_waits (
+                    admitted_at REAL NOT NULL,
+                    wait_seconds REAL NOT NULL
+                )
+            ''')
+        finally:
+            conn.close()
+
+    def _transaction(self, step):
+        """Run step(conn, now) inside a write transaction and return its result"""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            result = step(conn, time.time())
+            conn.execute('COMMIT')
+            return result
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _free_slots(self, conn, now: float) -> int:
+        """Drop expired leases, then count the slots nobody holds"""
+        expired = conn.execute('DELETE FROM limiter_slots WHERE lease_expires <= ?', (now,)).rowcount
+        if expired:
+            logger.warning(f'Released {expired} expired admission leases')
+        active = conn.execute('SELECT COUNT(*) FROM limiter_slots WHERE state = ?', (ACTIVE,)).fetchone()[0]
+        return self.max_concurrent - active
+
+    def _enter(self, holder_id: str) -> bool:
+        """Take a slot (True) or join the wait queue (False); raises CapacityExceeded when it is full"""
+        def step(conn, now):
+            free = self._free_slots(conn, now)
+            waiting = conn.execute('SELECT COUNT(*) FROM limiter_slots WHERE state = ?', (WAITING,)).fetchone()[0]
+            # Newcomers never overtake callers already waiting
+            if free > waiting:
+                state, lease = ACTIVE, self.slot_lease_seconds
+            elif waiting < self.max_waiting:
+                state, lease = WAITING, self.waiter_lease_seconds
+            else:
+                raise CapacityExceeded(f'{self.max_concurrent} audits running and {waiting} waiting')
+            conn.execute('''
+                INSERT INTO limiter_slots (holder_id, state, owner_pid, enqueued_at, lease_expires)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (holder_id, state, os.getpid(), now, now + lease))
+            return state == ACTIVE
+        return self._transaction(step)
+
+    def _promote(self, holder_id: str) -> bool:
+        """Take a slot if one is free for this waiter's place in the queue; otherwise renew its lease"""
+        def step(conn, now):
+            row = conn.execute('SELECT enqueued_at FROM limiter_slots WHERE holder_id = ? AND state = ?',
+                               (holder_id, WAITING)).fetchone()
+            if row is None:
+                # Our entry expired (e.g. a long pause); queue again at the back
+                conn.execute('''
+                    INSERT INTO limiter_slots (holder_id, state, owner_pid, enqueued_at, lease_expires)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (holder_id, WAITING, os.getpid(), now, now + self.waiter_lease_seconds))
+                return False
+            free = self._free_slots(conn, now)
+            ahead = conn.execute('''
+                SELECT COUNT(*) FROM limiter_slots
+                WHERE state = ? AND (enqueued_at < ? OR (enqueued_at = ? AND holder_id < ?))
+            ''', (WAITING, row['enqueued_at'], row['enqueued_at'], holder_id)).fetchone()[0]
+            if free > ahead:
+                conn.execute('UPDATE limiter_slots SET state = ?, lease_expires = ? WHERE holder_id = ?',
+                             (ACTIVE, now + self.slot_lease_seconds, holder_id))
+                return True
+            conn.execute('UPDATE limiter_slots SET lease_expires = ? WHERE holder_id = ?',
+                         (now + self.waiter_lease_seconds, holder_id))
+            return False
+        return self._transaction(step)
+
+    def _release(self, holder_id: str, wait_seconds: float = None):
+        def step(conn, now):
+            conn.execute('DELETE FROM limiter_slots WHERE holder_id = ?', (holder_id,))
+            if wait_seconds is not None:
+                conn.execute('INSERT INTO limiter_waits (admitted_at, wait_seconds) VALUES (?, ?)',
+                             (now, wait_seconds))
+                conn.execute('DELETE FROM limiter_waits WHERE admitted_at <= ?', (now - WAIT_HISTORY_SECONDS,))
+        try:
+            self._transaction(step)
+        except sqlite3.Error as e:
+            logger.warning(f'Failed to release admission slot {holder_id}: {e}')
+
+    @contextmanager
+    def slot(self, wait_timeout: float = None):
+        """Hold one of the max_concurrent slots for the duration of the block.
+
+        Waits up to wait_timeout (default: the limiter's) in the queue; raises
+        CapacityExceeded when the queue is full or the wait times out. If the
+        slot table cannot be used, the block runs unlimited.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        holder_id = uuid.uuid4().hex
+        started = time.monotonic()
+        give_up_at = started + (self.wait_timeout if wait_timeout is None else wait_timeout)
+        try:
+            admitted = self._enter(holder_id)
+            while not admitted:
+                if time.monotonic() >= give_up_at:
+                    metrics.increment('audit_admission_timeouts')
+                    raise CapacityExceeded(f'No audit slot became free within {time.monotonic() - started:.0f}s')
+                time.sleep(self.poll_interval)
+                admitted = self._promote(holder_id)
+        except CapacityExceeded:
+            metrics.increment('audit_admission_rejected')
+            self._release(holder_id)
+            raise
+        except sqlite3.Error as e:
+            logger.warning(f'Admission control unavailable: {e}')
+            self._release(holder_id)
+            admitted = False
+        except BaseException:
+            self._release(holder_id)
+            raise
+
+        if not admitted:
+            yield
+            return
+
+        waited = time.monotonic() - started
+        metrics.observe('audit_admission_wait_seconds', waited)
+        try:
+            yield
+        finally:
+            self._release(holder_id, waited)
+
+    def get_stats(self) -> Dict:
+        now = time.time()
+        conn = self._connect()
+        try:
+            counts = {row['state']: row['holders'] for row in conn.execute(
+                'SELECT state, COUNT(*) AS holders FROM limiter_slots WHERE lease_expires > ? GROUP BY state', (now,))}
+            waits = conn.execute('''
+                SELECT COUNT(*) AS admitted, AVG(wait_seconds) AS mean_wait, MAX(wait_seconds) AS max_wait
+                FROM limiter_waits WHERE admitted_at > ?
+            ''', (now - WAIT_HISTORY_SECONDS,)).fetchone()
+        finally:
+            conn.close()
+        return {
+            'enabled': self.enabled,
+            'max_concurrent': self.max_concurrent,
+            'max_waiting': self.max_waiting,
+            'running': counts.get(ACTIVE, 0),
+            'waiting': counts.get(WAITING, 0),
+            'admitted_last_hour': waits['admitted'],
+            'mean_wait_seconds': round(waits['mean_wait'], 2) if waits['mean_wait'] is not None else None,
+            'max_wait_seconds': round(waits['max_wait'], 2) if waits['max_wait'] is not None else None
+        }
+
+# Global audit limiter; a slot covers an audit's scrape and analysis
+audit_limiter = ConcurrencyLimiter(
+    os.path.join(CACHE_DIR, 'admission.db'),
+    max_concurrent=MAX_CONCURRENT_AUDITS,
+    max_waiting=AUDIT_MAX_WAITING,
+    wait_timeout=AUDIT_ADMISSION_WAIT_SECONDS,
+    slot_lease_seconds=AUDIT_TIMEOUT_SECONDS + 120,
+    enabled=ENABLE_ADMISSION_CONTROL
+)
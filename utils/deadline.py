@@ -0,0 +1,48 @@
+# File: utils/deadline.py
+# Time budget for one audit, passed down to every slow call
+#
+# An audit is created with AUDIT_TIMEOUT_SECONDS; each step caps its own
+# timeouts with deadline.cap() so the pipeline as a whole finishes on time
+# instead of stacking full per-call timeouts one after another.
+
+import time
+from typing import Optional
+
+class DeadlineExceeded(Exception):
+    """The audit ran out of time before this step could start"""
+
+class Deadline:
+    """A point in (monotonic) time by which work must finish"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cap(self, timeout: float) -> float:
+        """The smaller of timeout and the time left; raises DeadlineExceeded when none is left"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded('Audit deadline exceeded')
+        return min(timeout, remaining)
+
+    def reserve(self, seconds: float) -> 'Deadline':
+        """A deadline that ends `seconds` earlier, leaving that time for later steps"""
+        child = Deadline(0)
+        child.expires_at = self.expires_at - seconds
+        return child
+
+    def within(self, seconds: float) -> 'Deadline':
+        """A deadline `seconds` from now, or this one if it ends sooner"""
+        child = Deadline(seconds)
+        child.expires_at = min(child.expires_at, self.expires_at)
+        return child
+
+def cap_timeout(deadline: Optional[Deadline], timeout: float) -> float:
+    """deadline.cap(timeout), or timeout unchanged when there is no deadline"""
+    return deadline.cap(timeout) if deadline is not None else timeout
@@ -0,0 +1,126 @@
+# File: utils/json_repair.py
+# Tolerant parsing of JSON produced by an LLM
+#
+# Model output is usually valid JSON, but not always: it may be wrapped in a
+# ```json fence or a sentence, carry trailing commas or Python literals, or be
+# cut off by max_tokens. parse_llm_json() tries a plain parse first and then
+# progressively more invasive repairs, so one stray character no longer costs
+# a whole regeneration. It raises ValueError only when nothing usable is left.
+
+import re
+import json
+from typing import Any, List
+
+from utils.json_stream import ObjectStreamParser
+
+_FENCE_RE = re.compile(r'```(?:json|JSON)?\s*(.*?)(?:```|$)', re.DOTALL)
+_DANGLING_KEY_RE = re.compile(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*:?\s*$')
+_PY_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+def parse_llm_json(text: str) -> Any:
+    """Parse an LLM response as JSON, repairing common defects"""
+    if text is None:
+        raise ValueError('Empty response')
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    candidate = _extract_json(text)
+    if candidate is None:
+        raise ValueError('No JSON object in response')
+
+    for repair in (lambda t: t, _clean, lambda t: _close_truncated(_clean(t))):
+        try:
+            return json.loads(repair(candidate))
+        except ValueError:
+            continue
+
+    # Last resort: keep whichever top-level members are complete
+    members = ObjectStreamParser().feed(candidate)
+    if members:
+        return dict(members)
+    raise ValueError('Response is not repairable JSON')
+
+def _extract_json(text: str):
+    """The JSON part of text: the fenced block if any, from the first brace or bracket"""
+    fenced = _FENCE_RE.search(text)
+    if fenced and fenced.group(1).strip():
+        text = fenced.group(1)
+    starts = [i for i in (text.find('{'), text.find('[')) if i >= 0]
+    if not starts:
+        return None
+    text = text[min(starts):]
+    # Drop trailing prose after the last closer; JSON cut off mid-value keeps its tail
+    end = max(text.rfind('}'), text.rfind(']'))
+    if end >= 0 and not re.search(r'[\[{"]', text[end + 1:]):
+        text = text[:end + 1]
+    return text
+
+def _clean(text: str) -> str:
+    """Remove trailing commas and // comments and convert Python literals, outside strings"""
+    out: List[str] = []
+    i = 0
+    in_string = False
+    escape = False
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            i += 1
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch == '/' and text.startswith('//', i):
+            newline = text.find('\n', i)
+            i = len(text) if newline < 0 else newline
+            continue
+        elif ch == ',':
+            rest = text[i + 1:].lstrip()
+            if rest[:1] in ('}', ']'):
+                i += 1
+                continue
+        elif ch.isalpha():
+            word = re.match(r'[A-Za-z]+', text[i:]).group(0)
+            out.append(_PY_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        out.append(ch)
+        i += 1
+    return ''.join(out)
+
+def _close_truncated(text: str) -> str:
+    """Close an object cut off mid-stream: end the open string, drop a dangling
+    key or comma, and add the missing closing brackets"""
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]' and stack:
+            stack.pop()
+
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    # A dangling `"key":` or `"key"` inside an object cannot be completed
+    if stack and stack[-1] == '}':
+        text = _DANGLING_KEY_RE.sub(r'\1', text)
+    text = text.rstrip().rstrip(',')
+    return text + ''.join(reversed(stack))
@@ -0,0 +1,65 @@
+# File: utils/json_stream.py
+# Incremental parser for a JSON object that arrives in pieces
+#
+# Streamed LLM completions deliver the response a few characters at a time.
+# ObjectStreamParser scans the text as it arrives and returns each top-level
+# member of the outermost object as soon as that member is complete, without
+# waiting for the closing brace. Anything before the first '{' (a ```json
+# fence, a stray sentence) is ignored.
+
+import json
+from typing import Any, List, Tuple
+
+class ObjectStreamParser:
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.member_start = None
+        self.done = False
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Add text and return the (key, value) members completed by it"""
+        self.buffer += text
+        members = []
+
+        while self.pos < len(self.buffer) and not self.done:
+            ch = self.buffer[self.pos]
+            if self.member_start is None:
+                # Still looking for the opening brace of the object
+                if ch == '{':
+                    self.depth = 1
+                    self.member_start = self.pos + 1
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    members.extend(self._parse_member(self.buffer[self.member_start:self.pos]))
+                    self.done = True
+            elif ch == ',' and self.depth == 1:
+                members.extend(self._parse_member(self.buffer[self.member_start:self.pos]))
+                self.member_start = self.pos + 1
+            self.pos += 1
+
+        return members
+
+    def _parse_member(self, text: str) -> List[Tuple[str, Any]]:
+        if not text.strip():
+            return []
+        try:
+            return list(json.loads('{' + text + '}').items())
+        except ValueError:
+            # Malformed member; the full parse of the response reports the error
+            return []
@@ -0,0 +1,66 @@
+# File: utils/metrics.py
+# In-process metrics: counters and latency histograms
+#
+# Each gunicorn worker keeps its own registry; /api/metrics reports the
+# worker that served the request. Histograms keep a bounded window of recent
+# observations for percentiles alongside lifetime count and sum.
+
+import threading
+from collections import deque
+from typing import Dict
+
+class Histogram:
+    def __init__(self, window: int = 500):
+        self.recent = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.recent.append(value)
+        self.count += 1
+        self.total += value
+
+    def snapshot(self) -> Dict:
+        ordered = sorted(self.recent)
+
+        def percentile(pct):
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 3) if ordered else None
+
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else None,
+            'p50': percentile(50),
+            'p95': percentile(95),
+            'max': round(ordered[-1], 3) if ordered else None
+        }
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram()
+            self._histograms[name].observe(value)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'histograms': {name: histogram.snapshot() for name, histogram in self._histograms.items()}
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+# Global metrics registry
+metrics = MetricsRegistry()